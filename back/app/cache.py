@@ -0,0 +1,126 @@
+"""
+In-process cache of serialized JSON responses for the anonymous catalog
+endpoints (event / fest / college listings and detail pages).
+
+Every entry records the tables it was built from together with the version
+of each table at the time the build *started*. Write paths call
+`response_cache.invalidate("events")` (etc.) after committing, which bumps
+the table version and drops every entry that depends on it. Because the
+versions are captured before the query runs, a response built from data
+that was committed over mid-build is never served.
+
+The cache is per process; with several workers each keeps its own copy.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+MAX_BYTES   = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# Table groups used as cache dependencies
+EVENT_TABLES   = ("events", "fests", "colleges")   # EventOut carries fest / college names
+FEST_TABLES    = ("fests", "events")               # FestOut carries event_count
+COLLEGE_TABLES = ("colleges", "events")            # CollegeOut carries event_count
+
+
+class ResponseCache:
+    """Size-bounded LRU of response bodies with per-table versioning."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes   = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key → (versions, body, headers, expires)
+        self._versions: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def versions(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        with self._lock:
+            return tuple((t, self._versions.get(t, 0)) for t in tables)
+
+    def get(self, key: tuple) -> Optional[Tuple[bytes, dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            versions, body, headers, expires = entry
+            if any(self._versions.get(t, 0) != v for t, v in versions) or (
+                expires is not None and expires <= time.monotonic()
+            ):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return body, headers
+
+    def put(self, key: tuple, versions: Tuple[Tuple[str, int], ...], body: bytes, headers: dict,
+            ttl: Optional[float] = None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            # Skip entries that went stale while they were being built
+            if any(self._versions.get(t, 0) != v for t, v in versions):
+                return
+            if key in self._entries:
+                self._drop(key)
+            expires = time.monotonic() + ttl if ttl is not None else None
+            self._entries[key] = (versions, body, headers, expires)
+            self._size += len(body)
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, *tables: str):
+        """Bump the version of each table and evict every entry built from it."""
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+            stale = [k for k, (versions, _, _, _) in self._entries.items()
+                     if any(t in tables for t, _ in versions)]
+            for k in stale:
+                self._drop(k)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _drop(self, key: tuple):
+        _, body, _, _ = self._entries.pop(key)
+        self._size -= len(body)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def cached_json(key: tuple, tables: Iterable[str], schema, build: Callable, ttl: Optional[float] = None) -> Response:
+    """
+    Serve `key` from the cache, or call build() → (payload, headers), serialize
+    the payload as `schema` and cache the bytes (for at most `ttl` seconds).
+
+    HTTPExceptions raised by build() propagate and are not cached.
+    """
+    hit = response_cache.get(key)
+    if hit is None:
+        versions = response_cache.versions(tables)
+        payload, headers = build()
+        adapter = _adapter(schema)
+        body = adapter.dump_json(adapter.validate_python(payload, from_attributes=True))
+        response_cache.put(key, versions, body, headers, ttl=ttl)
+    else:
+        body, headers = hit
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,85 @@
+"""
+Conditional GET (ETag / If-None-Match) for the public catalog endpoints.
+
+The ETag of a response is a hash of its cache key and a stamp of every table
+it was built from. A table's stamp is max(updated_at), an index lookup.
+Every write bumps updated_at, and a delete path calls touch_after_delete()
+to bump it on a surviving row, so the stamp moves whenever the response
+could change. All stamps come from one small aggregate SELECT;
+on a match the endpoint answers 304 without running its own query or
+serializing anything.
+
+The stamp is also part of the response-cache key. GETs may read from a
+lagging replica, so a body rebuilt right after invalidate() can predate the
+write; once the replica catches up the stamp moves and the body is rebuilt
+instead of the stale one being served until the next write.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.cache import cached_json
+
+# Cache table name → model carrying an indexed updated_at
+STAMPED_TABLES = {
+    "events":   models.Event,
+    "fests":    models.Fest,
+    "colleges": models.College,
+}
+
+
+def table_stamp(db: Session, tables: Iterable[str]) -> str:
+    """One SELECT returning max(updated_at) for every table."""
+    columns = [
+        select(func.max(STAMPED_TABLES[name].updated_at)).scalar_subquery()
+        for name in tables if name in STAMPED_TABLES
+    ]
+    if not columns:
+        return ""
+    return "|".join(str(v) for v in db.execute(select(*columns)).one())
+
+
+def touch_after_delete(db: Session, model):
+    """Move the table's stamp after a delete without counting rows: bump
+    updated_at on the surviving row with the lowest id (a primary-key
+    lookup). With no rows left max(updated_at) becomes NULL, which moves too."""
+    first_id = select(func.min(model.id)).scalar_subquery()
+    db.execute(
+        update(model).where(model.id == first_id).values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def make_etag(key: tuple, stamp: str) -> str:
+    digest = hashlib.sha1(repr((key, stamp)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Optional[Request], etag: str) -> bool:
+    if request is None:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [t.strip() for t in header.split(",")]
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    return "*" in candidates or any(c.removeprefix("W/") == etag for c in candidates)
+
+
+def conditional_json(request: Optional[Request], db: Session, key: tuple, tables: Iterable[str], schema, build: Callable) -> Response:
+    """cached_json() behind an ETag check; returns 304 when the client is current."""
+    tables = tuple(tables)
+    stamp = table_stamp(db, tables)
+    etag = make_etag(key, stamp)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response = cached_json(key + (stamp,), tables, schema, build)
+    response.headers.update(headers)
+    return response
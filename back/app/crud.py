@@ -1,8 +1,44 @@
-from sqlalchemy.orm import Session
-from app.models import Event
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, joinedload, with_expression
+from app.models import Event, College, Fest, StatusEnum
+
+def event_listing_query(db: Session):
+    """Event query with the college and fest eagerly joined.
+
+    EventOut reads college_name / fest_slug / fest_name, which would otherwise
+    lazy-load one SELECT per event; every event listing should start here.
+    """
+    return db.query(Event).options(joinedload(Event.college), joinedload(Event.fest))
+
+def _approved_event_counts(fk_col):
+    """Subquery of (owner_id, n) approved-event counts grouped by fk_col."""
+    return (
+        select(fk_col.label("owner_id"), func.count(Event.id).label("n"))
+        .where(Event.status == StatusEnum.approved, fk_col.isnot(None))
+        .group_by(fk_col)
+        .subquery()
+    )
+
+def college_query(db: Session):
+    """College query with event_count filled in by a single grouped aggregate."""
+    counts = _approved_event_counts(Event.college_id)
+    return (
+        db.query(College)
+        .outerjoin(counts, counts.c.owner_id == College.id)
+        .options(with_expression(College.event_count, func.coalesce(counts.c.n, 0)))
+    )
+
+def fest_query(db: Session):
+    """Fest query with event_count filled in by a single grouped aggregate."""
+    counts = _approved_event_counts(Event.fest_id)
+    return (
+        db.query(Fest)
+        .outerjoin(counts, counts.c.owner_id == Fest.id)
+        .options(with_expression(Fest.event_count, func.coalesce(counts.c.n, 0)))
+    )
 
 def get_all_events(db: Session):
-    return db.query(Event).order_by(Event.date.desc()).all()
+    return event_listing_query(db).order_by(Event.date.desc()).all()
 
 def get_event_by_id(db: Session, event_id: int):
-    return db.query(Event).filter(Event.id == event_id).first()
\ No newline at end of file
+    return event_listing_query(db).filter(Event.id == event_id).first()
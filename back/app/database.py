@@ -1,22 +1,142 @@
+from fastapi.requests import HTTPConnection
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.elements import TextClause
 from dotenv import load_dotenv
 import os
+import re
+
+from app import sqlite_profile
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./eventx.db")
+# Optional read replica; GET requests read from it (see RoutingSession)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+# Server-side pool, for every backend but SQLite
+POOL_SIZE         = int(os.getenv("DB_POOL_SIZE", 10))
+MAX_OVERFLOW      = int(os.getenv("DB_MAX_OVERFLOW", 20))
+POOL_TIMEOUT      = int(os.getenv("DB_POOL_TIMEOUT", 30))      # seconds waiting for a free connection
+POOL_RECYCLE      = int(os.getenv("DB_POOL_RECYCLE", 1800))    # seconds before a connection is replaced
+STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 15000))  # ms; Postgres cancels longer statements
+
+# Async driver for each backend the sync URL may name
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_url(url: str) -> str:
+    """The same database as `url`, addressed through its async driver."""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def engine_options(url: str) -> dict:
+    """create_engine() / create_async_engine() keyword arguments for `url`."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return {} if parsed.get_driver_name() == "aiosqlite" else {"connect_args": {"check_same_thread": False}}
+    options = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,  # drop connections the server closed while idle
+    }
+    if parsed.get_backend_name() == "postgresql":
+        if parsed.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT}"}
+    return options
+
+
+def make_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        sqlite_profile.configure(engine)
+    return engine
+
+
+def make_async_engine(url: str):
+    engine = create_async_engine(url, **engine_options(url))
+    if engine.dialect.name == "sqlite":
+        sqlite_profile.configure(engine.sync_engine)
+    return engine
+
+
+_WRITE_SQL = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|MERGE|CREATE|DROP|ALTER|TRUNCATE)\b", re.IGNORECASE)
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class RoutingSession(Session):
+    """
+    Session that reads from the replica while it has only read.
+
+    With `use_replica` set (GET requests, see get_db), statements go to the
+    replica until the session first writes: a flush, an ORM / Core DML
+    statement or a textual INSERT / UPDATE / DELETE. From then on everything,
+    reads included, goes to the primary, so a request always reads its own
+    writes. get_bind() with no statement outside a flush (dialect checks,
+    handing a bind to a background task) is always the primary.
+    """
+
+    def __init__(self, *args, replica=None, use_replica: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+        self.use_replica = use_replica and replica is not None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.use_replica:
+            # A flush asks for its connection without a statement
+            writes = self._flushing or getattr(clause, "is_dml", False) or (
+                isinstance(clause, TextClause) and _WRITE_SQL.match(clause.text))
+            if writes:
+                self.use_replica = False  # pinned to the primary for the rest of the session
+            elif clause is not None:
+                return self.replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+def reads_from_replica(connection: HTTPConnection) -> bool:
+    """Only plain reads may be served from a (possibly lagging) replica."""
+    return connection.scope.get("method") in ("GET", "HEAD")
+
+
+engine = make_engine(DATABASE_URL)
+replica_engine = make_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine,
+                            class_=RoutingSession, replica=replica_engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+# The hot routes (listings, pass claim, gate scan, registration, auth) run
+# as `async def` on this engine, so a request waiting on the database does
+# not hold a threadpool thread.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+ASYNC_DATABASE_REPLICA_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or (
+    async_url(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else None)
+
+async_engine = make_async_engine(ASYNC_DATABASE_URL)
+async_replica_engine = make_async_engine(ASYNC_DATABASE_REPLICA_URL) if ASYNC_DATABASE_REPLICA_URL else None
+# Routes serialize after commit; keep loaded attributes instead of expiring them
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession,
+    replica=async_replica_engine.sync_engine if async_replica_engine else None,
+)
+
+def get_db(connection: HTTPConnection):
+    db = SessionLocal(use_replica=reads_from_replica(connection))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_session_factory():
+    """For long-lived connections (WebSockets) that open a short session per unit of work."""
+    return SessionLocal
+
+async def get_async_db(connection: HTTPConnection):
+    async with AsyncSessionLocal(use_replica=reads_from_replica(connection)) as db:
+        yield db
@@ -0,0 +1,249 @@
+"""
+Gate check-in for fest entry passes.
+
+Admitting a pass is a single conditional UPDATE:
+
+    UPDATE fest_passes
+       SET checked_in = true, checked_in_at = :at, checked_in_gate = :gate
+     WHERE fest_id = :fest AND qr_code = :qr
+       AND checked_in = false AND status = 'approved'
+    RETURNING ...
+
+The database decides who wins. Two gates scanning the same QR at the same
+moment cannot both admit it: the second UPDATE matches no row. The happy
+path is one round trip through the unique qr_code index. Only when nothing
+was updated does a second SELECT run, to tell the gate *why*.
+
+Every write to a fest's passes also stamps them with the fest's next change
+sequence number (next_change_seq), which is what the gate manifest serves
+deltas from. Admission takes the number only once its UPDATE has matched,
+so a refused scan writes nothing and never touches the fest's counter row.
+Writers lock the pass rows first and the counter second, in that order.
+
+Rotating a fest's pass key re-signs every pass, so a code printed before
+the rotation no longer matches qr_code. While the previous key is still in
+its grace period (see pass_tokens), such a code is resolved to its pass by
+its signature instead; only codes that miss the qr_code lookup pay for it.
+
+The functions here do not commit; callers commit (or roll back) with the
+rest of their transaction.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import models, pass_tokens
+
+ADMITTED     = "admitted"
+ALREADY_USED = "already_used"
+BLOCKED      = "blocked"
+UNKNOWN      = "unknown"
+
+
+def utc_naive(dt: datetime) -> datetime:
+    """Scanners may or may not send an offset; store and compare naive UTC."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+# ─── Change sequence ─────────────────────────────────────────────────────────
+
+def next_change_seq(db: Session, fest_id: int) -> int:
+    """
+    Take the fest's next change sequence number (one upsert round trip).
+    Every pass written in the same transaction is stamped with it.
+    """
+    table = models.FestPassSequence.__table__
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    return db.execute(
+        dialect_insert(table)
+        .values(fest_id=fest_id, last_seq=1)
+        .on_conflict_do_update(index_elements=[table.c.fest_id], set_={"last_seq": table.c.last_seq + 1})
+        .returning(table.c.last_seq)
+    ).scalar_one()
+
+
+# ─── Admission ───────────────────────────────────────────────────────────────
+
+def _admit(db: Session, fest_id: int, criterion, gate_id: Optional[str],
+           scanned_at: Optional[datetime]) -> Tuple[str, Optional[models.FestPass]]:
+    fest_pass = db.execute(
+        update(models.FestPass)
+        .where(
+            criterion,
+            models.FestPass.fest_id == fest_id,
+            models.FestPass.checked_in.is_(False),
+            models.FestPass.status == models.FestPassStatusEnum.approved,
+        )
+        .values(
+            checked_in=True,
+            checked_in_at=utc_naive(scanned_at) if scanned_at else datetime.utcnow(),
+            checked_in_gate=gate_id,
+        )
+        .returning(models.FestPass)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    if fest_pass is not None:
+        # Written at flush, with the caller's commit
+        fest_pass.change_seq = next_change_seq(db, fest_id)
+        return ADMITTED, fest_pass
+
+    # Failure path only: find out why nothing matched
+    fest_pass = (
+        db.query(models.FestPass)
+        .filter(criterion, models.FestPass.fest_id == fest_id)
+        .first()
+    )
+    if fest_pass is None:
+        return UNKNOWN, None
+    if fest_pass.status != models.FestPassStatusEnum.approved:
+        return BLOCKED, fest_pass
+    return ALREADY_USED, fest_pass
+
+
+def scan_qr(db: Session, fest_id: int, qr_code: str, gate_id: Optional[str] = None,
+            scanned_at: Optional[datetime] = None) -> Tuple[str, Optional[models.FestPass]]:
+    """Admit the pass printed with `qr_code`; returns (result, pass or None)."""
+    result, fest_pass = _admit(db, fest_id, models.FestPass.qr_code == qr_code, gate_id, scanned_at)
+    if result == UNKNOWN:
+        pass_id = previous_key_passes(db, fest_id, [qr_code]).get(qr_code)
+        if pass_id is not None:
+            return scan_pass_id(db, fest_id, pass_id, gate_id=gate_id, scanned_at=scanned_at)
+    return result, fest_pass
+
+
+def scan_pass_id(db: Session, fest_id: int, pass_id: int, gate_id: Optional[str] = None,
+                 scanned_at: Optional[datetime] = None) -> Tuple[str, Optional[models.FestPass]]:
+    """Same as scan_qr, addressed by pass id (manual lookup at the desk)."""
+    return _admit(db, fest_id, models.FestPass.id == pass_id, gate_id, scanned_at)
+
+
+def previous_key_passes(db: Session, fest_id: int, qr_codes: Iterable[str]) -> Dict[str, int]:
+    """
+    Pass ids of the codes that are validly signed for this fest under its
+    previous key, while that key is in its grace period. Codes that are not
+    tokens of this fest cost nothing; otherwise one SELECT of the fest row.
+    """
+    claims = [code for code in qr_codes
+              if (c := pass_tokens.decode(code)) is not None and c.fest_id == fest_id]
+    if not claims:
+        return {}
+    fest = db.execute(
+        select(models.Fest.pass_key_version, models.Fest.pass_key_rotated_at).where(models.Fest.id == fest_id)
+    ).one_or_none()
+    if fest is None:
+        return {}
+    keys = {
+        v: pass_tokens.fest_key(fest_id, v)
+        for v in pass_tokens.accepted_versions(fest.pass_key_version, fest.pass_key_rotated_at)
+        if v != fest.pass_key_version
+    }
+    found = {}
+    for code in claims:
+        verified = pass_tokens.verify(code, keys)
+        if verified is not None:
+            found[code] = verified.pass_id
+    return found
+
+
+def admit_many(db: Session, fest_id: int, admissions: Dict[int, Tuple[datetime, Optional[str]]]) -> Set[int]:
+    """
+    Admit several passes of a fest in one UPDATE, each with its own
+    (scanned_at, gate_id). Like a single scan, it only flips passes that
+    are still approved and unused. Returns the ids actually flipped; see
+    refusals() for why the rest were not.
+    """
+    if not admissions:
+        return set()
+    flipped = set(db.execute(
+        update(models.FestPass)
+        .where(
+            models.FestPass.id.in_(admissions),
+            models.FestPass.checked_in.is_(False),
+            models.FestPass.status == models.FestPassStatusEnum.approved,
+        )
+        .values(
+            checked_in=True,
+            checked_in_at=case(
+                {pid: utc_naive(at) for pid, (at, _) in admissions.items()},
+                value=models.FestPass.id,
+            ),
+            checked_in_gate=case(
+                {pid: gate for pid, (_, gate) in admissions.items()},
+                value=models.FestPass.id,
+            ),
+        )
+        .returning(models.FestPass.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    if flipped:
+        db.execute(
+            update(models.FestPass)
+            .where(models.FestPass.id.in_(flipped))
+            .values(change_seq=next_change_seq(db, fest_id))
+            .execution_options(synchronize_session=False)
+        )
+    return flipped
+
+
+def refusals(db: Session, fest_id: int, pass_ids: Set[int]) -> Dict[int, str]:
+    """Failure path of admit_many(): why each of `pass_ids` was not flipped."""
+    if not pass_ids:
+        return {}
+    reasons = {pass_id: UNKNOWN for pass_id in pass_ids}
+    for pass_id, status in db.execute(
+        select(models.FestPass.id, models.FestPass.status)
+        .where(models.FestPass.id.in_(pass_ids), models.FestPass.fest_id == fest_id)
+    ):
+        reasons[pass_id] = BLOCKED if status != models.FestPassStatusEnum.approved else ALREADY_USED
+    return reasons
+
+
+# ─── Manifest ────────────────────────────────────────────────────────────────
+
+# Pass states as sent to gate devices
+STATE_VALID   = 0
+STATE_USED    = 1
+STATE_BLOCKED = 2
+
+MANIFEST_FIELDS = ["id", "qr_code", "state"]
+
+
+def manifest(db: Session, fest_id: int, since: Optional[int]) -> Tuple[int, List[list]]:
+    """
+    Return (cursor, rows) for a fest's gate manifest: every pass when
+    `since` is None, otherwise the passes written after sequence `since`.
+    Rows are [id, qr_code, state]; pass `cursor` as `since` next time.
+    """
+    # Read the counter first: everything up to it has committed
+    cursor = db.execute(
+        select(models.FestPassSequence.last_seq).where(models.FestPassSequence.fest_id == fest_id)
+    ).scalar() or 0
+
+    query = select(
+        models.FestPass.id, models.FestPass.qr_code, models.FestPass.status,
+        models.FestPass.checked_in, models.FestPass.change_seq,
+    ).where(models.FestPass.fest_id == fest_id)
+    if since is None:
+        query = query.order_by(models.FestPass.id)
+    else:
+        query = query.where(models.FestPass.change_seq > since).order_by(
+            models.FestPass.change_seq, models.FestPass.id)
+
+    rows = []
+    for pass_id, qr_code, status, checked_in, change_seq in db.execute(query):
+        if status != models.FestPassStatusEnum.approved:
+            state = STATE_BLOCKED
+        elif checked_in:
+            state = STATE_USED
+        else:
+            state = STATE_VALID
+        rows.append([pass_id, qr_code, state])
+        # Writes that committed after the counter was read are included too
+        cursor = max(cursor, change_seq or 0)
+    return cursor, rows
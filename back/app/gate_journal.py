@@ -0,0 +1,252 @@
+"""
+Write-behind check-in journal for peak gate throughput (opt-in).
+
+With GATE_WRITE_BEHIND=1 a gate scan no longer opens a database write
+transaction. Instead the scan is decided against in-memory state:
+
+    fest_id → {qr_code / pass id → pass row}   (loaded once per fest)
+    fest_id → {checked-in pass ids}             (only ever grows)
+
+The admission is appended to a local journal file (GATE_JOURNAL_PATH) and
+fsync'ed before the gate gets its answer, so an acknowledged scan survives
+a crash. A background thread flushes the journal every
+GATE_JOURNAL_FLUSH_INTERVAL seconds: each fest's pending admissions are
+applied with one gate.admit_many() UPDATE, and all of them commit in a
+single transaction. On startup, recover() replays whatever the last process
+left in the journal. Replays are idempotent, because admit_many() only flips
+passes that are still unchecked.
+
+The in-memory state is per process, so this mode needs a single API worker.
+Scans for passes the memory does not know yet (claimed after the fest was
+loaded) fall back to a read-only lookup. Blocking a pass or rotating keys
+drops the fest's pass directory via forget(), so it is re-read on the next
+scan. The gate manifest and the pass rows trail the gate by at most one
+flush interval.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import gate, models
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND   = os.getenv("GATE_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+JOURNAL_PATH   = os.getenv("GATE_JOURNAL_PATH", "gate_journal.log")
+FLUSH_INTERVAL = float(os.getenv("GATE_JOURNAL_FLUSH_INTERVAL", 0.5))
+
+_PASS_COLUMNS = (
+    models.FestPass.id, models.FestPass.user_id, models.FestPass.fest_id, models.FestPass.status,
+    models.FestPass.qr_code, models.FestPass.checked_in, models.FestPass.created_at,
+)
+
+
+class GateJournal:
+    def __init__(self, path: str, session_factory: Callable[[], Session]):
+        self.path = path
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._directory: Dict[int, Dict[object, dict]] = {}   # fest → qr_code / id → pass row
+        self._checked_in: Dict[int, set] = {}                 # fest → pass ids
+        self._pending: List[dict] = []                        # journaled, not yet in the DB
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ── Scanning ────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _remember(directory: dict, checked: set, row) -> dict:
+        entry = dict(row._mapping)
+        directory[entry["qr_code"]] = directory[entry["id"]] = entry
+        if entry["checked_in"]:
+            checked.add(entry["id"])
+        return entry
+
+    def scan(self, db: Session, fest_id: int, gate_id: Optional[str] = None,
+             scanned_at: Optional[datetime] = None, *, qr_code: Optional[str] = None,
+             pass_id: Optional[int] = None) -> Tuple[str, Optional[dict]]:
+        """
+        Decide a scan (by qr_code or pass_id) from memory and journal the
+        admission. Returns (result, pass row dict or None) like gate.scan_qr.
+        """
+        key = qr_code if qr_code is not None else pass_id
+        with self._lock:
+            directory = self._directory.get(fest_id)
+            entry = directory.get(key) if directory is not None else None
+            if entry is not None:
+                return self._decide(fest_id, entry, gate_id, scanned_at)
+
+        # Database reads run outside the lock, so a lookup never holds up other scans
+        query = db.query(*_PASS_COLUMNS).filter(models.FestPass.fest_id == fest_id)
+        if directory is not None:
+            # Claimed after the fest was loaded
+            column = models.FestPass.qr_code if qr_code is not None else models.FestPass.id
+            query = query.filter(column == key)
+        rows = query.all()
+
+        with self._lock:
+            # Another scan may have loaded the fest meanwhile; fresher rows win
+            directory = self._directory.setdefault(fest_id, {})
+            checked = self._checked_in.setdefault(fest_id, set())
+            for row in rows:
+                self._remember(directory, checked, row)
+            entry = directory.get(key)
+            if entry is not None:
+                return self._decide(fest_id, entry, gate_id, scanned_at)
+
+        if qr_code is not None:
+            # Printed before a key rotation re-signed the pass
+            pass_id = gate.previous_key_passes(db, fest_id, [qr_code]).get(qr_code)
+            if pass_id is not None:
+                return self.scan(db, fest_id, gate_id, scanned_at, pass_id=pass_id)
+        return gate.UNKNOWN, None
+
+    def _decide(self, fest_id: int, entry: dict, gate_id: Optional[str],
+                scanned_at: Optional[datetime]) -> Tuple[str, Optional[dict]]:
+        """Admit or refuse a known pass; called with _lock held."""
+        checked = self._checked_in[fest_id]
+        if entry["status"] != models.FestPassStatusEnum.approved:
+            return gate.BLOCKED, entry
+        if entry["id"] in checked:
+            return gate.ALREADY_USED, entry
+
+        at = gate.utc_naive(scanned_at) if scanned_at else datetime.utcnow()
+        record = {"fest_id": fest_id, "pass_id": entry["id"], "at": at.isoformat(), "gate": gate_id}
+        self._append(record)
+        checked.add(entry["id"])
+        self._pending.append(record)
+        return gate.ADMITTED, {**entry, "checked_in": True, "checked_in_at": at, "checked_in_gate": gate_id}
+
+    def forget(self, fest_id: int):
+        """Drop a fest's pass directory (statuses or codes changed); checked-in ids are kept."""
+        with self._lock:
+            self._directory.pop(fest_id, None)
+
+    # ── Journal file ────────────────────────────────────────────────────────
+
+    def _append(self, record: dict):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    @staticmethod
+    def _read(path: str) -> List[dict]:
+        records = []
+        if not os.path.exists(path):
+            return records
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Torn final line from a crash mid-write; it was never acknowledged
+                    logger.warning("Skipping unreadable gate journal line: %r", line)
+        return records
+
+    # ── Flushing ────────────────────────────────────────────────────────────
+
+    def _apply(self, records: List[dict]):
+        by_fest: Dict[int, Dict[int, Tuple[datetime, Optional[str]]]] = {}
+        for r in records:
+            admissions = by_fest.setdefault(r["fest_id"], {})
+            at = datetime.fromisoformat(r["at"])
+            # The earliest journaled admission of a pass wins
+            if r["pass_id"] not in admissions or at < admissions[r["pass_id"]][0]:
+                admissions[r["pass_id"]] = (at, r["gate"])
+        db = self.session_factory()
+        try:
+            for fest_id, admissions in by_fest.items():
+                gate.admit_many(db, fest_id, admissions)
+            db.commit()
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Write pending admissions to the database; returns how many were flushed."""
+        flushing_path = self.path + ".flushing"
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            # Start a fresh journal; the flushed batch lives in .flushing until it commits
+            self._file.close()
+            os.replace(self.path, flushing_path)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+        try:
+            self._apply(batch)
+        except Exception:
+            logger.exception("Gate journal flush failed; will retry")
+            with self._lock:
+                # Put the batch back in front of anything journaled meanwhile
+                rest = self._read(self.path)
+                self._file.close()
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(r) + "\n" for r in batch + rest)
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._file = open(self.path, "a", encoding="utf-8")
+                self._pending = batch + self._pending
+                os.remove(flushing_path)
+            return 0
+        os.remove(flushing_path)
+        return len(batch)
+
+    def recover(self) -> int:
+        """Replay admissions a previous process journaled but never flushed."""
+        flushing_path = self.path + ".flushing"
+        with self._lock:
+            records = self._read(flushing_path) + self._read(self.path)
+            if records:
+                self._apply(records)
+            self._file.close()
+            if os.path.exists(flushing_path):
+                os.remove(flushing_path)
+            self._file = open(self.path, "w", encoding="utf-8")
+        if records:
+            logger.info("Recovered %d gate check-ins from the journal", len(records))
+        return len(records)
+
+    # ── Background thread ───────────────────────────────────────────────────
+
+    def _run(self):
+        while not self._stop.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="gate-journal-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self._file.close()
+
+
+journal: Optional[GateJournal] = None
+
+
+def start(session_factory: Callable[[], Session]):
+    """Enable write-behind (if configured): replay the journal, then start flushing."""
+    global journal
+    if not WRITE_BEHIND:
+        return
+    journal = GateJournal(JOURNAL_PATH, session_factory)
+    journal.recover()
+    journal.start()
+
+
+def stop():
+    global journal
+    if journal is not None:
+        journal.stop()
+        journal = None
@@ -1,11 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import OperationalError
 from datetime import datetime, timedelta
-from app.database import engine, SessionLocal, Base
-from app import models
+from app.database import engine, SessionLocal, Base, async_engine
+from app.migrations import run_migrations
+from app import gate_journal, models, payments, registrations, schemas, search, sqlite_profile
 from app.routes import auth, users, events, passes, admin, committees, colleges, fests, entry_passes, fest_events
+from app.routes import search as search_routes
+from app.routes import payments as payment_routes
+from app.pagination import NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="EventX API")
 
@@ -18,8 +25,20 @@ app.add_middleware(
     allow_credentials=False,  # using Bearer tokens (no cookies), so credentials not needed
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],  # let the browser read the cursor / ETag
 )
 
+# Seconds a client is told to wait after the database was too busy to take its write
+BUSY_RETRY_AFTER = 1
+
+@app.exception_handler(OperationalError)
+async def database_busy(request: Request, exc: OperationalError):
+    """A write that could not get SQLite's lock in time: ask the client to retry."""
+    if not sqlite_profile.is_locked_error(exc):
+        raise exc
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry shortly"},
+                        headers={"Retry-After": str(BUSY_RETRY_AFTER)})
+
 app.include_router(auth.router,          prefix="/api/auth",        tags=["Auth"])
 app.include_router(users.router,         prefix="/api/users",       tags=["Users"])
 app.include_router(events.router,        prefix="/api/events",      tags=["Events"])
@@ -30,6 +49,8 @@ app.include_router(colleges.router,      prefix="/api/colleges",    tags=["Colle
 app.include_router(fests.router,         prefix="/api/fests",       tags=["Fests"])
 app.include_router(entry_passes.router,  prefix="/api/fests",       tags=["FestPasses"])
 app.include_router(fest_events.router,   prefix="/api/fest-events", tags=["FestEventRegistrations"])
+app.include_router(search_routes.router, prefix="/api/search",      tags=["Search"])
+app.include_router(payment_routes.router, prefix="/api/payments",   tags=["Payments"])
 
 def seed():
     db = SessionLocal()
@@ -277,9 +298,45 @@ def seed():
     finally:
         db.close()
 
+def warm_cache():
+    """Pre-build the default pages of the public catalog endpoints so the
+    first request after a deploy is served from the response cache."""
+    db = SessionLocal()
+    try:
+        events.get_events(None, cursor=None, limit=DEFAULT_PAGE_SIZE, filters=schemas.EventFilters(), db=db)
+        events.get_city_events(None, cursor=None, limit=DEFAULT_PAGE_SIZE, filters=schemas.EventFilters(), db=db)
+        fests.list_fests(None, db=db)
+        colleges.get_colleges(None, db=db)
+        users.get_all_interests(db=db)
+        live_slugs = db.query(models.Fest.slug).filter(models.Fest.status == models.FestStatusEnum.live).all()
+        for (slug,) in live_slugs:
+            fests.get_fest(None, slug, db=db)
+            fests.get_fest_events(None, slug, db=db)
+    finally:
+        db.close()
+
+def build_search_index():
+    db = SessionLocal()
+    try:
+        search.rebuild_if_empty(db)
+    finally:
+        db.close()
+
 @app.on_event("startup")
 def on_startup():
     seed()
+    build_search_index()
+    warm_cache()
+    gate_journal.start(SessionLocal)
+    registrations.start_sweeper(SessionLocal)
+    payments.provider.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    payments.provider.stop()
+    registrations.stop_sweeper()
+    gate_journal.stop()
+    await async_engine.dispose()
 
 @app.get("/")
 def root():
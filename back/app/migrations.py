@@ -0,0 +1,85 @@
+"""
+Additive schema migrations for databases created by an older build.
+
+`Base.metadata.create_all` only creates missing tables, so a deployed
+eventx.db never gains columns or indexes that were added to models.py
+later. `run_migrations` runs after create_all on every startup and:
+
+  1. adds each column listed in ADDED_COLUMNS that the live table lacks
+     (type taken from the model), then runs its backfill statement;
+  2. on PostgreSQL, adds the values listed in ADDED_ENUM_VALUES to the
+     native ENUM types, which create_all never alters;
+  3. creates any index declared on the models that does not exist yet.
+
+Every step is idempotent, so it is safe to run on fresh and old databases.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.database import Base
+
+# (table, column, backfill SQL run once right after the column is added)
+ADDED_COLUMNS = [
+    ("events",   "updated_at", "UPDATE events SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)"),
+    ("fests",    "updated_at", "UPDATE fests SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)"),
+    ("colleges", "updated_at", "UPDATE colleges SET updated_at = CURRENT_TIMESTAMP"),
+    ("events",   "active_registrations", """
+        UPDATE events SET active_registrations = (
+            SELECT COUNT(*) FROM event_registrations r
+            WHERE r.event_id = events.id AND r.approval_status IN ('approved', 'pending')
+        )
+    """),
+    ("fests",    "pass_key_version", "UPDATE fests SET pass_key_version = 1"),
+    ("fests",    "pass_key_rotated_at", None),
+    ("fest_passes", "checked_in_at",   None),
+    ("fest_passes", "checked_in_gate", None),
+    ("fest_passes", "change_seq",      "UPDATE fest_passes SET change_seq = 0"),
+    ("event_registrations", "hold_expires_at", None),
+    ("passes", "checkout_id", None),
+]
+
+# (table, column) of Enum columns whose enum class gained values
+ADDED_ENUM_VALUES = [
+    ("event_registrations", "approval_status"),   # waitlisted
+    ("event_registrations", "payment_status"),    # held
+]
+
+
+def enum_value_statements() -> list:
+    """ALTER TYPE statements adding every value of the ADDED_ENUM_VALUES enums (PostgreSQL)."""
+    statements = []
+    for table_name, column_name in ADDED_ENUM_VALUES:
+        enum_type = Base.metadata.tables[table_name].c[column_name].type
+        for value in enum_type.enums:
+            statements.append(f"ALTER TYPE {enum_type.name} ADD VALUE IF NOT EXISTS '{value}'")
+    return statements
+
+
+def run_migrations(engine: Engine):
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+
+    with engine.begin() as conn:
+        for table_name, column_name, backfill in ADDED_COLUMNS:
+            if table_name not in existing_tables:
+                continue
+            live_columns = {c["name"] for c in insp.get_columns(table_name)}
+            if column_name in live_columns:
+                continue
+            column = Base.metadata.tables[table_name].c[column_name]
+            col_type = column.type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {col_type}"))
+            if backfill:
+                conn.execute(text(backfill))
+
+    if engine.dialect.name == "postgresql":
+        # ADD VALUE cannot be used in the transaction that adds it: run each on its own
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for statement in enum_value_statements():
+                conn.execute(text(statement))
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
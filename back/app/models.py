@@ -1,7 +1,9 @@
 from sqlalchemy import Column, Integer, String, Boolean, Float, DateTime, ForeignKey, Text, Enum, CheckConstraint, Index, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import literal
+from sqlalchemy.orm import relationship, query_expression
 from sqlalchemy.sql import func
 from app.database import Base
+from datetime import datetime
 import enum
 
 class RoleEnum(str, enum.Enum):
@@ -36,12 +38,14 @@ class FestPassStatusEnum(str, enum.Enum):
     blocked  = "blocked"
 
 class RegApprovalStatusEnum(str, enum.Enum):
-    pending  = "pending"
-    approved = "approved"
-    rejected = "rejected"
+    pending    = "pending"
+    approved   = "approved"
+    rejected   = "rejected"
+    waitlisted = "waitlisted"   # event was full; queued in EventWaitlistEntry
 
 class RegPaymentStatusEnum(str, enum.Enum):
     unpaid = "unpaid"
+    held   = "held"     # seat held for checkout until hold_expires_at
     paid   = "paid"
 
 class AuthProviderEnum(str, enum.Enum):
@@ -78,6 +82,9 @@ class Interest(Base):
 
 class UserInterest(Base):
     __tablename__ = "user_interests"
+    __table_args__ = (
+        Index("ix_user_interests_user_id", "user_id"),
+    )
     id          = Column(Integer, primary_key=True, index=True)
     user_id     = Column(Integer, ForeignKey("users.id"))
     interest_id = Column(Integer, ForeignKey("interests.id"))
@@ -94,6 +101,12 @@ class Event(Base):
     __table_args__ = (
         CheckConstraint("event_type IN ('fest', 'city')", name="ck_event_type_values"),
         Index("ix_events_event_type", "event_type"),
+        # Composite indexes for the listing shapes: filter columns first, then
+        # the (date) sort key so keyset pages are index range scans.
+        Index("ix_events_status_date", "status", "date"),
+        Index("ix_events_fest_status_date", "fest_id", "status", "date"),
+        Index("ix_events_college_status_date", "college_id", "status", "date"),
+        Index("ix_events_organizer_type_date", "organizer_id", "event_type", "date"),
     )
 
     id           = Column(Integer, primary_key=True, index=True)
@@ -112,12 +125,18 @@ class Event(Base):
     college_id   = Column(Integer, ForeignKey("colleges.id"), nullable=True)
     fest_id      = Column(Integer, ForeignKey("fests.id"), nullable=True)  # NULL for city events
     created_at   = Column(DateTime(timezone=True), server_default=func.now())
+    # Python-side timestamps keep microseconds (SQLite's CURRENT_TIMESTAMP has
+    # second resolution); max(updated_at) feeds the listing ETags.
+    updated_at   = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     # ── Fest-event registration fields (ignored when event_type='city') ──────
     requires_registration = Column(Boolean, default=False)
     is_paid               = Column(Boolean, default=False)
     registration_limit    = Column(Integer, nullable=True)   # None = unlimited
     approval_mode         = Column(Enum(ApprovalModeEnum), default=ApprovalModeEnum.auto)
+    # Approved + pending registrations, maintained by the registration write
+    # paths; a seat is reserved with a conditional UPDATE on this column.
+    active_registrations  = Column(Integer, nullable=False, default=0, server_default="0")
 
     organizer  = relationship("User", back_populates="events")
     college    = relationship("College", back_populates="events")
@@ -138,13 +157,41 @@ class Event(Base):
     def fest_name(self):
         return self.fest.name if self.fest else None
 
+    @property
+    def organizer_name(self):
+        return self.organizer.name if self.organizer else None
+
+    @property
+    def organizer_email(self):
+        return self.organizer.email if self.organizer else None
+
+    # ── Availability, straight from the maintained counter (no COUNT) ────────
+    @property
+    def registered_count(self):
+        return self.active_registrations or 0
+
+    @property
+    def seats_remaining(self):
+        if self.registration_limit is None:
+            return None
+        return max(self.registration_limit - self.registered_count, 0)
+
+    @property
+    def is_full(self):
+        return self.registration_limit is not None and self.registered_count >= self.registration_limit
+
 class Pass(Base):
     __tablename__ = "passes"
+    __table_args__ = (
+        Index("ix_passes_user_event", "user_id", "event_id"),
+        Index("ix_passes_event_id", "event_id"),
+    )
     id             = Column(Integer, primary_key=True, index=True)
     user_id        = Column(Integer, ForeignKey("users.id"))
     event_id       = Column(Integer, ForeignKey("events.id"))
     pass_code      = Column(String(100), unique=True, nullable=False)
     payment_status = Column(String(50), default="free")
+    checkout_id    = Column(String(64), nullable=True)   # current checkout; only its webhook events settle the pass
     created_at     = Column(DateTime(timezone=True), server_default=func.now())
 
     user  = relationship("User", back_populates="passes")
@@ -176,16 +223,20 @@ class College(Base):
     area    = Column(String(255), nullable=True)
     emoji   = Column(String(20), nullable=True, default="🏛️")
     website = Column(String(500), nullable=True)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     events = relationship("Event", back_populates="college")
     fests  = relationship("Fest", back_populates="college")
 
-    @property
-    def event_count(self):
-        return len([e for e in self.events if e.status == "approved"])
+    # Approved-event count; populated by crud.college_query with one grouped
+    # aggregate instead of loading self.events. 0 when loaded any other way.
+    event_count = query_expression(default_expr=literal(0))
 
 class Fest(Base):
     __tablename__ = "fests"
+    __table_args__ = (
+        Index("ix_fests_status_created", "status", "created_at"),
+    )
     id         = Column(Integer, primary_key=True, index=True)
     slug       = Column(String(100), unique=True, nullable=False, index=True)
     name       = Column(String(255), nullable=False)
@@ -194,16 +245,19 @@ class Fest(Base):
     logo_url   = Column(String(500), nullable=True)
     college_id = Column(Integer, ForeignKey("colleges.id"), nullable=True)
     status     = Column(Enum(FestStatusEnum), default=FestStatusEnum.draft)
+    # Version of the per-fest key that signs entry pass tokens (see pass_tokens.py)
+    pass_key_version = Column(Integer, nullable=False, default=1, server_default="1")
+    pass_key_rotated_at = Column(DateTime(timezone=True), nullable=True)   # UTC; starts the previous key's grace
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     college      = relationship("College", back_populates="fests")
     events       = relationship("Event", back_populates="fest")
     members      = relationship("FestMember", back_populates="fest", cascade="all, delete-orphan")
     entry_passes = relationship("FestPass", back_populates="fest")
 
-    @property
-    def event_count(self):
-        return len([e for e in self.events if e.status == "approved"])
+    # Approved-event count; populated by crud.fest_query (see College.event_count)
+    event_count = query_expression(default_expr=literal(0))
 
 
 class FestMember(Base):
@@ -212,6 +266,8 @@ class FestMember(Base):
     __table_args__ = (
         # A user can only appear once per fest; prevents duplicate membership rows
         UniqueConstraint("fest_id", "user_id", name="uq_fest_members_fest_user"),
+        # Covers the owner/core privilege check without touching the table
+        Index("ix_fest_members_fest_user_role", "fest_id", "user_id", "role"),
     )
 
     id         = Column(Integer, primary_key=True, index=True)
@@ -229,6 +285,8 @@ class FestPass(Base):
     __tablename__ = "fest_passes"
     __table_args__ = (
         UniqueConstraint("user_id", "fest_id", name="uq_fest_pass_user_fest"),
+        # Gate manifest deltas: passes of a fest changed after a sequence number
+        Index("ix_fest_passes_fest_change_seq", "fest_id", "change_seq"),
     )
 
     id         = Column(Integer, primary_key=True, index=True)
@@ -237,6 +295,10 @@ class FestPass(Base):
     status     = Column(Enum(FestPassStatusEnum), default=FestPassStatusEnum.approved)
     qr_code    = Column(String(100), unique=True, nullable=False)
     checked_in = Column(Boolean, default=False)
+    checked_in_at   = Column(DateTime(timezone=True), nullable=True)   # UTC, when the gate admitted it
+    checked_in_gate = Column(String(64), nullable=True)                # gate / device that admitted it
+    # Per-fest change sequence of the last write (see FestPassSequence)
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user          = relationship("User", back_populates="fest_passes")
@@ -244,11 +306,26 @@ class FestPass(Base):
     registrations = relationship("EventRegistration", back_populates="fest_pass")
 
 
+class FestPassSequence(Base):
+    """
+    Per-fest counter stamped into FestPass.change_seq by every write to a
+    fest's passes. Incrementing it locks the fest's row until commit, so
+    sequence numbers become visible in order and a gate device polling
+    "changed since N" never misses a write.
+    """
+    __tablename__ = "fest_pass_sequences"
+
+    fest_id  = Column(Integer, ForeignKey("fests.id"), primary_key=True)
+    last_seq = Column(Integer, nullable=False, default=0)
+
+
 class EventRegistration(Base):
     """A FestPass holder registering for a specific fest event."""
     __tablename__ = "event_registrations"
     __table_args__ = (
         UniqueConstraint("fest_pass_id", "event_id", name="uq_event_reg_pass_event"),
+        Index("ix_event_reg_event_status", "event_id", "approval_status"),
+        Index("ix_event_reg_hold_expires_at", "hold_expires_at"),
     )
 
     id              = Column(Integer, primary_key=True, index=True)
@@ -256,12 +333,30 @@ class EventRegistration(Base):
     event_id        = Column(Integer, ForeignKey("events.id"), nullable=False)
     approval_status = Column(Enum(RegApprovalStatusEnum), default=RegApprovalStatusEnum.pending)
     payment_status  = Column(Enum(RegPaymentStatusEnum), default=RegPaymentStatusEnum.unpaid)
+    # UTC; set while payment_status='held', released by the hold sweeper after
+    hold_expires_at = Column(DateTime(timezone=True), nullable=True)
     created_at      = Column(DateTime(timezone=True), server_default=func.now())
 
     fest_pass = relationship("FestPass", back_populates="registrations")
     event     = relationship("Event", back_populates="registrations")
 
 
+class EventWaitlistEntry(Base):
+    """
+    A waitlisted registration's place in line for a full event. Entries are
+    promoted in id order (FIFO) and deleted once the registration gets a seat.
+    """
+    __tablename__ = "event_waitlist"
+    __table_args__ = (
+        Index("ix_event_waitlist_event_order", "event_id", "id"),
+    )
+
+    id              = Column(Integer, primary_key=True)
+    event_id        = Column(Integer, ForeignKey("events.id"), nullable=False)
+    registration_id = Column(Integer, ForeignKey("event_registrations.id"), unique=True, nullable=False)
+    created_at      = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class Department(Base):
     __tablename__ = "departments"
     id           = Column(Integer, primary_key=True, index=True)
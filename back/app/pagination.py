@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) pagination helpers shared by the listing endpoints.
+
+Pages are ordered on a (sort column, id) pair and the cursor encodes the last
+row of the previous page, so every page is an index range scan instead of an
+OFFSET that re-reads everything before it. The cursor for the next page is
+returned in the X-Next-Cursor response header; the body stays a plain list
+so existing clients keep working.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple, List
+
+from fastapi import HTTPException, Response
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE     = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row into an opaque url-safe token."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_page(query, sort_col, id_col, cursor: Optional[str], limit: int, descending: bool = True) -> Tuple[List, Optional[str]]:
+    """
+    Return (rows, next_cursor) for one page of `query` ordered by (sort_col, id_col).
+
+    sort_col must be a DateTime column; next_cursor is None on the last page.
+    """
+    if cursor:
+        sort_value, id_value = decode_cursor(cursor, 2)
+        try:
+            sort_value = datetime.fromisoformat(sort_value)
+            id_value = int(id_value)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if descending:
+            query = query.filter(or_(
+                sort_col < sort_value,
+                and_(sort_col == sort_value, id_col < id_value),
+            ))
+        else:
+            query = query.filter(or_(
+                sort_col > sort_value,
+                and_(sort_col == sort_value, id_col > id_value),
+            ))
+
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+
+    # Fetch one extra row to learn whether another page exists
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
+
+
+def id_page(query, id_col, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Return (rows, next_cursor) for one page of `query` in ascending id order.
+
+    For queues worked oldest-first: ids follow insertion order, and unlike
+    server-side timestamps they never tie. Rows must expose `id_col.key`.
+    """
+    if cursor:
+        (id_value,) = decode_cursor(cursor, 1)
+        if not isinstance(id_value, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(id_col > id_value)
+
+    rows = query.order_by(id_col.asc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], id_col.key))
+    return rows, next_cursor
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    response.headers.update(next_cursor_headers(next_cursor))
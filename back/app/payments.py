@@ -0,0 +1,175 @@
+"""
+Payment providers.
+
+Requests never wait on a payment. A route commits its pending state first
+(a held seat, a pending pass) and then calls provider.create_checkout();
+the provider reports the outcome later by POSTing a batch of events to
+/api/payments/webhook:
+
+    {"events": [{"id": "<provider event id>", "payment_id": "...",
+                 "kind": "registration" | "pass", "reference": 42,
+                 "checkout_id": "...", "status": "succeeded" | "failed"}, ...]}
+
+`kind` / `reference` / `checkout_id` are the metadata we attached at
+checkout. A pass whose payment failed can be retried, so each of its
+checkouts gets a fresh checkout_id, stored on the Pass; only events of the
+current checkout settle it. The body is signed with HMAC-SHA256 under
+PAYMENT_WEBHOOK_SECRET, hex digest in the X-Payment-Signature header.
+Without that secret the webhook accepts nothing.
+
+PAYMENT_PROVIDER picks the implementation. The only one shipped is
+"local": a stand-in that decides every checkout as PAYMENT_LOCAL_OUTCOME
+and, every PAYMENT_LOCAL_DELAY seconds, delivers all outcomes decided
+since the last tick in one batch. With PAYMENT_WEBHOOK_URL set the batch
+goes out as a signed webhook call to that URL; otherwise it is settled in
+this process, through the same code the webhook runs, so the stand-in
+works wherever the API happens to listen. A real provider subclasses
+PaymentProvider and is installed with set_provider().
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import urllib.request
+import uuid
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_NAME   = os.getenv("PAYMENT_PROVIDER", "local")
+WEBHOOK_SECRET  = os.getenv("PAYMENT_WEBHOOK_SECRET") or None   # None → every webhook call is refused
+WEBHOOK_URL     = os.getenv("PAYMENT_WEBHOOK_URL") or None   # None → the local provider settles in-process
+LOCAL_OUTCOME   = os.getenv("PAYMENT_LOCAL_OUTCOME", "succeeded")
+LOCAL_DELAY     = float(os.getenv("PAYMENT_LOCAL_DELAY", 1))
+SIGNATURE_HEADER = "X-Payment-Signature"
+
+# What a checkout pays for; echoed back in the webhook
+KIND_REGISTRATION = "registration"   # EventRegistration holding a seat
+KIND_PASS         = "pass"           # city event Pass
+
+SUCCEEDED = "succeeded"
+FAILED    = "failed"
+
+
+def sign(body: bytes) -> str:
+    if WEBHOOK_SECRET is None:
+        raise RuntimeError("PAYMENT_WEBHOOK_SECRET is not set")
+    return hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    # Fail closed: with no secret configured no signature is valid
+    if WEBHOOK_SECRET is None or signature is None:
+        return False
+    return hmac.compare_digest(sign(body), signature)
+
+
+def new_checkout_id() -> str:
+    return uuid.uuid4().hex
+
+
+class PaymentProvider:
+    """Interface: start a checkout; the outcome arrives via the webhook."""
+
+    name = "base"
+
+    def create_checkout(self, kind: str, reference: int, amount: float, checkout_id: Optional[str] = None) -> str:
+        """Start collecting `amount` for (kind, reference); returns the provider payment id.
+        `checkout_id` is echoed back in the webhook event."""
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def _post_webhook(body: bytes, signature: str):
+    request = urllib.request.Request(
+        WEBHOOK_URL, data=body, method="POST",
+        headers={"Content-Type": "application/json", SIGNATURE_HEADER: signature},
+    )
+    with urllib.request.urlopen(request, timeout=10):
+        pass
+
+
+def _settle_in_process(body: bytes, signature: str):
+    # Imported here: the webhook route imports this module
+    from app.routes.payments import settle
+    settle(body)
+
+
+class LocalProvider(PaymentProvider):
+    """
+    In-process stand-in. Checkouts are decided immediately (as `outcome`)
+    but reported asynchronously, batched, like a real provider's webhooks.
+    """
+
+    name = "local"
+
+    def __init__(self, outcome: str = LOCAL_OUTCOME, delay: float = LOCAL_DELAY,
+                 deliver: Optional[Callable[[bytes, str], None]] = None):
+        self.outcome = outcome
+        self.delay = delay
+        self.deliver = deliver or (_post_webhook if WEBHOOK_URL else _settle_in_process)
+        if self.deliver is _post_webhook and WEBHOOK_SECRET is None:
+            raise RuntimeError("PAYMENT_WEBHOOK_URL is set but PAYMENT_WEBHOOK_SECRET is not")
+        self._lock = threading.Lock()
+        self._outbox: List[dict] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def create_checkout(self, kind: str, reference: int, amount: float, checkout_id: Optional[str] = None) -> str:
+        payment_id = f"local_{uuid.uuid4().hex}"
+        with self._lock:
+            self._outbox.append({"id": f"evt_{uuid.uuid4().hex}", "payment_id": payment_id,
+                                 "kind": kind, "reference": reference, "checkout_id": checkout_id,
+                                 "status": self.outcome})
+        return payment_id
+
+    def flush(self) -> int:
+        """Deliver every outcome decided so far in one webhook call."""
+        with self._lock:
+            events, self._outbox = self._outbox, []
+        if not events:
+            return 0
+        body = json.dumps({"events": events}).encode()
+        try:
+            # Settled in-process, nothing checks the signature
+            self.deliver(body, sign(body) if self.deliver is not _settle_in_process else "")
+        except Exception:
+            logger.exception("Local payment webhook delivery failed; will retry")
+            with self._lock:
+                self._outbox = events + self._outbox
+            return 0
+        return len(events)
+
+    def _run(self):
+        while not self._stop.wait(self.delay):
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="local-payment-provider", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+PROVIDERS = {LocalProvider.name: LocalProvider}
+
+provider: PaymentProvider = PROVIDERS[PROVIDER_NAME]()
+
+
+def set_provider(new_provider: PaymentProvider) -> PaymentProvider:
+    """Install a provider; returns the previous one."""
+    global provider
+    previous, provider = provider, new_provider
+    return previous
@@ -0,0 +1,428 @@
+"""
+Seat accounting and the FIFO waitlist for fest event registrations.
+
+Event.active_registrations counts the registrations holding a seat
+(approved + pending). It only moves through conditional UPDATEs on the
+event row, so the row lock decides who gets the last seat:
+
+    UPDATE events SET active_registrations = active_registrations + :n
+     WHERE id = :event
+       AND (registration_limit IS NULL OR active_registrations + :n <= registration_limit)
+
+When an event is full, the registration is stored as 'waitlisted' and an
+EventWaitlistEntry records its place in line. Seats free up when a
+registration is rejected or cancelled, or when the limit is raised; the
+request that frees them schedules promote() as a background task, which
+moves the head of the line into the free seats PROMOTION_BATCH_SIZE at a
+time, one short transaction per batch.
+
+Paid events do not take payment inside the request. The seat is *held*
+(payment_status='held', hold_expires_at = now + HOLD_TTL) and counts
+against the limit like any seated registration. confirm_payments() turns
+holds that are still live into paid + approved with one conditional
+UPDATE, fail_payments() deletes them and gives the seats back; both run
+on whole webhook batches (see app/payments.py). A hold that runs out is
+deleted by the hold sweeper, a background thread that releases
+HOLD_SWEEP_BATCH_SIZE expired holds per transaction off the
+hold_expires_at index and then promotes the affected waitlists.
+
+Apart from promote() and sweep_holds(), which open their own sessions, the
+functions here do not commit.
+"""
+
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, delete, exists, or_, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import models, payments
+from app.cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Waitlisted registrations promoted per transaction
+PROMOTION_BATCH_SIZE = 100
+
+HOLD_TTL              = timedelta(seconds=int(os.getenv("REGISTRATION_HOLD_TTL", 600)))
+HOLD_SWEEP_INTERVAL   = float(os.getenv("REGISTRATION_HOLD_SWEEP_INTERVAL", 5))
+HOLD_SWEEP_BATCH_SIZE = 1000
+
+# Statuses that hold a seat on the event's counter
+SEATED = (models.RegApprovalStatusEnum.approved, models.RegApprovalStatusEnum.pending)
+
+
+# ─── Seat counter ────────────────────────────────────────────────────────────
+
+def reserve_seats(db: Session, event_id: int, n: int = 1, *, queue_first: bool = True) -> bool:
+    """
+    Take n seats on the event's counter if they fit; False if not. With
+    queue_first, a non-empty waitlist also counts as full, so a new
+    registration cannot jump ahead of people already waiting.
+    """
+    conditions = [
+        models.Event.id == event_id,
+        or_(
+            models.Event.registration_limit.is_(None),
+            models.Event.active_registrations + n <= models.Event.registration_limit,
+        ),
+    ]
+    if queue_first:
+        conditions.append(~exists().where(models.EventWaitlistEntry.event_id == event_id))
+    return db.execute(
+        update(models.Event)
+        .where(*conditions)
+        .values(active_registrations=models.Event.active_registrations + n)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def reserve_seats_many(db: Session, seats: Dict[int, int]) -> bool:
+    """
+    Take seats on several events ({event_id: n}) in one conditional UPDATE,
+    bypassing the waitlist. False (and nothing to keep) unless every event
+    had room for its share.
+    """
+    wanted = case(seats, value=models.Event.id)
+    return db.execute(
+        update(models.Event)
+        .where(
+            models.Event.id.in_(seats),
+            or_(
+                models.Event.registration_limit.is_(None),
+                models.Event.active_registrations + wanted <= models.Event.registration_limit,
+            ),
+        )
+        .values(active_registrations=models.Event.active_registrations + wanted)
+        .execution_options(synchronize_session=False)
+    ).rowcount == len(seats)
+
+
+def release_seats(db: Session, event_id: int, n: int = 1):
+    """Give n seats back to the event's counter."""
+    if n:
+        release_seats_many(db, {event_id: n})
+
+
+def release_seats_many(db: Session, seats: Dict[int, int]):
+    """Give seats back to several events ({event_id: n}) in one UPDATE."""
+    if not seats:
+        return
+    db.execute(
+        update(models.Event)
+        .where(models.Event.id.in_(seats))
+        .values(active_registrations=models.Event.active_registrations - case(seats, value=models.Event.id))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def seated_statuses(event) -> dict:
+    """Column values for a registration that has just been given a seat."""
+    if event.is_paid:
+        return {"approval_status": models.RegApprovalStatusEnum.pending,
+                "payment_status":  models.RegPaymentStatusEnum.held,
+                "hold_expires_at": datetime.utcnow() + HOLD_TTL}
+    if event.approval_mode == models.ApprovalModeEnum.auto:
+        return {"approval_status": models.RegApprovalStatusEnum.approved}
+    return {"approval_status": models.RegApprovalStatusEnum.pending}
+
+
+# ─── Waitlist ────────────────────────────────────────────────────────────────
+
+def join_waitlist(db: Session, registration: models.EventRegistration):
+    """Queue a (new) registration for a full event."""
+    registration.approval_status = models.RegApprovalStatusEnum.waitlisted
+    db.add(registration)
+    db.flush()
+    db.add(models.EventWaitlistEntry(event_id=registration.event_id, registration_id=registration.id))
+
+
+def reject(db: Session, registration_ids: Sequence[int]) -> Tuple[int, Dict[int, int]]:
+    """
+    Reject registrations (of any events) in two set-based UPDATEs: seated
+    ones give their seat back, waitlisted ones leave the line. A held seat's
+    checkout is voided, so neither the payment webhook nor the hold sweeper
+    touches it afterwards. Registrations that were already rejected are
+    left alone. Returns (number rejected, {event_id: seats freed}); the
+    caller schedules promote() for those events.
+    """
+    if not registration_ids:
+        return 0, {}
+    reg = models.EventRegistration
+
+    def _flip(statuses) -> List[tuple]:
+        return db.execute(
+            update(reg)
+            .where(reg.id.in_(registration_ids), reg.approval_status.in_(statuses))
+            .values(
+                approval_status=models.RegApprovalStatusEnum.rejected,
+                payment_status=case(
+                    (reg.payment_status == models.RegPaymentStatusEnum.held, models.RegPaymentStatusEnum.unpaid),
+                    else_=reg.payment_status,
+                ),
+                hold_expires_at=None,
+            )
+            .returning(reg.id, reg.event_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    seated = _flip(SEATED)
+    freed = dict(Counter(event_id for _, event_id in seated))
+    release_seats_many(db, freed)
+
+    dropped = [rid for rid, _ in _flip([models.RegApprovalStatusEnum.waitlisted])]
+    if dropped:
+        db.execute(delete(models.EventWaitlistEntry).where(models.EventWaitlistEntry.registration_id.in_(dropped)))
+    return len(seated) + len(dropped), freed
+
+
+def approve(db: Session, registration_ids: Sequence[int]) -> Optional[int]:
+    """
+    Approve registrations (of any events) in two set-based UPDATEs.
+    Pending ones already hold their seat. Rejected ones of free events need
+    one again: their seats are reserved per event in a single conditional
+    UPDATE, for the batch as a whole. Returns the number approved, or None
+    if some event has no room for its share; the caller then rolls back.
+    Held seats (awaiting payment) are approved by the payment webhook only.
+    """
+    if not registration_ids:
+        return 0
+    reg = models.EventRegistration
+
+    def _flip(*criteria) -> List[int]:
+        return list(db.execute(
+            update(reg)
+            .where(reg.id.in_(registration_ids), *criteria)
+            .values(approval_status=models.RegApprovalStatusEnum.approved)
+            .returning(reg.event_id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+    approved = len(_flip(
+        reg.approval_status == models.RegApprovalStatusEnum.pending,
+        reg.payment_status != models.RegPaymentStatusEnum.held,
+    ))
+    reseated = Counter(_flip(
+        reg.approval_status == models.RegApprovalStatusEnum.rejected,
+        reg.event_id.in_(select(models.Event.id).where(models.Event.is_paid.isnot(True))),
+    ))
+    if reseated and not reserve_seats_many(db, dict(reseated)):
+        return None
+    return approved + sum(reseated.values())
+
+
+def cancel(db: Session, registration: models.EventRegistration) -> int:
+    """Withdraw a registration entirely; returns the number of seats freed (0 or 1)."""
+    freed = 0
+    if registration.approval_status in SEATED:
+        release_seats(db, registration.event_id)
+        freed = 1
+    elif registration.approval_status == models.RegApprovalStatusEnum.waitlisted:
+        db.execute(delete(models.EventWaitlistEntry).where(
+            models.EventWaitlistEntry.registration_id == registration.id))
+    db.delete(registration)
+    return freed
+
+
+def promote(bind: Engine, event_id: int) -> int:
+    """
+    Seat waitlisted registrations of an event, oldest first, while seats
+    are free. Runs outside the request (BackgroundTasks), in its own
+    session; returns how many were promoted.
+    """
+    W = models.EventWaitlistEntry
+    promoted = 0
+    with Session(bind) as db:
+        while True:
+            event = db.execute(
+                select(models.Event.registration_limit, models.Event.active_registrations,
+                       models.Event.is_paid, models.Event.approval_mode, models.Event.price)
+                .where(models.Event.id == event_id)
+            ).one_or_none()
+            if event is None:
+                break
+            free = PROMOTION_BATCH_SIZE
+            if event.registration_limit is not None:
+                free = min(free, event.registration_limit - event.active_registrations)
+            if free <= 0:
+                break
+            head = db.execute(
+                select(W.id, W.registration_id).where(W.event_id == event_id).order_by(W.id).limit(free)
+            ).all()
+            if not head:
+                break
+
+            # Flip first: a concurrent promoter blocks on these rows and then
+            # matches none of them, so it cannot take seats for them too.
+            seated = list(db.execute(
+                update(models.EventRegistration)
+                .where(
+                    models.EventRegistration.id.in_([r.registration_id for r in head]),
+                    models.EventRegistration.approval_status == models.RegApprovalStatusEnum.waitlisted,
+                )
+                .values(**seated_statuses(event))
+                .returning(models.EventRegistration.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+            if seated and not reserve_seats(db, event_id, len(seated), queue_first=False):
+                # Seats were taken meanwhile; re-read the counter and retry
+                db.rollback()
+                continue
+            db.execute(delete(W).where(W.id.in_([r.id for r in head])))
+            db.commit()
+            promoted += len(seated)
+            if event.is_paid:
+                start_checkouts(seated, event.price)
+
+    if promoted:
+        response_cache.invalidate("events")
+    return promoted
+
+
+# ─── Holds ───────────────────────────────────────────────────────────────────
+
+def confirm_payments(db: Session, registration_ids: Sequence[int], now: Optional[datetime] = None) -> List[int]:
+    """
+    Mark held registrations as paid + approved, in one UPDATE. Only holds
+    that are still live match, so a repeated or late confirmation changes
+    nothing. Returns the ids that were confirmed.
+    """
+    if not registration_ids:
+        return []
+    return list(db.execute(
+        update(models.EventRegistration)
+        .where(
+            models.EventRegistration.id.in_(registration_ids),
+            models.EventRegistration.approval_status == models.RegApprovalStatusEnum.pending,
+            models.EventRegistration.payment_status == models.RegPaymentStatusEnum.held,
+            models.EventRegistration.hold_expires_at > (now or datetime.utcnow()),
+        )
+        .values(
+            approval_status=models.RegApprovalStatusEnum.approved,
+            payment_status=models.RegPaymentStatusEnum.paid,
+            hold_expires_at=None,
+        )
+        .returning(models.EventRegistration.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def fail_payments(db: Session, registration_ids: Sequence[int]) -> Dict[int, int]:
+    """
+    Drop held registrations whose payment failed and give their seats back,
+    in one DELETE. Confirmed or already released registrations are left
+    alone. Returns {event_id: seats released}.
+    """
+    if not registration_ids:
+        return {}
+    reg = models.EventRegistration
+    released = Counter(db.execute(
+        delete(reg)
+        .where(
+            reg.id.in_(registration_ids),
+            reg.approval_status == models.RegApprovalStatusEnum.pending,
+            reg.payment_status == models.RegPaymentStatusEnum.held,
+        )
+        .returning(reg.event_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    release_seats_many(db, dict(released))
+    return dict(released)
+
+
+def start_checkouts(registration_ids: Sequence[int], amount: float):
+    """Ask the payment provider to collect for freshly held seats (after commit)."""
+    for registration_id in registration_ids:
+        payments.provider.create_checkout(payments.KIND_REGISTRATION, registration_id, amount)
+
+
+def expire_holds(db: Session, now: Optional[datetime] = None,
+                 limit: int = HOLD_SWEEP_BATCH_SIZE) -> Dict[int, int]:
+    """
+    Delete up to `limit` expired holds (oldest first, off the
+    hold_expires_at index) and give their seats back. Returns
+    {event_id: seats released}.
+    """
+    reg = models.EventRegistration
+    expired = (
+        select(reg.id)
+        .where(reg.hold_expires_at <= (now or datetime.utcnow()),
+               reg.approval_status == models.RegApprovalStatusEnum.pending,
+               reg.payment_status == models.RegPaymentStatusEnum.held)
+        .order_by(reg.hold_expires_at)
+        .limit(limit)
+    )
+    released = Counter(db.execute(
+        delete(reg).where(reg.id.in_(expired)).returning(reg.event_id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+    release_seats_many(db, dict(released))
+    return dict(released)
+
+
+def sweep_holds(session_factory: Callable[[], Session], now: Optional[datetime] = None) -> int:
+    """
+    Release every expired hold, one transaction per HOLD_SWEEP_BATCH_SIZE,
+    then seat the waitlists of the events that got seats back. Returns the
+    number of holds released.
+    """
+    events: Counter = Counter()
+    with session_factory() as db:
+        while True:
+            released = expire_holds(db, now, HOLD_SWEEP_BATCH_SIZE)
+            db.commit()
+            events.update(released)
+            if sum(released.values()) < HOLD_SWEEP_BATCH_SIZE:
+                break
+        bind = db.get_bind()
+    if events:
+        response_cache.invalidate("events")
+        for event_id in events:
+            promote(bind, event_id)
+    return sum(events.values())
+
+
+class HoldSweeper:
+    """Background thread running sweep_holds every HOLD_SWEEP_INTERVAL seconds."""
+
+    def __init__(self, session_factory: Callable[[], Session]):
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(HOLD_SWEEP_INTERVAL):
+            try:
+                sweep_holds(self.session_factory)
+            except Exception:
+                logger.exception("Registration hold sweep failed; will retry")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="registration-hold-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+sweeper: Optional[HoldSweeper] = None
+
+
+def start_sweeper(session_factory: Callable[[], Session]):
+    global sweeper
+    sweeper = HoldSweeper(session_factory)
+    sweeper.start()
+
+
+def stop_sweeper():
+    global sweeper
+    if sweeper is not None:
+        sweeper.stop()
+        sweeper = None
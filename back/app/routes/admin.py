@@ -1,57 +1,168 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import update
+from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
+from typing import List, Optional
 from app.database import get_db
 from app import models, schemas
+from app.crud import event_listing_query
+from app.cache import response_cache
+from app import search
 from app.auth.dependencies import require_admin
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, id_page, set_next_cursor
 
 router = APIRouter()
 
-@router.get("/organizer-requests")
-def get_organizer_requests(db: Session = Depends(get_db), _=Depends(require_admin)):
-    requests = db.query(models.OrganizerRequest).filter(models.OrganizerRequest.status == "pending").all()
-    return requests
+
+# ─── Set-based decisions (shared by the single and bulk endpoints) ───────────
+
+def _decide_organizer_requests(db: Session, ids: List[int], status: models.StatusEnum) -> int:
+    """
+    Move organizer requests to `status` in one UPDATE; approving also
+    promotes their users (never demoting an admin) in one more. Requests
+    already in that state are skipped. Returns how many changed.
+    """
+    user_ids = db.execute(
+        update(models.OrganizerRequest)
+        .where(models.OrganizerRequest.id.in_(ids), models.OrganizerRequest.status != status)
+        .values(status=status, reviewed_at=datetime.utcnow())
+        .returning(models.OrganizerRequest.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    if status == models.StatusEnum.approved and user_ids:
+        db.execute(
+            update(models.User)
+            .where(models.User.id.in_(user_ids), models.User.role == models.RoleEnum.user)
+            .values(role=models.RoleEnum.organizer)
+            .execution_options(synchronize_session=False)
+        )
+    return len(user_ids)
+
+
+def _decide_events(db: Session, ids: List[int], status: models.StatusEnum) -> int:
+    """
+    Move events to `status` in one UPDATE and bring the search index along
+    from the returned rows. Events already in that state are skipped.
+    Returns how many changed.
+    """
+    rows = db.execute(
+        update(models.Event)
+        .where(models.Event.id.in_(ids), models.Event.status != status)
+        .values(status=status)
+        .returning(models.Event.id, models.Event.status, models.Event.title,
+                   models.Event.description, models.Event.location, models.Event.category)
+        .execution_options(synchronize_session=False)
+    ).all()
+    search.sync_events(db, rows)
+    return len(rows)
+
+
+def _exists(db: Session, model, row_id: int) -> bool:
+    return db.query(model.id).filter(model.id == row_id).first() is not None
+
+
+# ─── Organizer requests ──────────────────────────────────────────────────────
+
+@router.get("/organizer-requests", response_model=List[schemas.OrganizerRequestQueueOut])
+def get_organizer_requests(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    _=Depends(require_admin),
+):
+    """Pending organizer requests, oldest first, with the requester joined in.
+
+    Paginated on id; pass the X-Next-Cursor header value back as ?cursor=.
+    """
+    query = (
+        db.query(
+            models.OrganizerRequest.id,
+            models.OrganizerRequest.user_id,
+            models.OrganizerRequest.status,
+            models.OrganizerRequest.requested_at,
+            models.User.name.label("user_name"),
+            models.User.email.label("user_email"),
+        )
+        .join(models.User, models.User.id == models.OrganizerRequest.user_id)
+        .filter(models.OrganizerRequest.status == models.StatusEnum.pending)
+    )
+    rows, next_cursor = id_page(query, models.OrganizerRequest.id, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return rows
+
+@router.post("/organizer-requests/decisions", response_model=schemas.BulkDecisionResult)
+def decide_organizer_requests(data: schemas.AdminBulkDecision, db: Session = Depends(get_db), _=Depends(require_admin)):
+    """Approve or reject many organizer requests with one UPDATE (plus one for roles) and one commit."""
+    ids = sorted(set(data.ids))
+    decided = _decide_organizer_requests(db, ids, models.StatusEnum(data.status))
+    db.commit()
+    return schemas.BulkDecisionResult(matched=len(ids), decided=decided)
 
 @router.post("/organizer-requests/{request_id}/approve")
 def approve_organizer(request_id: int, db: Session = Depends(get_db), _=Depends(require_admin)):
-    req = db.query(models.OrganizerRequest).filter(models.OrganizerRequest.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    req.status = models.StatusEnum.approved
-    req.reviewed_at = datetime.utcnow()
-    user = db.query(models.User).filter(models.User.id == req.user_id).first()
-    user.role = models.RoleEnum.organizer
+    if not _decide_organizer_requests(db, [request_id], models.StatusEnum.approved):
+        if not _exists(db, models.OrganizerRequest, request_id):
+            raise HTTPException(status_code=404, detail="Request not found")
     db.commit()
     return {"message": "Organizer approved"}
 
 @router.post("/organizer-requests/{request_id}/reject")
 def reject_organizer(request_id: int, db: Session = Depends(get_db), _=Depends(require_admin)):
-    req = db.query(models.OrganizerRequest).filter(models.OrganizerRequest.id == request_id).first()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    req.status = models.StatusEnum.rejected
-    req.reviewed_at = datetime.utcnow()
+    if not _decide_organizer_requests(db, [request_id], models.StatusEnum.rejected):
+        if not _exists(db, models.OrganizerRequest, request_id):
+            raise HTTPException(status_code=404, detail="Request not found")
     db.commit()
     return {"message": "Request rejected"}
 
-@router.get("/events/pending")
-def get_pending_events(db: Session = Depends(get_db), _=Depends(require_admin)):
-    return db.query(models.Event).filter(models.Event.status == "pending").all()
+
+# ─── Events ──────────────────────────────────────────────────────────────────
+
+@router.get("/events/pending", response_model=List[schemas.PendingEventOut])
+def get_pending_events(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    _=Depends(require_admin),
+):
+    """Events awaiting moderation, oldest first, with submitter, fest and
+    college joined into the same query.
+
+    Paginated on id; pass the X-Next-Cursor header value back as ?cursor=.
+    """
+    query = (
+        event_listing_query(db)
+        .options(joinedload(models.Event.organizer))
+        .filter(models.Event.status == models.StatusEnum.pending)
+    )
+    events, next_cursor = id_page(query, models.Event.id, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return events
+
+@router.post("/events/decisions", response_model=schemas.BulkDecisionResult)
+def decide_events(data: schemas.AdminBulkDecision, db: Session = Depends(get_db), _=Depends(require_admin)):
+    """Approve or reject many events with one UPDATE and one commit."""
+    ids = sorted(set(data.ids))
+    decided = _decide_events(db, ids, models.StatusEnum(data.status))
+    db.commit()
+    response_cache.invalidate("events")
+    return schemas.BulkDecisionResult(matched=len(ids), decided=decided)
 
 @router.post("/events/{event_id}/approve")
 def approve_event(event_id: int, db: Session = Depends(get_db), _=Depends(require_admin)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    event.status = models.StatusEnum.approved
+    if not _decide_events(db, [event_id], models.StatusEnum.approved):
+        if not _exists(db, models.Event, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
     db.commit()
+    response_cache.invalidate("events")
     return {"message": "Event approved"}
 
 @router.post("/events/{event_id}/reject")
 def reject_event(event_id: int, db: Session = Depends(get_db), _=Depends(require_admin)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    event.status = models.StatusEnum.rejected
+    if not _decide_events(db, [event_id], models.StatusEnum.rejected):
+        if not _exists(db, models.Event, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
     db.commit()
-    return {"message": "Event rejected"}
\ No newline at end of file
+    response_cache.invalidate("events")
+    return {"message": "Event rejected"}
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
-from app.database import get_db
+from app.database import get_async_db
 from app import models, schemas
 from app.auth.jwt import create_token
 
@@ -12,27 +14,30 @@ pwd = CryptContext(
     bcrypt__truncate_error=False,  # truncate >72 bytes to avoid backend ValueError
 )
 
+async def _user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(models.User).where(models.User.email == email))).scalars().first()
+
 @router.post("/signup", response_model=schemas.Token)
-def signup(data: schemas.SignupEmail, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.email == data.email).first()
-    if existing:
+async def signup(data: schemas.SignupEmail, db: AsyncSession = Depends(get_async_db)):
+    if await _user_by_email(db, data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
     user = models.User(
         name=data.name,
         email=data.email,
-        hashed_password=pwd.hash(data.password),
+        # bcrypt is deliberately slow CPU work: keep it off the event loop
+        hashed_password=await run_in_threadpool(pwd.hash, data.password),
         auth_provider=models.AuthProviderEnum.email,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     token = create_token({"sub": str(user.id), "role": user.role})
     return {"access_token": token, "token_type": "bearer", "role": user.role, "interests_set": user.interests_set}
 
 @router.post("/login", response_model=schemas.Token)
-def login(data: schemas.LoginEmail, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == data.email).first()
-    if not user or not pwd.verify(data.password, user.hashed_password):
+async def login(data: schemas.LoginEmail, db: AsyncSession = Depends(get_async_db)):
+    user = await _user_by_email(db, data.email)
+    if not user or not await run_in_threadpool(pwd.verify, data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     token = create_token({"sub": str(user.id), "role": user.role})
     return {"access_token": token, "token_type": "bearer", "role": user.role, "interests_set": user.interests_set}
\ No newline at end of file
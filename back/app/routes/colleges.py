@@ -1,24 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app import models, schemas
+from app.crud import event_listing_query, college_query
+from app.cache import COLLEGE_TABLES, EVENT_TABLES, response_cache
+from app.conditional import conditional_json, touch_after_delete
 from app.auth.dependencies import require_admin
+from app import search
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, next_cursor_headers
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[schemas.CollegeOut])
-def get_colleges(db: Session = Depends(get_db)):
-    return db.query(models.College).order_by(models.College.name).all()
+def get_colleges(request: Request, db: Session = Depends(get_db)):
+    def build():
+        return college_query(db).order_by(models.College.name).all(), {}
+
+    return conditional_json(request, db, ("colleges.list",), COLLEGE_TABLES, List[schemas.CollegeOut], build)
 
 
 @router.get("/{college_id}", response_model=schemas.CollegeOut)
-def get_college(college_id: int, db: Session = Depends(get_db)):
-    college = db.query(models.College).filter(models.College.id == college_id).first()
-    if not college:
-        raise HTTPException(status_code=404, detail="College not found")
-    return college
+def get_college(request: Request, college_id: int, db: Session = Depends(get_db)):
+    def build():
+        college = college_query(db).filter(models.College.id == college_id).first()
+        if not college:
+            raise HTTPException(status_code=404, detail="College not found")
+        return college, {}
+
+    return conditional_json(request, db, ("colleges.detail", college_id), COLLEGE_TABLES, schemas.CollegeOut, build)
 
 
 @router.post("/", response_model=schemas.CollegeOut)
@@ -28,7 +39,10 @@ def create_college(data: schemas.CollegeCreate, db: Session = Depends(get_db), _
         raise HTTPException(status_code=400, detail="College already exists")
     college = models.College(**data.dict())
     db.add(college)
+    db.flush()
+    search.sync_college(db, college)
     db.commit()
+    response_cache.invalidate("colleges")
     db.refresh(college)
     return college
 
@@ -40,9 +54,10 @@ def update_college(college_id: int, data: schemas.CollegeCreate, db: Session = D
         raise HTTPException(status_code=404, detail="College not found")
     for k, v in data.dict(exclude_unset=True).items():
         setattr(college, k, v)
+    search.sync_college(db, college)
     db.commit()
-    db.refresh(college)
-    return college
+    response_cache.invalidate("colleges")
+    return college_query(db).filter(models.College.id == college_id).first()
 
 
 @router.delete("/{college_id}")
@@ -53,18 +68,32 @@ def delete_college(college_id: int, db: Session = Depends(get_db), _=Depends(req
     # Unlink events before deleting
     db.query(models.Event).filter(models.Event.college_id == college_id).update({"college_id": None})
     db.delete(college)
+    db.flush()
+    touch_after_delete(db, models.College)
+    search.remove_college(db, college_id)
     db.commit()
+    response_cache.invalidate("colleges", "events")
     return {"message": "College deleted"}
 
 
 @router.get("/{college_id}/events", response_model=List[schemas.EventOut])
-def get_college_events(college_id: int, db: Session = Depends(get_db)):
-    college = db.query(models.College).filter(models.College.id == college_id).first()
-    if not college:
-        raise HTTPException(status_code=404, detail="College not found")
-    return (
-        db.query(models.Event)
-        .filter(models.Event.college_id == college_id, models.Event.status == "approved")
-        .order_by(models.Event.date.desc())
-        .all()
-    )
+def get_college_events(
+    request: Request,
+    college_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    def build():
+        college = db.query(models.College).filter(models.College.id == college_id).first()
+        if not college:
+            raise HTTPException(status_code=404, detail="College not found")
+        query = event_listing_query(db).filter(
+            models.Event.college_id == college_id,
+            models.Event.status == models.StatusEnum.approved,
+        )
+        events, next_cursor = keyset_page(query, models.Event.date, models.Event.id, cursor, limit)
+        return events, next_cursor_headers(next_cursor)
+
+    key = ("colleges.events", college_id, cursor, limit)
+    return conditional_json(request, db, key, EVENT_TABLES, List[schemas.EventOut], build)
@@ -4,33 +4,66 @@ Mounted under /api/fests by main.py — so paths here are relative.
 
   POST   /api/fests/{slug}/entry-pass       → claim / get existing pass
   GET    /api/fests/{slug}/my-pass          → fetch current user's pass
+  GET    /api/fests/{slug}/pass-keys        → pass-signing keys for gate devices (privileged)
+  POST   /api/fests/{slug}/pass-keys/rotate → new key version, re-sign every pass (privileged)
+  PATCH  /api/fests/{slug}/passes/{pass_id}/status → block / unblock a pass (privileged)
+  GET    /api/fests/{slug}/gate-manifest    → pass states for gate devices, full or delta (privileged)
+  POST   /api/fests/{slug}/gate-scan        → QR gate check-in by printed qr_code (privileged)
+  POST   /api/fests/{slug}/gate-scan/batch  → bulk upload of offline gate scans (privileged)
   POST   /api/fests/{slug}/gate-scan/{pass_id} → QR gate check-in (privileged)
+  WS     /api/fests/{slug}/gate?token=…     → continuous gate scanning over one connection (privileged)
 """
 
+import json
+import logging
+import time
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app import models, schemas
-from app.auth.dependencies import get_current_user
+from app.database import get_async_db, get_db, get_session_factory
+from app import gate, gate_journal, models, pass_tokens, schemas
+from app.auth.dependencies import get_current_user, get_current_user_async
+from app.auth.jwt import decode_token
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _get_gate_fest(slug: str, db: Session, user: models.User) -> models.Fest:
+    """Resolve a fest by slug, requiring admin OR owner/core member for gate access."""
+    fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
+    if not fest:
+        raise HTTPException(status_code=404, detail="Fest not found")
+
+    # Permission: must be admin or a fest owner/core
+    is_privileged = user.role == models.RoleEnum.admin or (
+        db.query(models.FestMember)
+        .filter(
+            models.FestMember.fest_id == fest.id,
+            models.FestMember.user_id == user.id,
+            models.FestMember.role.in_([
+                models.FestMemberRoleEnum.owner,
+                models.FestMemberRoleEnum.core,
+            ]),
+        )
+        .first()
+        is not None
+    )
+    if not is_privileged:
+        raise HTTPException(status_code=403, detail="Gate access requires owner or core member role")
+    return fest
 
 
 # ─── POST /fests/{slug}/entry-pass ───────────────────────────────────────────
 
-@router.post("/{slug}/entry-pass", response_model=schemas.FestPassOut, status_code=status.HTTP_201_CREATED)
-def claim_entry_pass(
-    slug: str,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
-):
-    """
-    Issue a FestPass to the current user for the given fest.
-    Entry is always free.
-    If the user already has a pass, return it (idempotent).
-    """
+def _claim_entry_pass(db: Session, slug: str, current_user: models.User) -> schemas.FestPassOut:
     fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
     if not fest:
         raise HTTPException(status_code=404, detail="Fest not found")
@@ -47,19 +80,37 @@ def claim_entry_pass(
         .first()
     )
     if existing:
-        return existing
+        return schemas.FestPassOut.model_validate(existing)
 
     fest_pass = models.FestPass(
         user_id    = current_user.id,
         fest_id    = fest.id,
         status     = models.FestPassStatusEnum.approved,
-        qr_code    = str(uuid.uuid4()),
+        qr_code    = str(uuid.uuid4()),   # placeholder until the id is known
         checked_in = False,
     )
+    fest_pass.change_seq = gate.next_change_seq(db, fest.id)
     db.add(fest_pass)
+    db.flush()
+    fest_pass.qr_code = pass_tokens.issue(fest_pass.id, fest.id, current_user.id, fest.pass_key_version)
     db.commit()
     db.refresh(fest_pass)
-    return fest_pass
+    return schemas.FestPassOut.model_validate(fest_pass)
+
+
+@router.post("/{slug}/entry-pass", response_model=schemas.FestPassOut, status_code=status.HTTP_201_CREATED)
+async def claim_entry_pass(
+    slug: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """
+    Issue a FestPass to the current user for the given fest.
+    Entry is always free.
+    If the user already has a pass, return it (idempotent).
+    The pass's qr_code is a signed token (see app/pass_tokens.py).
+    """
+    return await db.run_sync(_claim_entry_pass, slug, current_user)
 
 
 # ─── GET /fests/{slug}/my-pass ───────────────────────────────────────────────
@@ -88,14 +139,314 @@ def get_my_pass(
     return fest_pass
 
 
-# ─── POST /fests/{slug}/gate-scan/{pass_id} ──────────────────────────────────
+# ─── GET /fests/{slug}/pass-keys ─────────────────────────────────────────────
 
-@router.post("/{slug}/gate-scan/{pass_id}", response_model=schemas.FestPassOut)
-def gate_scan(
+def _pass_key_out(fest: models.Fest) -> schemas.PassKeyOut:
+    versions = pass_tokens.accepted_versions(fest.pass_key_version, fest.pass_key_rotated_at)
+    keys = {v: pass_tokens.encode_key(pass_tokens.fest_key(fest.id, v)) for v in versions}
+    return schemas.PassKeyOut(
+        fest_id=fest.id,
+        key_version=fest.pass_key_version,
+        algorithm=pass_tokens.ALGORITHM,
+        key=keys[fest.pass_key_version],
+        keys=keys,
+        grace_until=fest.pass_key_rotated_at + pass_tokens.KEY_GRACE if len(versions) > 1 else None,
+    )
+
+
+@router.get("/{slug}/pass-keys", response_model=schemas.PassKeyOut)
+def get_pass_key(
+    slug: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Keys for verifying this fest's pass tokens on a gate device without a
+    network round trip: the current version, plus the previous one until
+    grace_until after a rotation. Requires: fest owner, core member, or admin.
+    """
+    return _pass_key_out(_get_gate_fest(slug, db, current_user))
+
+
+# ─── POST /fests/{slug}/pass-keys/rotate ─────────────────────────────────────
+
+@router.post("/{slug}/pass-keys/rotate", response_model=schemas.PassKeyOut)
+def rotate_pass_key(
+    slug: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Move the fest to a new key version and re-sign every pass under it.
+    Attendees see the new code on their pass; codes already shown or
+    printed keep working (offline and at the server) for
+    PASS_KEY_GRACE_SECONDS, after which codes signed with the old key stop
+    working. A fest can be rotated up to pass_tokens.MAX_KEY_VERSION.
+    Requires: fest owner, core member, or admin.
+    """
+    fest = _get_gate_fest(slug, db, current_user)
+    if fest.pass_key_version >= pass_tokens.MAX_KEY_VERSION:
+        raise HTTPException(status_code=409, detail="Pass key rotation limit reached for this fest")
+    fest.pass_key_version += 1
+    fest.pass_key_rotated_at = datetime.utcnow()
+    issued_at = int(time.time())
+    rows = [
+        {
+            "id": pass_id,
+            "qr_code": pass_tokens.issue(pass_id, fest.id, user_id, fest.pass_key_version, issued_at),
+        }
+        for pass_id, user_id in db.query(models.FestPass.id, models.FestPass.user_id)
+        .filter(models.FestPass.fest_id == fest.id)
+    ]
+    if rows:
+        # ORM bulk UPDATE by primary key: one executemany
+        db.execute(update(models.FestPass), rows)
+        # Pass rows before the fest's counter, the order admission locks them in
+        db.execute(
+            update(models.FestPass)
+            .where(models.FestPass.fest_id == fest.id)
+            .values(change_seq=gate.next_change_seq(db, fest.id))
+        )
+    db.commit()
+    if gate_journal.journal is not None:
+        gate_journal.journal.forget(fest.id)
+    return _pass_key_out(fest)
+
+
+# ─── PATCH /fests/{slug}/passes/{pass_id}/status ─────────────────────────────
+
+@router.patch("/{slug}/passes/{pass_id}/status", response_model=schemas.FestPassOut)
+def set_pass_status(
     slug: str,
     pass_id: int,
+    data: schemas.FestPassStatusUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Block (or unblock) an entry pass. Requires: fest owner, core member, or admin."""
+    fest = _get_gate_fest(slug, db, current_user)
+    fest_pass = (
+        db.query(models.FestPass)
+        .filter(models.FestPass.id == pass_id, models.FestPass.fest_id == fest.id)
+        .first()
+    )
+    if not fest_pass:
+        raise HTTPException(status_code=404, detail="Pass not found")
+
+    fest_pass.status = models.FestPassStatusEnum(data.status)
+    db.flush()  # pass row before the fest's counter, the order admission locks them in
+    fest_pass.change_seq = gate.next_change_seq(db, fest.id)
+    db.commit()
+    if gate_journal.journal is not None:
+        gate_journal.journal.forget(fest.id)
+    db.refresh(fest_pass)
+    return fest_pass
+
+
+# ─── GET /fests/{slug}/gate-manifest ─────────────────────────────────────────
+
+@router.get("/{slug}/gate-manifest", response_model=schemas.GateManifestOut)
+def get_gate_manifest(
+    slug: str,
+    since: Optional[int] = Query(None, ge=0),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
+):
+    """
+    Pass states for a gate device's local cache.
+
+    Without `since` → every pass of the fest (cold start). With `since` →
+    only passes created, re-signed, blocked / unblocked or checked in after
+    that cursor. Either way the response carries the cursor for the next
+    poll; an idle poll is an index range scan that returns no rows.
+
+    Requires: fest owner, core member, or admin.
+    """
+    fest = _get_gate_fest(slug, db, current_user)
+    cursor, rows = gate.manifest(db, fest.id, since)
+    return {
+        "fest_id": fest.id, "cursor": cursor, "full": since is None,
+        "fields": gate.MANIFEST_FIELDS, "passes": rows,
+    }
+
+
+# ─── POST /fests/{slug}/gate-scan ────────────────────────────────────────────
+
+# Gate result → HTTP error raised by the single-scan endpoints
+SCAN_ERRORS = {
+    gate.UNKNOWN:      (404, "Pass not found"),
+    gate.BLOCKED:      (400, "Pass is blocked — entry denied"),
+    gate.ALREADY_USED: (400, "Pass already used — entry denied"),
+}
+
+
+def _scan(db: Session, fest_id: int, gate_id=None, scanned_at=None, *, qr_code=None, pass_id=None):
+    """Admit through the write-behind journal when it is enabled, else straight to the DB."""
+    if gate_journal.journal is not None:
+        return gate_journal.journal.scan(db, fest_id, gate_id, scanned_at, qr_code=qr_code, pass_id=pass_id)
+    if qr_code is not None:
+        return gate.scan_qr(db, fest_id, qr_code, gate_id=gate_id, scanned_at=scanned_at)
+    return gate.scan_pass_id(db, fest_id, pass_id, gate_id=gate_id, scanned_at=scanned_at)
+
+
+def _scan_response(result: str, fest_pass) -> schemas.FestPassOut:
+    if result != gate.ADMITTED:
+        code, detail = SCAN_ERRORS[result]
+        raise HTTPException(status_code=code, detail=detail)
+    # Serialize from the RETURNING row now, before commit expires it
+    return schemas.FestPassOut.model_validate(fest_pass)
+
+
+def _gate_scan(db: Session, slug: str, user: models.User, gate_id: Optional[str] = None, *,
+               qr_code: Optional[str] = None, pass_id: Optional[int] = None) -> schemas.FestPassOut:
+    fest = _get_gate_fest(slug, db, user)
+    result, fest_pass = _scan(db, fest.id, gate_id, qr_code=qr_code, pass_id=pass_id)
+    response = _scan_response(result, fest_pass)
+    db.commit()
+    return response
+
+
+def _gate_scan_journaled(journal: gate_journal.GateJournal, slug: str, user: models.User,
+                         gate_id: Optional[str] = None, **target) -> schemas.FestPassOut:
+    db = journal.session_factory()
+    try:
+        return _gate_scan(db, slug, user, gate_id, **target)
+    finally:
+        db.close()
+
+
+async def _gate_scan_async(db: AsyncSession, slug: str, user: models.User,
+                           gate_id: Optional[str] = None, **target) -> schemas.FestPassOut:
+    journal = gate_journal.journal
+    if journal is not None:
+        # The journal serializes scans on a threading.Lock: keep it off the event loop
+        return await run_in_threadpool(_gate_scan_journaled, journal, slug, user, gate_id, **target)
+    return await db.run_sync(_gate_scan, slug, user, gate_id, **target)
+
+
+@router.post("/{slug}/gate-scan", response_model=schemas.FestPassOut)
+async def gate_scan_qr(
+    slug: str,
+    data: schemas.GateScanIn,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+):
+    """
+    QR gate verification by the code printed on the pass.
+
+    Admission is one conditional UPDATE (see app/gate.py), so concurrent
+    scans of the same code admit exactly once. Records the check-in time
+    and the scanning gate. With GATE_WRITE_BEHIND on, the scan is decided in
+    memory and journaled instead, in the threadpool (see app/gate_journal.py).
+
+    Requires: fest owner, core member, or admin.
+    """
+    return await _gate_scan_async(db, slug, current_user, data.gate_id, qr_code=data.qr_code)
+
+
+# ─── POST /fests/{slug}/gate-scan/batch ──────────────────────────────────────
+# Declared before /gate-scan/{pass_id} so "batch" is not parsed as a pass id.
+
+@router.post("/{slug}/gate-scan/batch", response_model=List[schemas.GateScanResult])
+def gate_scan_batch(
+    slug: str,
+    data: schemas.GateScanBatch,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Apply a batch of scans queued offline by gate devices, in one transaction.
+
+    Scans are replayed in scanned_at order (ties keep upload order), so when
+    the same pass was scanned more than once — on one device or several —
+    the earliest scan admits and every later one is "already_used". Passes
+    are resolved with one IN query and admitted with one UPDATE that records
+    each admitting scan's time and device, and only flips passes that are
+    still approved and unused; a pass checked in concurrently through
+    another path also comes back as "already_used", and one blocked in the
+    meantime as "blocked".
+
+    Returns one result per uploaded scan, in upload order.
+    Requires: fest owner, core member, or admin.
+    """
+    fest = _get_gate_fest(slug, db, current_user)
+    order = sorted(range(len(data.scans)), key=lambda i: (gate.utc_naive(data.scans[i].scanned_at), i))
+    outcomes = [None] * len(data.scans)
+
+    if gate_journal.journal is not None:
+        # Write-behind: replay the scans one by one against the journal's memory
+        for i in order:
+            item = data.scans[i]
+            result, entry = gate_journal.journal.scan(db, fest.id, item.device_id, item.scanned_at,
+                                                      qr_code=item.qr_code)
+            outcomes[i] = (result, entry["id"] if entry else None)
+        return _batch_results(data, outcomes)
+
+    qr_codes = {item.qr_code for item in data.scans}
+    columns = (models.FestPass.id, models.FestPass.qr_code, models.FestPass.status, models.FestPass.checked_in)
+    passes = {
+        row.qr_code: row
+        for row in db.query(*columns).filter(
+            models.FestPass.fest_id == fest.id,
+            models.FestPass.qr_code.in_(qr_codes),
+        )
+    } if qr_codes else {}
+    # Codes printed before a key rotation re-signed their passes
+    previous = gate.previous_key_passes(db, fest.id, qr_codes - passes.keys())
+    if previous:
+        by_id = {
+            row.id: row
+            for row in db.query(*columns).filter(
+                models.FestPass.fest_id == fest.id,
+                models.FestPass.id.in_(previous.values()),
+            )
+        }
+        passes.update({code: by_id[pass_id] for code, pass_id in previous.items() if pass_id in by_id})
+
+    admitted = {}  # pass id → index of the admitting scan
+    for i in order:
+        fest_pass = passes.get(data.scans[i].qr_code)
+        if fest_pass is None:
+            outcomes[i] = (gate.UNKNOWN, None)
+        elif fest_pass.status != models.FestPassStatusEnum.approved:
+            outcomes[i] = (gate.BLOCKED, fest_pass.id)
+        elif fest_pass.checked_in or fest_pass.id in admitted:
+            outcomes[i] = (gate.ALREADY_USED, fest_pass.id)
+        else:
+            admitted[fest_pass.id] = i
+            outcomes[i] = (gate.ADMITTED, fest_pass.id)
+
+    if admitted:
+        flipped = gate.admit_many(db, fest.id, {
+            pass_id: (data.scans[i].scanned_at, data.scans[i].device_id)
+            for pass_id, i in admitted.items()
+        })
+        # Checked in or blocked through another path since the SELECT above
+        for pass_id, result in gate.refusals(db, fest.id, admitted.keys() - flipped).items():
+            outcomes[admitted[pass_id]] = (result, pass_id)
+        db.commit()
+
+    return _batch_results(data, outcomes)
+
+
+def _batch_results(data: schemas.GateScanBatch, outcomes) -> List[schemas.GateScanResult]:
+    return [
+        schemas.GateScanResult(
+            qr_code=item.qr_code, scanned_at=item.scanned_at, device_id=item.device_id,
+            pass_id=pass_id, result=result,
+        )
+        for item, (result, pass_id) in zip(data.scans, outcomes)
+    ]
+
+
+# ─── POST /fests/{slug}/gate-scan/{pass_id} ──────────────────────────────────
+
+@router.post("/{slug}/gate-scan/{pass_id}", response_model=schemas.FestPassOut)
+async def gate_scan(
+    slug: str,
+    pass_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
 ):
     """
     QR gate verification endpoint.
@@ -106,47 +457,103 @@ def gate_scan(
       - checked_in must be False
       - Does NOT check event registrations
 
+    Same atomic admission as the qr_code endpoint.
     Requires: fest owner, core member, or admin.
     """
-    fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
-    if not fest:
-        raise HTTPException(status_code=404, detail="Fest not found")
+    return await _gate_scan_async(db, slug, current_user, pass_id=pass_id)
 
-    # Permission: must be admin or a fest owner/core
-    is_privileged = current_user.role == models.RoleEnum.admin or (
-        db.query(models.FestMember)
-        .filter(
-            models.FestMember.fest_id == fest.id,
-            models.FestMember.user_id == current_user.id,
-            models.FestMember.role.in_([
-                models.FestMemberRoleEnum.owner,
-                models.FestMemberRoleEnum.core,
-            ]),
-        )
-        .first()
-        is not None
-    )
-    if not is_privileged:
-        raise HTTPException(status_code=403, detail="Gate access requires owner or core member role")
 
-    fest_pass = (
-        db.query(models.FestPass)
-        .filter(
-            models.FestPass.id == pass_id,
-            models.FestPass.fest_id == fest.id,
-        )
-        .first()
-    )
-    if not fest_pass:
-        raise HTTPException(status_code=404, detail="Pass not found")
+# ─── WS /fests/{slug}/gate ───────────────────────────────────────────────────
 
-    if fest_pass.status != models.FestPassStatusEnum.approved:
-        raise HTTPException(status_code=400, detail="Pass is blocked — entry denied")
+# Close codes sent when the handshake is refused (4000–4999 are app-defined)
+WS_UNAUTHORIZED = 4401
+WS_FORBIDDEN    = 4403
+WS_NOT_FOUND    = 4404
 
-    if fest_pass.checked_in:
-        raise HTTPException(status_code=400, detail="Pass already used — entry denied")
 
-    fest_pass.checked_in = True
+def _authorize_gate(db: Session, slug: str, token: Optional[str]) -> models.Fest:
+    """Token → user → fest + privilege check, raising HTTPException like the HTTP routes."""
+    payload = decode_token(token) if token else None
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = db.query(models.User).filter(models.User.id == payload.get("sub")).first()
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return _get_gate_fest(slug, db, user)
+
+
+def _scan_and_commit(db: Session, fest_id: int, gate_id: Optional[str], qr_code: str) -> dict:
+    result, fest_pass = _scan(db, fest_id, gate_id, qr_code=qr_code)
+    verdict = {"result": result, "pass_id": None}
+    if fest_pass is not None:
+        out = schemas.FestPassOut.model_validate(fest_pass)
+        verdict.update(pass_id=out.id, checked_in_at=out.checked_in_at.isoformat() if out.checked_in_at else None)
     db.commit()
-    db.refresh(fest_pass)
-    return fest_pass
+    return verdict
+
+
+def _scan_in_session(sessions: Callable[[], Session], fest_id: int, gate_id: Optional[str], qr_code: str) -> dict:
+    """One socket message: its own short session, and a database error is that scan's verdict only."""
+    with sessions() as db:
+        try:
+            return _scan_and_commit(db, fest_id, gate_id, qr_code)
+        except SQLAlchemyError:
+            db.rollback()
+            logger.exception("Gate scan failed for fest %s", fest_id)
+            return {"result": "error", "pass_id": None}
+
+
+@router.websocket("/{slug}/gate")
+async def gate_socket(
+    websocket: WebSocket,
+    slug: str,
+    token: Optional[str] = None,
+    gate_id: Optional[str] = None,
+    db: Session = Depends(get_db),
+    sessions: Callable[[], Session] = Depends(get_session_factory),
+):
+    """
+    Persistent gate channel for scanner devices.
+
+    The JWT (query param `token`, since browsers cannot set headers on a
+    WebSocket) and the owner / core / admin check are verified once, at
+    connect. After that every message is a scan:
+
+        → {"qr_code": "...", "ref": <anything, echoed back>}
+        ← {"ref": ..., "result": "admitted" | "already_used" | "blocked" | "unknown" | "error",
+           "pass_id": 12, "checked_in_at": "..."}
+
+    so a scan costs only the admission itself (see app/gate.py), run in the
+    threadpool in a session of its own; a database error answers that one
+    message with "error" and the socket stays open. A refused handshake
+    closes with 4401 / 4403 / 4404. Access is not re-checked for the life of
+    the connection.
+    """
+    try:
+        fest_id = (await run_in_threadpool(_authorize_gate, db, slug, token)).id
+    except HTTPException as exc:
+        code = {401: WS_UNAUTHORIZED, 403: WS_FORBIDDEN}.get(exc.status_code, WS_NOT_FOUND)
+        await websocket.close(code=code, reason=exc.detail)
+        return
+    finally:
+        # The socket can stay open for hours: don't hold the handshake's connection
+        await run_in_threadpool(db.close)
+    await websocket.accept()
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                message = {}
+            qr_code = message.get("qr_code")
+            if not isinstance(qr_code, str) or not qr_code:
+                await websocket.send_json({"ref": message.get("ref"), "result": "invalid",
+                                           "detail": "qr_code is required"})
+                continue
+            verdict = await run_in_threadpool(_scan_in_session, sessions, fest_id, gate_id, qr_code)
+            await websocket.send_json({"ref": message.get("ref"), **verdict})
+    except WebSocketDisconnect:
+        pass
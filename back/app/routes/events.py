@@ -1,81 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, case, func, or_, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from app.database import get_db
-from app import models, schemas
+from app import models, registrations, schemas
+from app.crud import event_listing_query, get_event_by_id
 from app.auth.dependencies import get_current_user, require_organizer
+from app import search
+from app.cache import EVENT_TABLES, cached_json, response_cache
+from app.conditional import conditional_json
+from app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor,
+    keyset_page, next_cursor_headers, set_next_cursor,
+)
 
 router = APIRouter()
 
+
+def apply_event_filters(query, filters: schemas.EventFilters):
+    """Narrow an Event query by the optional listing filters."""
+    if filters.event_type is not None:
+        query = query.filter(models.Event.event_type == models.EventTypeEnum(filters.event_type))
+    if filters.category is not None:
+        query = query.filter(models.Event.category == filters.category)
+    if filters.college_id is not None:
+        query = query.filter(models.Event.college_id == filters.college_id)
+    if filters.fest_id is not None:
+        query = query.filter(models.Event.fest_id == filters.fest_id)
+    if filters.is_free is not None:
+        query = query.filter(models.Event.is_free == filters.is_free)
+    if filters.min_price is not None:
+        query = query.filter(models.Event.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(models.Event.price <= filters.max_price)
+    if filters.date_from is not None:
+        query = query.filter(models.Event.date >= filters.date_from)
+    if filters.date_to is not None:
+        query = query.filter(models.Event.date <= filters.date_to)
+    return query
+
+
 @router.get("/", response_model=List[schemas.EventOut])
-def get_events(db: Session = Depends(get_db)):
-    """Return all approved events across both branches (used by homepage feed)."""
-    return (
-        db.query(models.Event)
-        .filter(models.Event.status == models.StatusEnum.approved)
-        .order_by(models.Event.date.desc())
-        .all()
-    )
+def get_events(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: schemas.EventFilters = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Return approved events across both branches (used by homepage feed).
+
+    Keyset-paginated on (date desc, id desc); pass the X-Next-Cursor header
+    value back as ?cursor= to fetch the next page.
+    """
+    def build():
+        query = event_listing_query(db).filter(models.Event.status == models.StatusEnum.approved)
+        query = apply_event_filters(query, filters)
+        events, next_cursor = keyset_page(query, models.Event.date, models.Event.id, cursor, limit)
+        return events, next_cursor_headers(next_cursor)
+
+    key = ("events.list", cursor, limit, filters.model_dump_json())
+    return conditional_json(request, db, key, EVENT_TABLES, List[schemas.EventOut], build)
 
 @router.get("/city", response_model=List[schemas.EventOut])
-def get_city_events(db: Session = Depends(get_db)):
-    """Return only standalone City Events (event_type='city', approved)."""
-    events = (
-        db.query(models.Event)
-        .filter(
-            models.Event.event_type == models.EventTypeEnum.city,
-            models.Event.status == models.StatusEnum.approved,
-        )
-        .order_by(models.Event.date.desc())
-        .all()
-    )
-    # Fallback only within the city branch — never leak fest or pending events
-    if not events:
-        events = (
-            db.query(models.Event)
-            .filter(models.Event.event_type == models.EventTypeEnum.city)
-            .order_by(models.Event.date.desc())
-            .all()
-        )
-    return events
+def get_city_events(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    filters: schemas.EventFilters = Depends(),
+    db: Session = Depends(get_db),
+):
+    """Return only standalone City Events (event_type='city', approved).
+
+    Paginated like get_events.
+    """
+    def build():
+        query = event_listing_query(db).filter(models.Event.event_type == models.EventTypeEnum.city)
+        approved = query.filter(models.Event.status == models.StatusEnum.approved)
+        # Fallback only within the city branch — never leak fest or pending events
+        if approved.first() is not None:
+            query = approved
+        query = apply_event_filters(query, filters)
+        events, next_cursor = keyset_page(query, models.Event.date, models.Event.id, cursor, limit)
+        return events, next_cursor_headers(next_cursor)
+
+    key = ("events.city", cursor, limit, filters.model_dump_json())
+    return conditional_json(request, db, key, EVENT_TABLES, List[schemas.EventOut], build)
 
 @router.get("/mine", response_model=List[schemas.EventOut])
-def get_my_events(db: Session = Depends(get_db), current_user=Depends(require_organizer)):
+def get_my_events(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_organizer),
+):
     """Return city events owned by the current organizer.
     Fest events are managed via /fests/:slug, not here.
+    Paginated like get_events.
     """
-    return (
-        db.query(models.Event)
-        .filter(
-            models.Event.event_type == models.EventTypeEnum.city,
-            models.Event.organizer_id == current_user.id,
-        )
-        .order_by(models.Event.date.desc())
-        .all()
+    query = event_listing_query(db).filter(
+        models.Event.event_type == models.EventTypeEnum.city,
+        models.Event.organizer_id == current_user.id,
     )
+    events, next_cursor = keyset_page(query, models.Event.date, models.Event.id, cursor, limit)
+    set_next_cursor(response, next_cursor)
+    return events
+
+# ── Feed ranking ─────────────────────────────────────────────────────────────
+# score = FEED_MATCH_WEIGHT   · (category is one of the user's interests)
+#       + FEED_DATE_WEIGHT    · 1 / (1 + days until the event)   (0 once past)
+#       + FEED_POPULAR_WEIGHT · n / (n + 10), n = registrations + passes
+FEED_MATCH_WEIGHT   = 2.0
+FEED_DATE_WEIGHT    = 1.0
+FEED_POPULAR_WEIGHT = 1.0
+FEED_CACHE_TTL      = 60  # seconds the first page stays cached per user
+
+
+def _days_until(db: Session, col, as_of: datetime):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.extract("epoch", col - as_of) / 86400.0
+    return func.julianday(col) - func.julianday(as_of)
+
+
+def _feed_query(db: Session, user_id: int, as_of: datetime):
+    """Approved events joined with the user's interests and popularity counts
+    (the registration counter plus the event's passes), returned as (Event, score) rows."""
+    interest_names = (
+        select(models.Interest.name)
+        .join(models.UserInterest, models.UserInterest.interest_id == models.Interest.id)
+        .where(models.UserInterest.user_id == user_id)
+    )
+    # Correlated, so each ranked event looks up its own passes through
+    # ix_passes_event_id instead of grouping the whole passes table
+    passes = (
+        select(func.count())
+        .where(models.Pass.event_id == models.Event.id)
+        .correlate(models.Event)
+        .scalar_subquery()
+    )
+    popularity = models.Event.active_registrations + passes
+    days = _days_until(db, models.Event.date, as_of)
+    score = (
+        FEED_MATCH_WEIGHT * case((models.Event.category.in_(interest_names), 1.0), else_=0.0)
+        + FEED_DATE_WEIGHT * case((days >= 0, 1.0 / (1.0 + days)), else_=0.0)
+        + FEED_POPULAR_WEIGHT * (popularity / (popularity + 10.0))
+    ).label("score")
+    query = (
+        event_listing_query(db)
+        .add_columns(score)
+        .filter(models.Event.status == models.StatusEnum.approved)
+    )
+    return query, score
+
 
 @router.get("/feed", response_model=List[schemas.EventOut])
-def get_feed(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    user_interests = db.query(models.UserInterest).filter(models.UserInterest.user_id == current_user.id).all()
-    interest_names = []
-    for ui in user_interests:
-        interest = db.query(models.Interest).filter(models.Interest.id == ui.interest_id).first()
-        if interest:
-            interest_names.append(interest.name)
+def get_feed(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """Approved events ranked for the current user by interest match, date
+    proximity and popularity, in one query.
 
-    all_events = db.query(models.Event).filter(models.Event.status == models.StatusEnum.approved).all()
+    Keyset-paginated on (score desc, id desc); the cursor pins the ranking
+    clock so later pages are scored exactly like the first one. The first
+    page is cached per user for FEED_CACHE_TTL seconds.
+    """
+    if cursor:
+        as_of, last_score, last_id = decode_cursor(cursor, 3)
+        try:
+            as_of = datetime.fromisoformat(as_of)
+            last_score, last_id = float(last_score), int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    else:
+        as_of = datetime.utcnow()
 
-    priority = [e for e in all_events if e.category in interest_names]
-    others   = [e for e in all_events if e.category not in interest_names]
+    def build():
+        query, score = _feed_query(db, current_user.id, as_of)
+        if cursor:
+            query = query.filter(or_(
+                score < last_score,
+                and_(score == last_score, models.Event.id < last_id),
+            ))
+        query = query.order_by(score.desc(), models.Event.id.desc())
+        rows = query.limit(limit + 1).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_event, last = rows[-1]
+            next_cursor = encode_cursor(as_of, last, last_event.id)
+        return [event for event, _ in rows], next_cursor_headers(next_cursor)
 
-    return priority + others
+    if cursor:
+        events, headers = build()
+        response.headers.update(headers)
+        return events
+    tables = ("events", f"user_interests:{current_user.id}")
+    return cached_json(("events.feed", current_user.id, limit), tables, List[schemas.EventOut], build, ttl=FEED_CACHE_TTL)
 
 @router.get("/{event_id}", response_model=schemas.EventOut)
-def get_event(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(models.Event).filter(models.Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    return event
+def get_event(request: Request, event_id: int, db: Session = Depends(get_db)):
+    def build():
+        event = get_event_by_id(db, event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return event, {}
+
+    return conditional_json(request, db, ("events.detail", event_id), EVENT_TABLES, schemas.EventOut, build)
 
 @router.post("/", response_model=schemas.EventOut)
 def create_event(data: schemas.EventCreate, db: Session = Depends(get_db), current_user=Depends(require_organizer)):
@@ -91,7 +227,11 @@ def create_event(data: schemas.EventCreate, db: Session = Depends(get_db), curre
 
     event = models.Event(**event_data, status=models.StatusEnum.pending)
     db.add(event)
+    db.flush()
+    search.sync_event(db, event)
     db.commit()
+    # Pending events are visible on the detail page and the /city fallback
+    response_cache.invalidate("events")
     db.refresh(event)
     return event
 
@@ -100,6 +240,7 @@ def create_event(data: schemas.EventCreate, db: Session = Depends(get_db), curre
 def update_event(
     event_id: int,
     data: schemas.EventUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user=Depends(require_organizer),
 ):
@@ -114,7 +255,7 @@ def update_event(
 
     Always allowed:
       - title, description, location, date, time, image_url, category
-      - increasing registration_limit
+      - increasing registration_limit (seats the waitlist in the background)
       - approval_mode
     """
     event = db.query(models.Event).filter(models.Event.id == event_id).first()
@@ -142,18 +283,8 @@ def update_event(
             if not is_member:
                 raise HTTPException(status_code=403, detail="Forbidden")
 
-    # Count active registrations for this event
-    active_reg_count = (
-        db.query(models.EventRegistration)
-        .filter(
-            models.EventRegistration.event_id == event_id,
-            models.EventRegistration.approval_status.in_([
-                models.RegApprovalStatusEnum.approved,
-                models.RegApprovalStatusEnum.pending,
-            ]),
-        )
-        .count()
-    ) if event.event_type == models.EventTypeEnum.fest else 0
+    # Active (approved + pending) registrations, from the maintained counter
+    active_reg_count = (event.active_registrations or 0) if event.event_type == models.EventTypeEnum.fest else 0
 
     has_registrations = active_reg_count > 0
 
@@ -183,6 +314,10 @@ def update_event(
     for field, value in updates.items():
         setattr(event, field, value)
 
+    search.sync_event(db, event)
     db.commit()
+    response_cache.invalidate("events")
+    if "registration_limit" in updates and event.event_type == models.EventTypeEnum.fest:
+        background_tasks.add_task(registrations.promote, db.get_bind(), event.id)
     db.refresh(event)
     return event
\ No newline at end of file
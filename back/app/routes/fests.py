@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
 from app import models, schemas
+from app.crud import event_listing_query, fest_query
+from app.cache import EVENT_TABLES, FEST_TABLES, response_cache
+from app.conditional import conditional_json
 from app.auth.dependencies import get_current_user
+from app import search
 
 router = APIRouter()
 
@@ -38,14 +42,18 @@ def _require_fest_privileged(fest: models.Fest, user: models.User, db: Session):
 
 # ─── GET /fests/ ─────────────────────────────────────────────────────────────
 @router.get("/", response_model=List[schemas.FestOut])
-def list_fests(db: Session = Depends(get_db)):
+def list_fests(request: Request, db: Session = Depends(get_db)):
     """Return all live fests (public)."""
-    return (
-        db.query(models.Fest)
-        .filter(models.Fest.status == models.FestStatusEnum.live)
-        .order_by(models.Fest.created_at.desc())
-        .all()
-    )
+    def build():
+        fests = (
+            fest_query(db)
+            .filter(models.Fest.status == models.FestStatusEnum.live)
+            .order_by(models.Fest.created_at.desc())
+            .all()
+        )
+        return fests, {}
+
+    return conditional_json(request, db, ("fests.list",), FEST_TABLES, List[schemas.FestOut], build)
 
 
 # ─── GET /fests/all ──────────────────────────────────────────────────────────
@@ -57,33 +65,40 @@ def list_all_fests(
     """Return all fests regardless of status (admin / organizer only)."""
     if current_user.role not in (models.RoleEnum.admin, models.RoleEnum.organizer):
         raise HTTPException(status_code=403, detail="Forbidden")
-    return db.query(models.Fest).order_by(models.Fest.created_at.desc()).all()
+    return fest_query(db).order_by(models.Fest.created_at.desc()).all()
 
 
 # ─── GET /fests/:slug ────────────────────────────────────────────────────────
 @router.get("/{slug}", response_model=schemas.FestOut)
-def get_fest(slug: str, db: Session = Depends(get_db)):
-    fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
-    if not fest:
-        raise HTTPException(status_code=404, detail="Fest not found")
-    return fest
+def get_fest(request: Request, slug: str, db: Session = Depends(get_db)):
+    def build():
+        fest = fest_query(db).filter(models.Fest.slug == slug).first()
+        if not fest:
+            raise HTTPException(status_code=404, detail="Fest not found")
+        return fest, {}
+
+    return conditional_json(request, db, ("fests.detail", slug), FEST_TABLES, schemas.FestOut, build)
 
 
 # ─── GET /fests/:slug/events ─────────────────────────────────────────────────
 @router.get("/{slug}/events", response_model=List[schemas.EventOut])
-def get_fest_events(slug: str, db: Session = Depends(get_db)):
-    fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
-    if not fest:
-        raise HTTPException(status_code=404, detail="Fest not found")
-    return (
-        db.query(models.Event)
-        .filter(
-            models.Event.fest_id == fest.id,
-            models.Event.status == models.StatusEnum.approved,
+def get_fest_events(request: Request, slug: str, db: Session = Depends(get_db)):
+    def build():
+        fest = db.query(models.Fest).filter(models.Fest.slug == slug).first()
+        if not fest:
+            raise HTTPException(status_code=404, detail="Fest not found")
+        events = (
+            event_listing_query(db)
+            .filter(
+                models.Event.fest_id == fest.id,
+                models.Event.status == models.StatusEnum.approved,
+            )
+            .order_by(models.Event.date)
+            .all()
         )
-        .order_by(models.Event.date)
-        .all()
-    )
+        return events, {}
+
+    return conditional_json(request, db, ("fests.events", slug), EVENT_TABLES, List[schemas.EventOut], build)
 
 
 # ─── GET /fests/:slug/members ────────────────────────────────────────────────
@@ -131,7 +146,9 @@ def create_fest(
         user_id=current_user.id,
         role=models.FestMemberRoleEnum.owner,
     ))
+    search.sync_fest(db, fest)
     db.commit()
+    response_cache.invalidate("fests")
     db.refresh(fest)
     return fest
 
@@ -252,6 +269,7 @@ def set_fest_status(
             )
 
     fest.status = models.FestStatusEnum.live if new_status == "live" else models.FestStatusEnum.draft
+    search.sync_fest(db, fest)
     db.commit()
-    db.refresh(fest)
-    return fest
+    response_cache.invalidate("fests")
+    return fest_query(db).filter(models.Fest.id == fest.id).first()
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app import models, schemas
+from app import models, payments, schemas
 from app.auth.dependencies import get_current_user
 import uuid
 
 router = APIRouter()
 
 @router.post("/{event_id}/register", response_model=schemas.PassOut)
-def register_pass(event_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+def register_pass(event_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
+                  current_user=Depends(get_current_user)):
     event = db.query(models.Event).filter(models.Event.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -17,16 +19,36 @@ def register_pass(event_id: int, db: Session = Depends(get_db), current_user=Dep
         models.Pass.event_id == event_id
     ).first()
     if existing:
-        raise HTTPException(status_code=400, detail="Already registered")
+        # A failed payment may be retried; the conditional UPDATE starts one checkout per retry,
+        # and the new checkout_id makes the webhook ignore late events of the failed one
+        checkout_id = payments.new_checkout_id()
+        retried = existing.payment_status == "failed" and db.execute(
+            update(models.Pass)
+            .where(models.Pass.id == existing.id, models.Pass.payment_status == "failed")
+            .values(payment_status="pending", checkout_id=checkout_id)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if not retried:
+            raise HTTPException(status_code=400, detail="Already registered")
+        db.commit()
+        db.refresh(existing)
+        background_tasks.add_task(payments.provider.create_checkout, payments.KIND_PASS, existing.id,
+                                  event.price, checkout_id)
+        return existing
     new_pass = models.Pass(
         user_id=current_user.id,
         event_id=event_id,
         pass_code=str(uuid.uuid4()).upper()[:12],
         payment_status="free" if event.is_free else "pending",
+        checkout_id=None if event.is_free else payments.new_checkout_id(),
     )
     db.add(new_pass)
     db.commit()
     db.refresh(new_pass)
+    if new_pass.payment_status == "pending":
+        # Settled by the payment webhook (pending → paid / failed)
+        background_tasks.add_task(payments.provider.create_checkout, payments.KIND_PASS, new_pass.id,
+                                  event.price, new_pass.checkout_id)
     return new_pass
 
 @router.get("/my", response_model=list[schemas.PassOut])
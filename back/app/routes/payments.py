@@ -0,0 +1,114 @@
+"""
+Payment provider callbacks.
+Mounted under /api/payments by main.py.
+
+  POST   /api/payments/webhook   → signed batch of payment outcomes from the provider
+"""
+
+import logging
+from typing import Dict, List, Set, Tuple
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import tuple_, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_db
+from app import models, payments, registrations, schemas
+from app.cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def _settle_passes(db: Session, checkouts: Set[Tuple[int, str]], payment_status: str) -> List[int]:
+    """Settle pending passes, each only by an event of its current checkout."""
+    checkouts = {(pass_id, checkout_id) for pass_id, checkout_id in checkouts if checkout_id is not None}
+    if not checkouts:
+        return []
+    return list(db.execute(
+        update(models.Pass)
+        .where(tuple_(models.Pass.id, models.Pass.checkout_id).in_(checkouts), models.Pass.payment_status == "pending")
+        .values(payment_status=payment_status)
+        .returning(models.Pass.id)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def _apply(db: Session, events: List[schemas.PaymentEvent]) -> Tuple[int, Dict[int, int]]:
+    """
+    Apply a whole webhook batch in one transaction: one conditional
+    statement per (kind, outcome), whatever the batch size. Returns
+    (outcomes applied, {event_id: seats released}).
+    """
+    refs: Dict[Tuple[str, str], Set[int]] = {}
+    checkouts: Dict[str, Set[Tuple[int, str]]] = {}
+    for e in events:
+        refs.setdefault((e.kind, e.status), set()).add(e.reference)
+        if e.kind == payments.KIND_PASS:
+            checkouts.setdefault(e.status, set()).add((e.reference, e.checkout_id))
+
+    # Successes first: a hold that was both paid and failed in one batch stays paid
+    confirmed = registrations.confirm_payments(
+        db, list(refs.get((payments.KIND_REGISTRATION, payments.SUCCEEDED), ())))
+    released = registrations.fail_payments(
+        db, list(refs.get((payments.KIND_REGISTRATION, payments.FAILED), ())))
+    paid = _settle_passes(db, checkouts.get(payments.SUCCEEDED, set()), "paid")
+    failed = _settle_passes(db, checkouts.get(payments.FAILED, set()), "failed")
+    db.commit()
+
+    late = refs.get((payments.KIND_REGISTRATION, payments.SUCCEEDED), set()) - set(confirmed)
+    if late:
+        # Paid after the hold expired (or twice): the provider has to refund these
+        logger.warning("Payments succeeded for released registrations: %s", sorted(late))
+    return len(confirmed) + sum(released.values()) + len(paid) + len(failed), released
+
+
+def settle(body: bytes) -> int:
+    """
+    Apply a webhook body without the HTTP round trip: the local provider's
+    delivery when no PAYMENT_WEBHOOK_URL is set. Runs on the provider's
+    thread, so freed seats are promoted right away. Returns outcomes applied.
+    """
+    batch = schemas.PaymentWebhook.model_validate_json(body)
+    with SessionLocal() as db:
+        applied, released = _apply(db, batch.events)
+        bind = db.get_bind()
+    if released:
+        response_cache.invalidate("events")
+        for event_id in released:
+            registrations.promote(bind, event_id)
+    return applied
+
+
+# ─── POST /payments/webhook ──────────────────────────────────────────────────
+
+@router.post("/webhook", response_model=schemas.PaymentWebhookResult)
+async def payment_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """
+    Settle payments reported by the provider. The body must carry a valid
+    X-Payment-Signature. Idempotent: every transition is conditional on the
+    current state, so redelivered events are counted as ignored.
+    """
+    body = await request.body()
+    if not payments.verify_signature(body, request.headers.get(payments.SIGNATURE_HEADER)):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+    try:
+        batch = schemas.PaymentWebhook.model_validate_json(body)
+    except ValidationError:
+        raise HTTPException(status_code=422, detail="Malformed webhook body")
+
+    applied, released = await run_in_threadpool(_apply, db, batch.events)
+    if released:
+        response_cache.invalidate("events")
+        for event_id in released:
+            background_tasks.add_task(registrations.promote, db.get_bind(), event_id)
+    return schemas.PaymentWebhookResult(
+        received=len(batch.events), applied=applied, ignored=len(batch.events) - applied,
+    )
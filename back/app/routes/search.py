@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Literal, Optional
+from app.database import get_db
+from app import schemas, search as search_index
+from app.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, set_next_cursor
+
+router = APIRouter()
+
+
+@router.get("", response_model=List[schemas.SearchResultOut])
+def search(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[Literal["event", "fest", "college"]] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+):
+    """Ranked full-text search across approved events, live fests and colleges.
+
+    Results come best-first with HTML-escaped titles and snippets, matches
+    wrapped in <mark>.
+    Pass the X-Next-Cursor header back as ?cursor= for the next page.
+    """
+    after = None
+    if cursor:
+        score, doc_id = decode_cursor(cursor, 2)
+        try:
+            after = (float(score), int(doc_id))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    rows = search_index.search(db, q, kind, after, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["score"], rows[-1]["doc_id"])
+    set_next_cursor(response, next_cursor)
+    return [
+        schemas.SearchResultOut(
+            kind=row["kind"], id=row["ref_id"], slug=row["slug"],
+            title=row["title"], snippet=row["snippet"] or None, score=row["score"],
+        )
+        for row in rows
+    ]
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app import models, schemas
 from app.auth.dependencies import get_current_user
+from app.cache import cached_json, response_cache
 
 router = APIRouter()
 
@@ -17,11 +18,15 @@ def set_interests(data: schemas.SetInterests, db: Session = Depends(get_db), cur
         db.add(models.UserInterest(user_id=current_user.id, interest_id=iid))
     current_user.interests_set = True
     db.commit()
+    response_cache.invalidate(f"user_interests:{current_user.id}")  # drop the cached feed page
     return {"message": "Interests saved"}
 
 @router.get("/interests/all", response_model=list[schemas.InterestOut])
 def get_all_interests(db: Session = Depends(get_db)):
-    return db.query(models.Interest).all()
+    def build():
+        return db.query(models.Interest).all(), {}
+
+    return cached_json(("interests.list",), ("interests",), list[schemas.InterestOut], build)
 
 @router.post("/request-organizer")
 def request_organizer(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
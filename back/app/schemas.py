@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr, field_validator, model_validator
-from typing import Optional, List, Literal
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator
+from typing import Dict, Optional, List, Literal
 from datetime import datetime
 
 # Auth
@@ -100,11 +100,34 @@ class EventOut(BaseModel):
     is_paid: bool = False
     registration_limit: Optional[int] = None
     approval_mode: str = "auto"
+    # availability (from Event.active_registrations)
+    registered_count: int = 0
+    seats_remaining: Optional[int] = None   # None = unlimited
+    is_full: bool = False
     created_at: datetime
     class Config:
         from_attributes = True
 
 
+class PendingEventOut(EventOut):
+    """Admin moderation queue row: the event plus who submitted it."""
+    organizer_name: Optional[str] = None
+    organizer_email: Optional[str] = None
+
+
+class EventFilters(BaseModel):
+    """Optional query-string filters for the public event listings."""
+    event_type: Optional[Literal["fest", "city"]] = None
+    category:   Optional[str]      = None
+    college_id: Optional[int]      = None
+    fest_id:    Optional[int]      = None
+    is_free:    Optional[bool]     = None
+    min_price:  Optional[float]    = None
+    max_price:  Optional[float]    = None
+    date_from:  Optional[datetime] = None
+    date_to:    Optional[datetime] = None
+
+
 class EventUpdate(BaseModel):
     """Fields allowed to be patched on an existing event."""
     title:              Optional[str]   = None
@@ -188,6 +211,15 @@ class CollegeOut(BaseModel):
     class Config:
         from_attributes = True
 
+# Search
+class SearchResultOut(BaseModel):
+    kind: Literal["event", "fest", "college"]
+    id: int
+    slug: Optional[str] = None   # fests only
+    title: str                   # HTML-escaped, with <mark> highlights
+    snippet: Optional[str] = None
+    score: float                 # lower is better
+
 # Pass
 class PassOut(BaseModel):
     id: int
@@ -207,11 +239,57 @@ class FestPassOut(BaseModel):
     status: str
     qr_code: str
     checked_in: bool
+    checked_in_at: Optional[datetime] = None
+    checked_in_gate: Optional[str] = None
     created_at: datetime
     class Config:
         from_attributes = True
 
 
+class PassKeyOut(BaseModel):
+    """Per-fest keys gate devices use to verify pass tokens offline."""
+    fest_id: int
+    key_version: int
+    algorithm: str
+    key: str   # base64url, current version
+    keys: Dict[int, str]   # every version that still verifies → base64url key
+    grace_until: Optional[datetime] = None   # when the previous version stops verifying
+
+
+class FestPassStatusUpdate(BaseModel):
+    status: Literal["approved", "blocked"]
+
+
+class GateManifestOut(BaseModel):
+    """Compact pass list for gate devices: `passes` rows follow `fields`."""
+    fest_id: int
+    cursor: int                # pass back as ?since= to get the next delta
+    full: bool                 # True → replace the local copy, False → apply as upserts
+    fields: List[str]
+    passes: List[list]         # [id, qr_code, state]; state 0 valid, 1 used, 2 blocked
+
+
+# Gate scan batch (offline scanner upload)
+class GateScanItem(BaseModel):
+    qr_code: str
+    scanned_at: datetime
+    device_id: Optional[str] = None
+
+class GateScanIn(BaseModel):
+    qr_code: str
+    gate_id: Optional[str] = None
+
+class GateScanBatch(BaseModel):
+    scans: List[GateScanItem] = Field(..., max_length=1000)
+
+class GateScanResult(BaseModel):
+    qr_code: str
+    scanned_at: datetime
+    device_id: Optional[str] = None
+    pass_id: Optional[int] = None
+    result: Literal["admitted", "already_used", "blocked", "unknown"]
+
+
 # EventRegistration
 class EventRegistrationOut(BaseModel):
     id: int
@@ -219,10 +297,58 @@ class EventRegistrationOut(BaseModel):
     event_id: int
     approval_status: str
     payment_status: str
+    hold_expires_at: Optional[datetime] = None
     created_at: datetime
     class Config:
         from_attributes = True
 
+class RegistrationDecision(BaseModel):
+    approval_status: Literal["approved", "rejected"]
+
+class PendingRegistrationOut(BaseModel):
+    id: int
+    event_id: int
+    event_title: str
+    fest_pass_id: int
+    user_id: int
+    user_name: str
+    user_email: Optional[str] = None
+    created_at: datetime
+    class Config:
+        from_attributes = True
+
+class RegistrationBulkDecision(BaseModel):
+    """Scope (fest_id and/or event_id) + targets (ids and/or filters) + decision."""
+    fest_id: Optional[int] = None
+    event_id: Optional[int] = None
+    approval_status: Literal["approved", "rejected"]
+    registration_ids: Optional[List[int]] = Field(None, max_length=10000)
+    status: Literal["pending", "approved", "waitlisted", "rejected"] = "pending"
+    registered_before: Optional[datetime] = None
+    registered_after: Optional[datetime] = None
+    limit: int = Field(10000, ge=1, le=10000)
+
+class BulkDecisionResult(BaseModel):
+    matched: int    # rows the ids / filters selected
+    decided: int    # of those, actually moved (others were not eligible)
+
+# Payments
+class PaymentEvent(BaseModel):
+    id: str                                   # provider event id
+    payment_id: str
+    kind: Literal["registration", "pass"]
+    reference: int                            # EventRegistration.id / Pass.id
+    checkout_id: Optional[str] = None         # our checkout metadata (passes)
+    status: Literal["succeeded", "failed"]
+
+class PaymentWebhook(BaseModel):
+    events: List[PaymentEvent] = Field(max_length=10000)
+
+class PaymentWebhookResult(BaseModel):
+    received: int
+    applied: int    # state actually changed
+    ignored: int    # duplicates, or already settled / expired
+
 # Organizer request
 class OrganizerRequestOut(BaseModel):
     id: int
@@ -232,6 +358,14 @@ class OrganizerRequestOut(BaseModel):
     class Config:
         from_attributes = True
 
+class OrganizerRequestQueueOut(OrganizerRequestOut):
+    user_name: str
+    user_email: Optional[str] = None
+
+class AdminBulkDecision(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=1000)
+    status: Literal["approved", "rejected"]
+
 # Committee
 class CommitteeCreate(BaseModel):
     name: str
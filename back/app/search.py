@@ -0,0 +1,247 @@
+"""
+Full-text search over events, fests and colleges.
+
+SQLite  → an FTS5 virtual table `search_index`, ranked with bm25().
+Postgres → a `search_documents` table with a generated, GIN-indexed
+           tsvector column, ranked with ts_rank_cd() (Postgres has no
+           built-in BM25; ts_rank_cd is the closest equivalent).
+
+Each searchable row is one document whose id is derived from (kind, ref_id),
+so upserts and deletes address a single row by primary key. Only public rows
+are indexed: approved events, live fests and every college. The write paths
+in the routers call sync_event / sync_fest / sync_college / remove_college
+before committing, so the index changes in the same transaction as the row.
+
+The index is created alongside the ORM tables (metadata after_create hook)
+and backfilled at startup by rebuild_if_empty().
+"""
+
+import html
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app import models
+
+KIND_CODES = {"event": 1, "fest": 2, "college": 3}
+KIND_NAMES = {v: k for k, v in KIND_CODES.items()}
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END   = "</mark>"
+
+# What the database wraps matches in. Titles and bodies are organizer text,
+# so results are HTML-escaped first and only then do these control
+# characters become <mark> tags (see render_highlights).
+_MATCH_START = "\x02"
+_MATCH_END   = "\x03"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _doc_id(kind: str, ref_id: int) -> int:
+    return ref_id * 4 + KIND_CODES[kind]
+
+
+def _is_postgres(bind) -> bool:
+    return bind.dialect.name == "postgresql"
+
+
+# ─── Schema ──────────────────────────────────────────────────────────────────
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    if _is_postgres(connection):
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS search_documents (
+                id     BIGINT PRIMARY KEY,
+                kind   VARCHAR(16) NOT NULL,
+                ref_id INTEGER NOT NULL,
+                slug   VARCHAR(100),
+                title  TEXT,
+                body   TEXT,
+                tsv    tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(body, '')), 'B')
+                ) STORED
+            )
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"
+        ))
+    elif connection.dialect.name == "sqlite":
+        connection.execute(text("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                kind UNINDEXED, ref_id UNINDEXED, slug UNINDEXED, title, body,
+                tokenize = 'porter unicode61'
+            )
+        """))
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if _is_postgres(connection):
+        connection.execute(text("DROP TABLE IF EXISTS search_documents"))
+    elif connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+# ─── Document sync ───────────────────────────────────────────────────────────
+
+def _join(*parts) -> str:
+    return " ".join(p for p in parts if p)
+
+
+def _doc(kind: str, ref_id: int, title: str, body: str, slug: Optional[str] = None) -> dict:
+    return {
+        "id": _doc_id(kind, ref_id), "kind": kind, "ref_id": ref_id,
+        "slug": slug, "title": title or "", "body": body or "",
+    }
+
+
+def _upsert(db: Session, kind: str, ref_id: int, title: str, body: str, slug: Optional[str] = None):
+    _upsert_many(db, [_doc(kind, ref_id, title, body, slug)])
+
+
+def _upsert_many(db: Session, params: List[dict]):
+    """Write several documents; each statement runs once as an executemany."""
+    if not params:
+        return
+    if _is_postgres(db.get_bind()):
+        db.execute(text("""
+            INSERT INTO search_documents (id, kind, ref_id, slug, title, body)
+            VALUES (:id, :kind, :ref_id, :slug, :title, :body)
+            ON CONFLICT (id) DO UPDATE
+            SET slug = EXCLUDED.slug, title = EXCLUDED.title, body = EXCLUDED.body
+        """), params)
+    else:
+        # FTS5 has no upsert; delete + insert by rowid is two index-point ops
+        db.execute(text("DELETE FROM search_index WHERE rowid = :id"), params)
+        db.execute(text("""
+            INSERT INTO search_index (rowid, kind, ref_id, slug, title, body)
+            VALUES (:id, :kind, :ref_id, :slug, :title, :body)
+        """), params)
+
+
+def _remove(db: Session, kind: str, ref_id: int):
+    _remove_many(db, kind, [ref_id])
+
+
+def _remove_many(db: Session, kind: str, ref_ids: List[int]):
+    if not ref_ids:
+        return
+    table = "search_documents WHERE id" if _is_postgres(db.get_bind()) else "search_index WHERE rowid"
+    db.execute(text(f"DELETE FROM {table} = :id"), [{"id": _doc_id(kind, ref_id)} for ref_id in ref_ids])
+
+
+def sync_event(db: Session, ev: models.Event):
+    if ev.status == models.StatusEnum.approved:
+        _upsert(db, "event", ev.id, ev.title, _join(ev.description, ev.location, ev.category))
+    else:
+        _remove(db, "event", ev.id)
+
+
+def sync_events(db: Session, events):
+    """sync_event for a batch (events or rows with the same attributes), without a statement per event."""
+    approved = [ev for ev in events if ev.status == models.StatusEnum.approved]
+    _upsert_many(db, [
+        _doc("event", ev.id, ev.title, _join(ev.description, ev.location, ev.category)) for ev in approved
+    ])
+    _remove_many(db, "event", [ev.id for ev in events if ev.status != models.StatusEnum.approved])
+
+
+def sync_fest(db: Session, fest: models.Fest):
+    if fest.status == models.FestStatusEnum.live:
+        _upsert(db, "fest", fest.id, fest.name, fest.tagline, slug=fest.slug)
+    else:
+        _remove(db, "fest", fest.id)
+
+
+def sync_college(db: Session, college: models.College):
+    _upsert(db, "college", college.id, college.name, college.area)
+
+
+def remove_college(db: Session, college_id: int):
+    _remove(db, "college", college_id)
+
+
+def rebuild_if_empty(db: Session):
+    """Backfill the index from the ORM tables when it has no documents yet."""
+    table = "search_documents" if _is_postgres(db.get_bind()) else "search_index"
+    if db.execute(text(f"SELECT 1 FROM {table} LIMIT 1")).first() is not None:
+        return
+    for ev in db.query(models.Event).filter(models.Event.status == models.StatusEnum.approved):
+        sync_event(db, ev)
+    for fest in db.query(models.Fest).filter(models.Fest.status == models.FestStatusEnum.live):
+        sync_fest(db, fest)
+    for college in db.query(models.College):
+        sync_college(db, college)
+    db.commit()
+
+
+# ─── Query ───────────────────────────────────────────────────────────────────
+
+def match_expression(q: str) -> str:
+    """Turn free text into an FTS5 expression: every word, as a quoted prefix, ANDed."""
+    return " ".join(f'"{tok}"*' for tok in _TOKEN_RE.findall(q))
+
+
+def render_highlights(fragment: Optional[str]) -> Optional[str]:
+    """HTML-escape an indexed fragment, then turn its match markers into <mark> tags."""
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+
+def search(db: Session, q: str, kind: Optional[str], after: Optional[Tuple[float, int]], limit: int) -> List[dict]:
+    """
+    Return up to `limit` result dicts ordered best-first by (score, doc id).
+    Lower score is better on both backends; `after` is the (score, id)
+    of the last row on the previous page.
+    """
+    params = {"limit": limit, "kind": kind}
+    if after is not None:
+        params["after_score"], params["after_id"] = after
+
+    if _is_postgres(db.get_bind()):
+        params["q"] = q
+        # ts_rank_cd() is float4; as float8 the score survives the round trip
+        # through the cursor (a Python float) and compares equal to itself
+        score = "-CAST(ts_rank_cd(d.tsv, query) AS float8)"
+        sql = f"""
+            SELECT d.id AS doc_id, d.kind, d.ref_id, d.slug, {score} AS score,
+                   ts_headline('english', d.title, query,
+                               'StartSel={_MATCH_START}, StopSel={_MATCH_END}, HighlightAll=true') AS title,
+                   ts_headline('english', d.body, query,
+                               'StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=24, MinWords=8') AS snippet
+            FROM search_documents d, websearch_to_tsquery('english', :q) query
+            WHERE d.tsv @@ query
+              {"AND d.kind = :kind" if kind else ""}
+              {f"AND ({score} > :after_score OR ({score} = :after_score AND d.id > :after_id))" if after else ""}
+            ORDER BY score, d.id
+            LIMIT :limit
+        """
+    else:
+        params["q"] = match_expression(q)
+        if not params["q"]:
+            return []
+        # Title matches weigh 10x body matches; bm25() is negative, lower is better
+        score = "bm25(search_index, 0, 0, 0, 10.0, 1.0)"
+        sql = f"""
+            SELECT rowid AS doc_id, kind, ref_id, slug, {score} AS score,
+                   highlight(search_index, 3, '{_MATCH_START}', '{_MATCH_END}') AS title,
+                   snippet(search_index, 4, '{_MATCH_START}', '{_MATCH_END}', '…', 16) AS snippet
+            FROM search_index
+            WHERE search_index MATCH :q
+              {"AND kind = :kind" if kind else ""}
+              {f"AND ({score} > :after_score OR ({score} = :after_score AND rowid > :after_id))" if after else ""}
+            ORDER BY score, rowid
+            LIMIT :limit
+        """
+    rows = [dict(row._mapping) for row in db.execute(text(sql), params)]
+    for row in rows:
+        row["title"] = render_highlights(row["title"])
+        row["snippet"] = render_highlights(row["snippet"])
+    return rows
@@ -0,0 +1,134 @@
+"""
+Production profile for a file-backed SQLite database.
+
+Every new connection gets:
+
+    PRAGMA journal_mode = WAL        readers never block the writer, or vice versa
+    PRAGMA synchronous  = NORMAL     fsync at checkpoints only (safe under WAL)
+    PRAGMA busy_timeout = 5000       wait for a lock instead of failing at once
+    PRAGMA mmap_size    = 256 MiB
+    PRAGMA cache_size   = -64000     64 MiB page cache per connection
+
+(each overridable with SQLITE_<NAME>, e.g. SQLITE_BUSY_TIMEOUT=10000).
+
+SQLite allows one writer per database. Left to itself, overlapping writers
+poll the lock inside busy_timeout and the loser of a long queue gets
+"database is locked". So writers queue here instead, on one lock per
+database file shared by every engine on it (sync and async): a
+transaction takes the lock at its first write statement and gives it back
+at commit / rollback. Reads take no lock and keep running in parallel
+under WAL. Async connections wait for the lock in a worker thread, so the
+event loop keeps serving while they queue. A transaction that cannot get
+the lock within busy_timeout fails with the same OperationalError SQLite
+would raise; main.py answers that with 503 + Retry-After.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.util import await_only
+
+PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous":  os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", 5000)),         # ms
+    "mmap_size":    int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size":   int(os.getenv("SQLITE_CACHE_SIZE", -64000)),         # negative = KiB
+}
+
+# Seconds a transaction waits for the writer lock before giving up
+WRITE_LOCK_TIMEOUT = PRAGMAS["busy_timeout"] / 1000
+
+LOCKED_MESSAGE = "database is locked"
+
+_WRITE_STATEMENT = re.compile(r"\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.IGNORECASE)
+
+# Connection-record info key marking a transaction that holds the writer lock
+_HOLDS_LOCK = "sqlite_writer"
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def is_file_database(engine: Engine) -> bool:
+    database = engine.url.database
+    return (engine.dialect.name == "sqlite" and bool(database) and database != ":memory:"
+            and not database.startswith("file::memory:") and "mode=memory" not in str(engine.url))
+
+
+def writer_lock(engine: Engine) -> threading.Lock:
+    """The writer lock of the database file `engine` points at."""
+    path = os.path.abspath(engine.url.database)
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def is_locked_error(exc: Exception) -> bool:
+    return isinstance(exc, OperationalError) and LOCKED_MESSAGE in str(exc.orig)
+
+
+async def _acquire_async(lock: threading.Lock) -> bool:
+    attempt = asyncio.ensure_future(asyncio.to_thread(lock.acquire, True, WRITE_LOCK_TIMEOUT))
+    try:
+        return await asyncio.shield(attempt)
+    except asyncio.CancelledError:
+        # The thread may still get the lock after we stop waiting: hand it straight back
+        attempt.add_done_callback(lambda done: done.result() and lock.release())
+        raise
+
+
+def apply_pragmas(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def configure(engine: Engine) -> Engine:
+    """
+    Apply the pragmas to every connection `engine` opens and, for a file
+    database, route its writes through the database's writer lock. For an
+    AsyncEngine pass `async_engine.sync_engine`.
+    """
+    event.listen(engine, "connect", apply_pragmas)
+    if not is_file_database(engine):
+        return engine
+    lock = writer_lock(engine)
+
+    def acquire(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get(_HOLDS_LOCK) or not _WRITE_STATEMENT.match(statement):
+            return
+        if conn.dialect.is_async:
+            # Queue in a worker thread; this greenlet yields the event loop meanwhile
+            acquired = await_only(_acquire_async(lock))
+        else:
+            acquired = lock.acquire(timeout=WRITE_LOCK_TIMEOUT)
+        if not acquired:
+            raise OperationalError(statement, parameters, sqlite3.OperationalError(LOCKED_MESSAGE))
+        conn.info[_HOLDS_LOCK] = True
+
+    # "commit" fires just before the COMMIT itself; a writer let in that
+    # early waits out the last few milliseconds in SQLite's busy handler.
+    def release(conn):
+        if conn.info.pop(_HOLDS_LOCK, False):
+            lock.release()
+
+    def release_on_checkin(dbapi_connection, connection_record):
+        # Safety net: a connection returned to the pool never keeps the lock
+        if connection_record is not None and connection_record.info.pop(_HOLDS_LOCK, False):
+            lock.release()
+
+    event.listen(engine, "before_cursor_execute", acquire)
+    event.listen(engine, "commit", release)
+    event.listen(engine, "rollback", release)
+    event.listen(engine, "checkin", release_on_checkin)
+    return engine
@@ -0,0 +1,124 @@
+"""
+Throughput of the event listing against an async twin.
+
+Builds a throwaway SQLite database, mounts a copy of GET /api/events that
+runs on the async engine (async `def`, AsyncSession.run_sync, no threadpool
+hop) next to the real sync route, and fires the same number of concurrent
+requests at each through httpx's in-process ASGI transport. The threadpool
+is capped with --threads, like a small instance.
+
+The listing stays sync: it is CPU-bound (query building and serialization),
+and the async twin runs that work on the event loop without being faster.
+
+    cd back
+    python scripts/bench_async.py --requests 2000 --concurrency 64 --threads 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8, help="threadpool size for sync routes")
+    parser.add_argument("--events", type=int, default=500, help="approved events to seed")
+    parser.add_argument("--cold", action="store_true", help="clear the response cache before every request")
+    return parser.parse_args()
+
+
+async def run(client, path, total, concurrency, before=None):
+    remaining = iter(range(total))
+    latencies = []
+
+    async def worker():
+        for _ in remaining:
+            if before:
+                before()
+            start = time.perf_counter()
+            r = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            assert r.status_code == 200, r.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main(args):
+    import anyio.to_thread
+    import httpx
+    from typing import List
+    from fastapi import Depends, Request
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlalchemy.orm import Session
+
+    from app import models, schemas
+    from app.cache import EVENT_TABLES, response_cache
+    from app.conditional import conditional_json
+    from app.crud import event_listing_query
+    from app.database import SessionLocal, get_async_db
+    from app.main import app
+    from app.pagination import keyset_page, next_cursor_headers
+    from app.routes.events import apply_event_filters
+
+    @app.get("/bench/events-async", response_model=List[schemas.EventOut])
+    async def get_events_async(request: Request, filters: schemas.EventFilters = Depends(),
+                               db: AsyncSession = Depends(get_async_db)):
+        def respond(session: Session):
+            def build():
+                query = event_listing_query(session).filter(models.Event.status == models.StatusEnum.approved)
+                query = apply_event_filters(query, filters)
+                events, next_cursor = keyset_page(query, models.Event.date, models.Event.id, None, 20)
+                return events, next_cursor_headers(next_cursor)
+            return conditional_json(request, session, ("bench.async", filters.model_dump_json()), EVENT_TABLES,
+                                    List[schemas.EventOut], build)
+        return await db.run_sync(respond)
+
+    db = SessionLocal()
+    base = datetime.utcnow() + timedelta(days=1)
+    db.add_all([
+        models.Event(event_type=models.EventTypeEnum.city, title=f"Bench {i}", category="Music",
+                     date=base + timedelta(hours=i), status=models.StatusEnum.approved)
+        for i in range(args.events)
+    ])
+    db.commit()
+    db.close()
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+    before = response_cache.clear if args.cold else None
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{args.requests} requests, concurrency {args.concurrency}, {args.threads} threads"
+              f"{', cold cache' if args.cold else ''}")
+        for label, path in (("sync ", "/api/events/?limit=20"), ("async", "/bench/events-async")):
+            await run(client, path, min(args.requests, 100), args.concurrency, before)  # warm up
+            rps, p50, p99 = await run(client, path, args.requests, args.concurrency, before)
+            print(f"  {label}  {rps:8.0f} req/s   p50 {p50 * 1000:6.1f} ms   p99 {p99 * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before app.database is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+
+        async def bench():
+            from app.database import async_engine
+            try:
+                await main(args)
+            finally:
+                await async_engine.dispose()
+
+        asyncio.run(bench())
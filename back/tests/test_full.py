@@ -7,15 +7,47 @@ Run with:
     python -m pytest tests/test_full.py -v
 """
 
+import asyncio
+import base64
+import csv
+import inspect
+import io
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List
+
+import aiosqlite
+import httpx
 import pytest
+from fastapi import BackgroundTasks
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event as sa_event, select, text, update
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
-
-from app.main import app
-from app.database import Base, get_db
-from app import models
+from sqlalchemy.pool import NullPool, StaticPool
+from starlette.websockets import WebSocketDisconnect
+
+from app.main import app, database_busy
+from app.database import Base, async_url, get_async_db, get_db, get_session_factory
+from app import (
+    database, gate, gate_journal, main, models, pass_tokens, payments,
+    registrations, schemas, sqlite_profile,
+)
+from app.auth.dependencies import user_id_from
+from app.auth.jwt import create_token
+from app.cache import ResponseCache, response_cache
+from app.conditional import conditional_json
+from app.migrations import enum_value_statements
+from app.pagination import DEFAULT_PAGE_SIZE
+from app.routes import auth as auth_routes, entry_passes, events, fest_events
+from app.routes import payments as payment_routes
 
 # ─── In-memory test DB ────────────────────────────────────────────────────────
 # StaticPool keeps a single connection alive so all sessions share the same
@@ -38,7 +70,52 @@ def override_get_db():
         db.close()
 
 
+# The async routes see the same in-memory DB: their engine drives that one
+# sqlite3 connection through aiosqlite's worker thread.
+with engine.connect() as _conn:
+    _shared_connection = _conn.connection.driver_connection
+
+
+class _SharedConnection:
+    """The shared sqlite3 connection minus close(): disposing a test's async
+    engine must not drop the in-memory DB."""
+
+    def __getattr__(self, name):
+        return getattr(_shared_connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(_shared_connection, name, value)
+
+    def close(self):
+        pass
+
+
+async def _connect_shared():
+    return await aiosqlite.Connection(lambda: _SharedConnection(), 64)
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+
+
+@pytest.fixture(autouse=True)
+def async_engine():
+    """
+    A fresh async engine per test. aiosqlite's locks bind to the first event
+    loop that waits on them, and tests that drive the app concurrently each
+    run their own loop.
+    """
+    test_engine = create_async_engine("sqlite+aiosqlite://", async_creator=_connect_shared, poolclass=StaticPool)
+    sessions = async_sessionmaker(test_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield test_engine
+    # Also stops aiosqlite's worker thread, or the interpreter waits on it at exit
+    asyncio.run(test_engine.dispose())
 
 
 @pytest.fixture(autouse=True, scope="function")
@@ -46,12 +123,30 @@ def reset_db():
     """Drop and recreate all tables before each test function."""
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    response_cache.clear()
     yield
 
 
 client = TestClient(app, raise_server_exceptions=True)
 
 
+def deliver_webhook(body, signature):
+    r = client.post("/api/payments/webhook", content=body,
+                    headers={"Content-Type": "application/json", payments.SIGNATURE_HEADER: signature})
+    assert r.status_code == 200, r.text
+    deliver_webhook.last = r.json()
+
+
+@pytest.fixture(autouse=True)
+def payment_provider(monkeypatch):
+    """A local provider per test; its webhooks go out on provider.flush()."""
+    monkeypatch.setattr(payments, "WEBHOOK_SECRET", "test-webhook-secret")
+    provider = payments.LocalProvider(deliver=deliver_webhook)
+    previous = payments.set_provider(provider)
+    yield provider
+    payments.set_provider(previous)
+
+
 # ─── Helpers ─────────────────────────────────────────────────────────────────
 
 def signup(name, email, password="password123"):
@@ -424,8 +519,17 @@ class TestEventRegistration:
         r = client.post(f"/api/fest-events/{self.paid_event['id']}/register", headers=auth(self.user_token))
         assert r.status_code == 201
         data = r.json()
+        # The seat is held for checkout, not paid inline
+        assert data["approval_status"] == "pending"
+        assert data["payment_status"] == "held"
+        assert data["hold_expires_at"] is not None
+
+        # The provider's webhook settles it
+        assert payments.provider.flush() == 1
+        data = client.get("/api/fest-events/my-registrations", headers=auth(self.user_token)).json()[0]
         assert data["approval_status"] == "approved"
         assert data["payment_status"] == "paid"
+        assert data["hold_expires_at"] is None
 
     def test_register_idempotent(self):
         r1 = client.post(f"/api/fest-events/{self.free_auto['id']}/register", headers=auth(self.user_token))
@@ -493,8 +597,1132 @@ class TestCapacity:
         client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ua@test.com")))
         client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ub@test.com")))
         r = client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("uc@test.com")))
+        assert r.status_code == 201
+        assert r.json()["approval_status"] == "waitlisted"
+        assert self.active_count() == 2
+
+    def active_count(self):
+        db = TestingSessionLocal()
+        try:
+            return db.get(models.Event, self.event["id"]).active_registrations
+        finally:
+            db.close()
+
+    def test_counter_tracks_registrations(self):
+        client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ua@test.com")))
+        assert self.active_count() == 1
+        # Idempotent re-registration does not take a second seat
+        client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ua@test.com")))
+        assert self.active_count() == 1
+
+    def test_full_check_reads_counter_not_rows(self):
+        db = TestingSessionLocal()
+        db.get(models.Event, self.event["id"]).active_registrations = 2
+        db.commit()
+        db.close()
+        token = login("ua@test.com")
+        with capture_statements() as statements:
+            r = client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(token))
+        assert r.json()["approval_status"] == "waitlisted"
+        assert not any("count(" in sql.lower() for sql, _ in statements)
+
+    def listed_event(self):
+        events = client.get(f"/api/fests/{self.slug}/events").json()
+        return next(e for e in events if e["id"] == self.event["id"])
+
+    def test_listing_shows_availability(self):
+        event = self.listed_event()
+        assert (event["registered_count"], event["seats_remaining"], event["is_full"]) == (0, 2, False)
+
+        # The cached listing is dropped when a seat is taken
+        client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ua@test.com")))
+        event = self.listed_event()
+        assert (event["registered_count"], event["seats_remaining"], event["is_full"]) == (1, 1, False)
+
+        client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ub@test.com")))
+        event = self.listed_event()
+        assert (event["registered_count"], event["seats_remaining"], event["is_full"]) == (2, 0, True)
+
+    def test_listing_availability_without_counting(self):
+        client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(login("ua@test.com")))
+        response_cache.clear()
+        with capture_statements() as statements:
+            for url in (f"/api/fests/{self.slug}/events", "/api/events/", f"/api/events/{self.event['id']}"):
+                assert client.get(url).status_code == 200
+        assert not any("event_registrations" in sql for sql, _ in statements)
+
+    def test_concurrent_registrations_never_overshoot(self, tmp_path):
+        # NullPool: every thread holds its own connection across the barrier
+        file_engine = create_engine(f"sqlite:///{tmp_path / 'cap.db'}", poolclass=NullPool,
+                                    connect_args={"check_same_thread": False, "timeout": 30})
+        Base.metadata.create_all(bind=file_engine)
+        Session = sessionmaker(bind=file_engine)
+        with Session() as db:
+            fest = models.Fest(slug="f", name="F", status=models.FestStatusEnum.live)
+            db.add(fest)
+            db.flush()
+            event = models.Event(event_type=models.EventTypeEnum.fest, title="Workshop", date=datetime(2026, 12, 1),
+                                 fest_id=fest.id, status=models.StatusEnum.approved,
+                                 requires_registration=True, registration_limit=5)
+            users = [models.User(name=f"U{i}", email=f"u{i}@test.com") for i in range(20)]
+            db.add(event)
+            db.add_all(users)
+            db.flush()
+            db.add_all([models.FestPass(user_id=u.id, fest_id=fest.id, qr_code=f"qr-{u.id}") for u in users])
+            db.commit()
+            event_id, user_ids = event.id, [u.id for u in users]
+
+        outcomes, barrier = [], threading.Barrier(len(user_ids))
+
+        def register(user_id):
+            with Session() as db:
+                user = db.get(models.User, user_id)
+                barrier.wait()
+                try:
+                    registration = fest_events._register(db, event_id, BackgroundTasks(), user)
+                    outcomes.append("ok" if registration.approval_status == models.RegApprovalStatusEnum.approved
+                                    else "full")
+                except OperationalError:
+                    outcomes.append("busy")
+
+        threads = [threading.Thread(target=register, args=(uid,)) for uid in user_ids]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        with Session() as db:
+            rows = db.query(models.EventRegistration).filter_by(
+                event_id=event_id, approval_status=models.RegApprovalStatusEnum.approved).count()
+            waiting = db.query(models.EventWaitlistEntry).filter_by(event_id=event_id).count()
+            counter = db.get(models.Event, event_id).active_registrations
+        file_engine.dispose()
+
+        assert outcomes.count("ok") == rows == counter
+        assert counter <= 5
+        assert outcomes.count("full") == waiting
+        assert outcomes.count("ok") + outcomes.count("full") + outcomes.count("busy") == 20
+
+
+# ─── WAITLIST TESTS ──────────────────────────────────────────────────────────
+
+class TestWaitlist:
+    def setup_method(self):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+        college_id = create_college(self.admin_token)
+        self.fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(
+            self.org_token, self.fest["id"], college_id,
+            title="One Seat", requires_registration=True,
+            approval_mode="auto", registration_limit=1
+        )
+        approve_event(self.admin_token, self.event["id"])
+
+        self.tokens = {}
+        for name in ["wa", "wb", "wc", "wd"]:
+            signup(name.upper(), f"{name}@test.com")
+            self.tokens[name] = login(f"{name}@test.com")
+            get_entry_pass(self.tokens[name], self.fest["slug"])
+
+    def register(self, name):
+        r = client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens[name]))
+        assert r.status_code == 201
+        return r.json()
+
+    def statuses(self):
+        r = client.get(f"/api/fest-events/{self.event['id']}/registrations", headers=auth(self.org_token))
+        return sorted(reg["approval_status"] for reg in r.json())
+
+    def my_status(self, name):
+        regs = client.get("/api/fest-events/my-registrations", headers=auth(self.tokens[name])).json()
+        return regs[0]["approval_status"] if regs else None
+
+    def seats_taken(self):
+        db = TestingSessionLocal()
+        try:
+            return db.get(models.Event, self.event["id"]).active_registrations
+        finally:
+            db.close()
+
+    def test_full_event_waitlists_in_order(self):
+        assert self.register("wa")["approval_status"] == "approved"
+        assert self.register("wb")["approval_status"] == "waitlisted"
+        assert self.register("wc")["approval_status"] == "waitlisted"
+        # Retrying does not lose (or duplicate) the place in line
+        assert self.register("wb")["approval_status"] == "waitlisted"
+        assert self.seats_taken() == 1
+
+        r = client.delete(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens["wa"]))
+        assert r.status_code == 204
+        assert self.my_status("wa") is None
+        assert self.my_status("wb") == "approved"
+        assert self.my_status("wc") == "waitlisted"
+        assert self.seats_taken() == 1
+
+    def test_leaving_waitlist_keeps_seats(self):
+        self.register("wa")
+        self.register("wb")
+        self.register("wc")
+        client.delete(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens["wb"]))
+        assert self.seats_taken() == 1
+
+        client.delete(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens["wa"]))
+        assert self.my_status("wc") == "approved"
+
+    def test_cancel_without_registration(self):
+        r = client.delete(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens["wa"]))
+        assert r.status_code == 404
+
+    def test_reject_promotes_next(self):
+        seated = self.register("wa")
+        self.register("wb")
+        r = client.patch(
+            f"/api/fest-events/{self.event['id']}/registrations/{seated['id']}",
+            json={"approval_status": "rejected"}, headers=auth(self.org_token),
+        )
+        assert r.status_code == 200
+        assert r.json()["approval_status"] == "rejected"
+        assert self.my_status("wb") == "approved"
+        assert self.seats_taken() == 1
+
+        # Rejecting twice frees nothing more
+        client.patch(
+            f"/api/fest-events/{self.event['id']}/registrations/{seated['id']}",
+            json={"approval_status": "rejected"}, headers=auth(self.org_token),
+        )
+        assert self.seats_taken() == 1
+
+    def test_decision_requires_privilege(self):
+        seated = self.register("wa")
+        r = client.patch(
+            f"/api/fest-events/{self.event['id']}/registrations/{seated['id']}",
+            json={"approval_status": "rejected"}, headers=auth(self.tokens["wb"]),
+        )
+        assert r.status_code == 403
+
+    def test_approve_only_pending(self):
+        seated = self.register("wa")
+        r = client.patch(
+            f"/api/fest-events/{self.event['id']}/registrations/{seated['id']}",
+            json={"approval_status": "approved"}, headers=auth(self.org_token),
+        )
+        assert r.status_code == 400
+
+    def test_raising_limit_promotes_in_batches(self, monkeypatch):
+        monkeypatch.setattr(registrations, "PROMOTION_BATCH_SIZE", 1)
+        for name in ["wa", "wb", "wc", "wd"]:
+            self.register(name)
+
+        with capture_statements() as statements:
+            r = client.patch(f"/api/events/{self.event['id']}", json={"registration_limit": 3},
+                             headers=auth(self.org_token))
+        assert r.status_code == 200
+        assert self.statuses() == ["approved", "approved", "approved", "waitlisted"]
+        assert self.my_status("wd") == "waitlisted"
+        assert self.seats_taken() == 3
+        # One promotion transaction per batch of one
+        promotions = [sql for sql, _ in statements if sql.startswith("DELETE FROM event_waitlist")]
+        assert len(promotions) == 2
+
+        # Listings see the promoted seats
+        event = client.get(f"/api/events/{self.event['id']}").json()
+        assert (event["registered_count"], event["is_full"]) == (3, True)
+
+    def test_manual_event_promotes_to_pending(self):
+        client.patch(f"/api/events/{self.event['id']}", json={"approval_mode": "manual"},
+                     headers=auth(self.org_token))
+        self.register("wa")
+        assert self.register("wb")["approval_status"] == "waitlisted"
+        client.delete(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens["wa"]))
+        assert self.my_status("wb") == "pending"
+
+    def test_postgres_enum_gains_new_values(self):
+        statements = enum_value_statements()
+        assert "ALTER TYPE regapprovalstatusenum ADD VALUE IF NOT EXISTS 'waitlisted'" in statements
+        assert "ALTER TYPE regpaymentstatusenum ADD VALUE IF NOT EXISTS 'held'" in statements
+
+
+# ─── REGISTRATION HOLD TESTS ─────────────────────────────────────────────────
+
+class TestRegistrationHolds:
+    def setup_method(self):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+        college_id = create_college(self.admin_token)
+        self.fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(
+            self.org_token, self.fest["id"], college_id,
+            title="Paid Workshop", requires_registration=True,
+            is_paid=True, price=99, is_free=False, registration_limit=1
+        )
+        approve_event(self.admin_token, self.event["id"])
+
+        self.tokens = {}
+        for name in ["ha", "hb"]:
+            signup(name.upper(), f"{name}@test.com")
+            self.tokens[name] = login(f"{name}@test.com")
+            get_entry_pass(self.tokens[name], self.fest["slug"])
+
+    def register(self, name):
+        return client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens[name])).json()
+
+    def registration(self, name):
+        regs = client.get("/api/fest-events/my-registrations", headers=auth(self.tokens[name])).json()
+        return regs[0] if regs else None
+
+    def expire_all_holds(self):
+        db = TestingSessionLocal()
+        db.query(models.EventRegistration).filter(models.EventRegistration.hold_expires_at.isnot(None)).update(
+            {"hold_expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        db.close()
+
+    def seats_taken(self):
+        db = TestingSessionLocal()
+        try:
+            return db.get(models.Event, self.event["id"]).active_registrations
+        finally:
+            db.close()
+
+    def test_hold_takes_the_seat(self):
+        assert self.register("ha")["payment_status"] == "held"
+        assert self.register("hb")["approval_status"] == "waitlisted"
+        assert self.seats_taken() == 1
+
+    def test_expired_hold_cannot_be_confirmed(self):
+        self.register("ha")
+        self.expire_all_holds()
+        payments.provider.flush()
+        assert deliver_webhook.last == {"received": 1, "applied": 0, "ignored": 1}
+        assert self.registration("ha")["payment_status"] == "held"
+
+    def test_sweeper_releases_seat_and_promotes(self):
+        self.register("ha")
+        self.register("hb")
+        self.expire_all_holds()
+        payments.provider.flush()   # ha paid too late
+
+        assert registrations.sweep_holds(TestingSessionLocal) == 1
+        regs = client.get("/api/fest-events/my-registrations", headers=auth(self.tokens["ha"])).json()
+        assert regs == []
+        # The waitlisted user gets a fresh hold on the released seat
+        regs = client.get("/api/fest-events/my-registrations", headers=auth(self.tokens["hb"])).json()
+        assert regs[0]["payment_status"] == "held"
+        assert self.seats_taken() == 1
+        payments.provider.flush()
+        assert self.registration("hb")["approval_status"] == "approved"
+
+        # Paid registrations are never swept
+        assert registrations.sweep_holds(TestingSessionLocal) == 0
+        assert self.seats_taken() == 1
+
+    def test_held_seat_cannot_be_approved_by_hand(self):
+        held = self.register("ha")
+        r = client.patch(f"/api/fest-events/{self.event['id']}/registrations/{held['id']}",
+                         json={"approval_status": "approved"}, headers=auth(self.org_token))
+        assert r.status_code == 400
+        assert "awaiting payment" in r.json()["detail"]
+        assert self.registration("ha")["approval_status"] == "pending"
+
+        # An approved registration is never swept or failed, whatever its payment status
+        db = TestingSessionLocal()
+        db.query(models.EventRegistration).update({"approval_status": models.RegApprovalStatusEnum.approved})
+        db.commit()
+        assert registrations.fail_payments(db, [held["id"]]) == {}
+        db.close()
+        self.expire_all_holds()
+        assert registrations.sweep_holds(TestingSessionLocal) == 0
+        assert self.registration("ha")["approval_status"] == "approved"
+
+    def test_sweeper_is_set_based(self, monkeypatch):
+        monkeypatch.setattr(registrations, "HOLD_SWEEP_BATCH_SIZE", 100)
+
+        db = TestingSessionLocal()
+        event = db.get(models.Event, self.event["id"])
+        event.registration_limit, event.active_registrations = None, 250
+        fest_pass_id = db.query(models.FestPass.id).first()[0]
+        past = datetime.utcnow() - timedelta(minutes=1)
+        db.add_all([
+            models.EventRegistration(event_id=event.id, fest_pass_id=fest_pass_id + 1000 + i,
+                                     approval_status=models.RegApprovalStatusEnum.pending,
+                                     payment_status=models.RegPaymentStatusEnum.held, hold_expires_at=past)
+            for i in range(250)
+        ])
+        db.commit()
+        db.close()
+
+        with count_queries() as counter:
+            assert registrations.sweep_holds(TestingSessionLocal) == 250
+        assert self.seats_taken() == 0
+        # Three batches of (DELETE ... RETURNING, counter UPDATE), not one statement per hold
+        assert counter["n"] < 20
+
+    def test_hold_expiry_uses_index(self):
+        db = TestingSessionLocal()
+        with capture_statements() as statements:
+            registrations.expire_holds(db)
+        db.rollback()
+        db.close()
+        assert full_scans(statements) == []
+
+
+# ─── PAYMENT WEBHOOK TESTS ───────────────────────────────────────────────────
+
+class TestPaymentWebhook:
+    def setup_method(self):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+        college_id = create_college(self.admin_token)
+        self.fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(
+            self.org_token, self.fest["id"], college_id,
+            title="Paid Talk", requires_registration=True,
+            is_paid=True, price=149, is_free=False, registration_limit=1
+        )
+        approve_event(self.admin_token, self.event["id"])
+
+        self.tokens = {}
+        for name in ["pa", "pb"]:
+            signup(name.upper(), f"{name}@test.com")
+            self.tokens[name] = login(f"{name}@test.com")
+            get_entry_pass(self.tokens[name], self.fest["slug"])
+
+    def register(self, name):
+        return client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens[name])).json()
+
+    def registration(self, name):
+        regs = client.get("/api/fest-events/my-registrations", headers=auth(self.tokens[name])).json()
+        return regs[0] if regs else None
+
+    def post(self, events, signature=None):
+        body = json.dumps({"events": events}).encode()
+        return client.post("/api/payments/webhook", content=body, headers={
+            "Content-Type": "application/json",
+            payments.SIGNATURE_HEADER: signature or payments.sign(body),
+        })
+
+    def test_request_returns_before_payment(self, payment_provider):
+        assert self.register("pa")["payment_status"] == "held"
+        # Checkout was started after the response, and nothing is settled yet
+        assert len(payment_provider._outbox) == 1
+        assert self.registration("pa")["payment_status"] == "held"
+
+    def test_redelivery_is_ignored(self):
+        reg = self.register("pa")
+        event = {"id": "evt_1", "payment_id": "p1", "kind": "registration",
+                 "reference": reg["id"], "status": "succeeded"}
+        assert self.post([event]).json() == {"received": 1, "applied": 1, "ignored": 0}
+        assert self.post([event]).json() == {"received": 1, "applied": 0, "ignored": 1}
+        assert self.registration("pa")["payment_status"] == "paid"
+
+    def test_failed_payment_releases_seat_to_waitlist(self, payment_provider):
+        payment_provider.outcome = payments.FAILED
+        self.register("pa")
+        assert self.register("pb")["approval_status"] == "waitlisted"
+        payment_provider.flush()
+
+        assert self.registration("pa") is None
+        # pb was promoted into a fresh hold with its own checkout
+        assert self.registration("pb")["payment_status"] == "held"
+        assert [e["reference"] for e in payment_provider._outbox] == [self.registration("pb")["id"]]
+
+    def test_bad_signature_rejected(self):
+        reg = self.register("pa")
+        r = self.post([{"id": "evt_1", "payment_id": "p1", "kind": "registration",
+                        "reference": reg["id"], "status": "succeeded"}], signature="0" * 64)
+        assert r.status_code == 401
+        assert self.registration("pa")["payment_status"] == "held"
+
+    def test_burst_is_applied_set_based(self):
+        db = TestingSessionLocal()
+        event = db.get(models.Event, self.event["id"])
+        event.registration_limit, event.active_registrations = None, 500
+        until = datetime.utcnow() + timedelta(minutes=10)
+        regs = [models.EventRegistration(event_id=event.id, fest_pass_id=10_000 + i,
+                                         approval_status=models.RegApprovalStatusEnum.pending,
+                                         payment_status=models.RegPaymentStatusEnum.held, hold_expires_at=until)
+                for i in range(500)]
+        db.add_all(regs)
+        db.commit()
+        ids = [r.id for r in regs]
+        db.close()
+
+        events = [{"id": f"evt_{i}", "payment_id": f"p{i}", "kind": "registration",
+                   "reference": rid, "status": "succeeded" if i % 5 else "failed"}
+                  for i, rid in enumerate(ids)]
+        with count_queries() as counter:
+            r = self.post(events)
+        assert r.json() == {"received": 500, "applied": 500, "ignored": 0}
+        # A handful of statements for the whole batch, not one per callback
+        assert counter["n"] < 20
+
+        db = TestingSessionLocal()
+        assert db.query(models.EventRegistration).filter(
+            models.EventRegistration.payment_status == models.RegPaymentStatusEnum.paid).count() == 400
+        assert db.get(models.Event, self.event["id"]).active_registrations == 400
+        db.close()
+
+    def test_city_pass_settled_by_webhook(self, payment_provider):
+        city_event = client.post("/api/events/", json={
+            "event_type": "city", "title": "Paid Gig", "date": "2026-12-01T10:00:00",
+            "is_free": False, "price": 300,
+        }, headers=auth(self.org_token)).json()
+        approve_event(self.admin_token, city_event["id"])
+
+        r = client.post(f"/api/passes/{city_event['id']}/register", headers=auth(self.tokens["pa"]))
+        assert r.json()["payment_status"] == "pending"
+        payment_provider.flush()
+        passes = client.get("/api/passes/my", headers=auth(self.tokens["pa"])).json()
+        assert passes[0]["payment_status"] == "paid"
+
+
+    def test_failed_city_pass_can_be_retried(self, payment_provider):
+        city_event = client.post("/api/events/", json={
+            "event_type": "city", "title": "Paid Gig", "date": "2026-12-01T10:00:00",
+            "is_free": False, "price": 300,
+        }, headers=auth(self.org_token)).json()
+        approve_event(self.admin_token, city_event["id"])
+        register = lambda: client.post(f"/api/passes/{city_event['id']}/register", headers=auth(self.tokens["pa"]))
+
+        payment_provider.outcome = payments.FAILED
+        register()
+        payment_provider.flush()
+        payment_provider.outcome = payments.SUCCEEDED
+        r = register()
+        assert r.status_code == 200
+        assert r.json()["payment_status"] == "pending"
+        assert register().status_code == 400   # one checkout per retry
+        payment_provider.flush()
+        passes = client.get("/api/passes/my", headers=auth(self.tokens["pa"])).json()
+        assert [p["payment_status"] for p in passes] == ["paid"]
+
+    def test_stale_checkout_event_ignored_after_retry(self, payment_provider):
+        city_event = client.post("/api/events/", json={
+            "event_type": "city", "title": "Paid Gig", "date": "2026-12-01T10:00:00",
+            "is_free": False, "price": 300,
+        }, headers=auth(self.org_token)).json()
+        approve_event(self.admin_token, city_event["id"])
+        register = lambda: client.post(f"/api/passes/{city_event['id']}/register", headers=auth(self.tokens["pa"]))
+        my_pass = lambda: client.get("/api/passes/my", headers=auth(self.tokens["pa"])).json()[0]
+
+        payment_provider.outcome = payments.FAILED
+        register()
+        stale = dict(payment_provider._outbox[0])
+        payment_provider.flush()
+        payment_provider.outcome = payments.SUCCEEDED
+        register()
+        # The provider retries the first checkout's "failed" delivery mid-retry
+        assert self.post([dict(stale, id="evt_replay")]).json()["applied"] == 0
+        assert my_pass()["payment_status"] == "pending"
+        payment_provider.flush()
+        assert my_pass()["payment_status"] == "paid"
+        assert self.post([dict(stale, id="evt_replay_2")]).json()["applied"] == 0
+        assert my_pass()["payment_status"] == "paid"
+
+    def test_webhook_refused_without_secret(self, monkeypatch):
+        reg = self.register("pa")
+        body = json.dumps({"events": [{"id": "evt_1", "payment_id": "p1", "kind": "registration",
+                                       "reference": reg["id"], "status": "succeeded"}]}).encode()
+        signature = payments.sign(body)
+        monkeypatch.setattr(payments, "WEBHOOK_SECRET", None)
+        r = client.post("/api/payments/webhook", content=body, headers={
+            "Content-Type": "application/json", payments.SIGNATURE_HEADER: signature})
+        assert r.status_code == 401
+        assert self.registration("pa")["payment_status"] == "held"
+        with pytest.raises(RuntimeError):
+            payments.sign(body)
+
+    def test_local_provider_settles_in_process_without_url(self, monkeypatch):
+        monkeypatch.setattr(payments, "WEBHOOK_URL", None)
+        monkeypatch.setattr(payment_routes, "SessionLocal", TestingSessionLocal)
+        provider = payments.LocalProvider()
+        payments.set_provider(provider)
+        self.register("pa")
+        assert provider.flush() == 1
+        assert self.registration("pa")["approval_status"] == "approved"
+        assert self.registration("pa")["payment_status"] == "paid"
+
+# ─── BULK REGISTRATION DECISION TESTS ────────────────────────────────────────
+
+class TestBulkDecisions:
+    def setup_method(self):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+        college_id = create_college(self.admin_token)
+        self.fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(
+            self.org_token, self.fest["id"], college_id,
+            title="Hackathon", requires_registration=True,
+            approval_mode="manual", registration_limit=3
+        )
+        approve_event(self.admin_token, self.event["id"])
+        self.other = create_fest_event(
+            self.org_token, self.fest["id"], college_id,
+            title="Workshop", requires_registration=True, approval_mode="manual"
+        )
+        approve_event(self.admin_token, self.other["id"])
+
+        self.tokens = {}
+        self.reg_ids = []
+        for i in range(5):
+            name = f"b{i}"
+            signup(name.upper(), f"{name}@test.com")
+            self.tokens[name] = login(f"{name}@test.com")
+            get_entry_pass(self.tokens[name], self.fest["slug"])
+            r = client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(self.tokens[name]))
+            self.reg_ids.append(r.json()["id"])
+        client.post(f"/api/fest-events/{self.other['id']}/register", headers=auth(self.tokens["b0"]))
+
+    def decide(self, token=None, **body):
+        return client.post("/api/fest-events/decisions", json=body, headers=auth(token or self.org_token))
+
+    def statuses(self):
+        r = client.get(f"/api/fest-events/{self.event['id']}/registrations", headers=auth(self.org_token))
+        return {reg["id"]: reg["approval_status"] for reg in r.json()}
+
+    def seats_taken(self):
+        db = TestingSessionLocal()
+        try:
+            return db.get(models.Event, self.event["id"]).active_registrations
+        finally:
+            db.close()
+
+    def test_queue_is_paginated_oldest_first(self):
+        r = client.get("/api/fest-events/pending", params={"event_id": self.event["id"], "limit": 2},
+                       headers=auth(self.org_token))
+        assert r.status_code == 200
+        first = r.json()
+        assert [p["id"] for p in first] == self.reg_ids[:2]
+        assert first[0]["user_email"] == "b0@test.com"
+        assert first[0]["event_title"] == "Hackathon"
+
+        r = client.get("/api/fest-events/pending",
+                       params={"event_id": self.event["id"], "limit": 2, "cursor": r.headers["X-Next-Cursor"]},
+                       headers=auth(self.org_token))
+        # Waitlisted registrations are not in the review queue
+        assert [p["id"] for p in r.json()] == self.reg_ids[2:3]
+        assert "X-Next-Cursor" not in r.headers
+
+    def test_fest_queue_spans_events(self):
+        r = client.get("/api/fest-events/pending", params={"fest_id": self.fest["id"]},
+                       headers=auth(self.org_token))
+        assert sorted(p["event_id"] for p in r.json()) == [self.event["id"]] * 3 + [self.other["id"]]
+
+    def test_queue_requires_privilege(self):
+        r = client.get("/api/fest-events/pending", params={"fest_id": self.fest["id"]},
+                       headers=auth(self.tokens["b1"]))
+        assert r.status_code == 403
+        r = client.get("/api/fest-events/pending", headers=auth(self.org_token))
         assert r.status_code == 400
-        assert "full" in r.json()["detail"]
+
+    def test_approve_by_ids(self):
+        r = self.decide(event_id=self.event["id"], approval_status="approved",
+                        registration_ids=self.reg_ids[:2] + self.reg_ids[3:4])
+        # The waitlisted id is not pending, so it is not selected
+        assert r.json() == {"matched": 2, "decided": 2}
+        statuses = self.statuses()
+        assert [statuses[i] for i in self.reg_ids] == ["approved", "approved", "pending", "waitlisted", "waitlisted"]
+        assert self.seats_taken() == 3
+
+    def test_approve_whole_fest_queue_set_based(self):
+        with count_queries() as counter:
+            r = self.decide(fest_id=self.fest["id"], approval_status="approved", limit=1)
+        assert r.json() == {"matched": 1, "decided": 1}
+        one = counter["n"]
+
+        # Same statement count no matter how many registrations are decided
+        with count_queries() as counter:
+            r = self.decide(fest_id=self.fest["id"], approval_status="approved")
+        assert r.json() == {"matched": 3, "decided": 3}
+        assert counter["n"] == one
+
+    def test_reject_promotes_waitlist(self):
+        r = self.decide(event_id=self.event["id"], approval_status="rejected", registration_ids=self.reg_ids[:2])
+        assert r.json() == {"matched": 2, "decided": 2}
+        statuses = self.statuses()
+        assert [statuses[i] for i in self.reg_ids] == ["rejected", "rejected", "pending", "pending", "pending"]
+        assert self.seats_taken() == 3
+
+    def test_reapproval_checks_capacity_for_whole_batch(self):
+        self.decide(event_id=self.event["id"], approval_status="rejected", registration_ids=self.reg_ids[:3])
+        assert self.seats_taken() == 2   # two promoted from the waitlist, one seat free
+
+        r = self.decide(event_id=self.event["id"], approval_status="approved", status="rejected")
+        assert r.status_code == 409
+        assert self.seats_taken() == 2
+        assert [self.statuses()[i] for i in self.reg_ids[:3]] == ["rejected"] * 3
+
+        r = self.decide(event_id=self.event["id"], approval_status="approved", status="rejected", limit=1)
+        assert r.json() == {"matched": 1, "decided": 1}
+        assert self.statuses()[self.reg_ids[0]] == "approved"
+        assert self.seats_taken() == 3
+
+    def test_filters_by_registration_time(self):
+        future = (datetime.utcnow() + timedelta(days=1)).isoformat()
+        r = self.decide(event_id=self.event["id"], approval_status="approved", registered_after=future)
+        assert r.json() == {"matched": 0, "decided": 0}
+        r = self.decide(event_id=self.event["id"], approval_status="approved", registered_before=future)
+        assert r.json() == {"matched": 3, "decided": 3}
+
+    def test_decisions_require_privilege(self):
+        r = self.decide(token=self.tokens["b1"], event_id=self.event["id"], approval_status="approved")
+        assert r.status_code == 403
+        assert self.statuses()[self.reg_ids[0]] == "pending"
+
+
+# ─── ADMIN MODERATION TESTS ──────────────────────────────────────────────────
+
+class TestAdminModeration:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+    def request_organizers(self, n):
+        for i in range(n):
+            signup(f"Applicant {i}", f"app{i}@test.com")
+            client.post("/api/users/request-organizer", headers=auth(login(f"app{i}@test.com")))
+
+    def pending_events(self, n):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        token = login("org@test.com")
+        return [
+            client.post("/api/events/", json={
+                "event_type": "city", "title": f"Submission {i}", "date": "2026-12-01T10:00:00",
+            }, headers=auth(token)).json()["id"]
+            for i in range(n)
+        ]
+
+    def test_organizer_queue_paginated_with_requester(self):
+        self.request_organizers(3)
+        r = client.get("/api/admin/organizer-requests", params={"limit": 2}, headers=auth(self.admin_token))
+        page = r.json()
+        assert [q["user_name"] for q in page] == ["Applicant 0", "Applicant 1"]
+        assert page[0]["user_email"] == "app0@test.com"
+
+        r = client.get("/api/admin/organizer-requests", params={"cursor": r.headers["X-Next-Cursor"]},
+                       headers=auth(self.admin_token))
+        assert [q["user_name"] for q in r.json()] == ["Applicant 2"]
+
+    def test_bulk_organizer_decisions(self):
+        self.request_organizers(3)
+        ids = [q["id"] for q in client.get("/api/admin/organizer-requests", headers=auth(self.admin_token)).json()]
+
+        with count_queries() as counter:
+            r = client.post("/api/admin/organizer-requests/decisions",
+                            json={"ids": ids[:2], "status": "approved"}, headers=auth(self.admin_token))
+        assert r.json() == {"matched": 2, "decided": 2}
+        approve_two = counter["n"]
+
+        r = client.post("/api/admin/organizer-requests/decisions",
+                        json={"ids": ids, "status": "approved"}, headers=auth(self.admin_token))
+        # Already approved ones are skipped
+        assert r.json() == {"matched": 3, "decided": 1}
+
+        db = TestingSessionLocal()
+        roles = {u.email: u.role for u in db.query(models.User).filter(models.User.email.like("app%"))}
+        db.close()
+        assert set(roles.values()) == {models.RoleEnum.organizer}
+        assert client.get("/api/admin/organizer-requests", headers=auth(self.admin_token)).json() == []
+
+        # A fixed handful of statements for the batch
+        assert approve_two < 10
+
+    def test_bulk_decisions_admin_only(self):
+        self.request_organizers(1)
+        r = client.post("/api/admin/organizer-requests/decisions",
+                        json={"ids": [1], "status": "approved"}, headers=auth(login("app0@test.com")))
+        assert r.status_code == 403
+
+    def test_event_queue_includes_submitter(self):
+        self.pending_events(3)
+        r = client.get("/api/admin/events/pending", params={"limit": 2}, headers=auth(self.admin_token))
+        page = r.json()
+        assert [e["title"] for e in page] == ["Submission 0", "Submission 1"]
+        assert page[0]["organizer_name"] == "Organizer"
+        assert page[0]["organizer_email"] == "org@test.com"
+        assert "X-Next-Cursor" in r.headers
+
+    def test_queues_bounded_by_default(self):
+        n = DEFAULT_PAGE_SIZE + 5
+        seed_events(n, status=models.StatusEnum.pending)
+        db = TestingSessionLocal()
+        users = [models.User(name=f"Applicant {i}", email=f"bulk{i}@test.com") for i in range(n)]
+        db.add_all(users)
+        db.flush()
+        db.add_all([models.OrganizerRequest(user_id=u.id) for u in users])
+        db.commit()
+        db.close()
+
+        for path in ("/api/admin/events/pending", "/api/admin/organizer-requests"):
+            r = client.get(path, headers=auth(self.admin_token))
+            assert len(r.json()) == DEFAULT_PAGE_SIZE
+            rest = client.get(path, params={"cursor": r.headers["X-Next-Cursor"]}, headers=auth(self.admin_token))
+            assert len(r.json()) + len(rest.json()) == n
+            assert "X-Next-Cursor" not in rest.headers
+
+    def test_bulk_event_decisions(self):
+        ids = self.pending_events(4)
+        statement_counts = []
+        for batch in (ids[:1], ids[1:]):
+            with count_queries() as counter:
+                r = client.post("/api/admin/events/decisions",
+                                json={"ids": batch, "status": "approved"}, headers=auth(self.admin_token))
+            assert r.json() == {"matched": len(batch), "decided": len(batch)}
+            statement_counts.append(counter["n"])
+        # One UPDATE (+ search index writes) per batch, whatever its size
+        assert statement_counts[0] == statement_counts[1]
+
+        assert client.get("/api/admin/events/pending", headers=auth(self.admin_token)).json() == []
+        listed = {e["id"] for e in client.get("/api/events/city").json()}
+        assert set(ids) <= listed
+        hits = client.get("/api/search", params={"q": "Submission", "kind": "event"}).json()
+        assert len(hits) == 4
+
+        r = client.post("/api/admin/events/decisions",
+                        json={"ids": ids[:2], "status": "rejected"}, headers=auth(self.admin_token))
+        assert r.json() == {"matched": 2, "decided": 2}
+        hits = client.get("/api/search", params={"q": "Submission", "kind": "event"}).json()
+        assert len(hits) == 2
+
+    def test_single_decisions_still_404(self):
+        assert client.post("/api/admin/events/999/approve", headers=auth(self.admin_token)).status_code == 404
+        r = client.post("/api/admin/organizer-requests/999/reject", headers=auth(self.admin_token))
+        assert r.status_code == 404
+
+
+# ─── ASYNC ROUTE TESTS ───────────────────────────────────────────────────────
+
+class TestAsyncRoutes:
+    def test_hot_routes_are_async(self):
+        for endpoint in (auth_routes.signup, auth_routes.login, entry_passes.claim_entry_pass, entry_passes.gate_scan_qr, entry_passes.gate_scan,
+                         fest_events.register_for_event):
+            assert inspect.iscoroutinefunction(endpoint), endpoint.__name__
+
+    def test_async_url_follows_database_url(self):
+        assert async_url("sqlite:///./eventx.db") == "sqlite+aiosqlite:///./eventx.db"
+        assert async_url("postgresql://u:p@db:5432/eventx") == "postgresql+asyncpg://u:p@db:5432/eventx"
+
+    def test_async_user_lookup_binds_int_subject(self):
+        stmt = select(models.User).where(models.User.id == user_id_from({"sub": "42"}))
+        compiled = stmt.compile(dialect=asyncpg.dialect())
+        assert list(compiled.params.values()) == [42]
+        assert "$1" in str(compiled)
+
+    def test_async_auth_rejects_bad_subject(self):
+        for claims in ({"sub": "not-a-number"}, {"role": "admin"}):
+            r = client.post("/api/fest-events/1/register", headers=auth(create_token(claims)))
+            assert r.status_code == 401, claims
+
+    def test_listings_stay_sync(self, async_engine):
+        # CPU-bound listings run in the threadpool, off the event loop
+        for endpoint in (events.get_events, events.get_city_events):
+            assert not inspect.iscoroutinefunction(endpoint), endpoint.__name__
+
+        seed_events(3)
+        seen = {"sync": 0, "async": 0}
+
+        def on_sync(*args):
+            seen["sync"] += 1
+
+        def on_async(*args):
+            seen["async"] += 1
+
+        sa_event.listen(engine, "before_cursor_execute", on_sync)
+        sa_event.listen(async_engine.sync_engine, "before_cursor_execute", on_async)
+        try:
+            r = client.get("/api/events/")
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", on_sync)
+            sa_event.remove(async_engine.sync_engine, "before_cursor_execute", on_async)
+        assert r.status_code == 200
+        assert len(r.json()) == 3
+        assert seen["sync"] > 0 and seen["async"] == 0
+
+    def test_concurrent_listing_requests_on_one_loop(self):
+        seed_events(5)
+
+        async def burst():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return await asyncio.gather(*(ac.get("/api/events/", params={"limit": 2}) for _ in range(20)))
+
+        responses = asyncio.run(burst())
+        assert {r.status_code for r in responses} == {200}
+        assert len({r.text for r in responses}) == 1
+        assert len(responses[0].json()) == 2
+
+    def test_register_and_scan_through_async_session(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        org_token = login("org@test.com")
+        college_id = create_college(admin_token)
+        fest = create_fest(org_token, college_id)
+        event = create_fest_event(org_token, fest["id"], college_id, requires_registration=True)
+
+        signup("User", "user@test.com")
+        user_token = login("user@test.com")
+        fest_pass = get_entry_pass(user_token, fest["slug"])
+        assert fest_pass.status_code == 201, fest_pass.text
+        r = client.post(f"/api/fest-events/{event['id']}/register", headers=auth(user_token))
+        assert r.status_code == 201, r.text
+        assert r.json()["approval_status"] == "approved"
+
+        r = client.post(f"/api/fests/{fest['slug']}/gate-scan",
+                        json={"qr_code": fest_pass.json()["qr_code"]}, headers=auth(org_token))
+        assert r.status_code == 200, r.text
+        db = TestingSessionLocal()
+        assert db.get(models.FestPass, fest_pass.json()["id"]).checked_in is True
+        assert db.get(models.Event, event["id"]).active_registrations == 1
+        db.close()
+
+
+# ─── SQLITE PROFILE TESTS ────────────────────────────────────────────────────
+
+class TestSQLiteProfile:
+    def file_engine(self, tmp_path, name="profile.db"):
+        file_engine = sqlite_profile.configure(
+            create_engine(f"sqlite:///{tmp_path / name}", connect_args={"check_same_thread": False}))
+        with file_engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE t (x INTEGER)")
+        return file_engine
+
+    def test_pragmas_applied_on_connect(self, tmp_path):
+        file_engine = self.file_engine(tmp_path)
+        with file_engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+            assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == -64000
+        file_engine.dispose()
+
+    def test_in_memory_database_gets_no_writer_lock(self):
+        assert not sqlite_profile.is_file_database(engine)
+
+    def test_writers_queue_while_readers_continue(self, tmp_path):
+        file_engine = self.file_engine(tmp_path)
+        holder = file_engine.connect()
+        holder.exec_driver_sql("INSERT INTO t VALUES (1)")  # takes the writer lock
+
+        done = []
+
+        def write():
+            with file_engine.begin() as conn:
+                conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+            done.append(time.monotonic())
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        time.sleep(0.2)
+        assert not done  # queued behind the open transaction, not failed
+        with file_engine.connect() as reader:
+            assert reader.exec_driver_sql("SELECT count(*) FROM t").scalar() == 0
+        released_at = time.monotonic()
+        holder.commit()
+        holder.close()
+        writer.join(5)
+        assert done and done[0] >= released_at
+        with file_engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM t").scalar() == 2
+        file_engine.dispose()
+
+    def test_lock_timeout_is_a_locked_error(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sqlite_profile, "WRITE_LOCK_TIMEOUT", 0.05)
+        file_engine = self.file_engine(tmp_path)
+        holder = file_engine.connect()
+        holder.exec_driver_sql("INSERT INTO t VALUES (1)")
+        errors = []
+
+        def write():
+            try:
+                with file_engine.begin() as conn:
+                    conn.exec_driver_sql("INSERT INTO t VALUES (2)")
+            except OperationalError as exc:
+                errors.append(exc)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(5)
+        holder.rollback()
+        holder.close()
+        assert len(errors) == 1 and sqlite_profile.is_locked_error(errors[0])
+        # The lock is free again once the holder rolled back
+        with file_engine.begin() as conn:
+            conn.exec_driver_sql("INSERT INTO t VALUES (3)")
+        file_engine.dispose()
+
+    def test_async_writer_waits_without_blocking_the_loop(self, tmp_path):
+        file_engine = self.file_engine(tmp_path)
+        file_async = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'profile.db'}")
+        sqlite_profile.configure(file_async.sync_engine)
+        holder = file_engine.connect()
+        holder.exec_driver_sql("INSERT INTO t VALUES (1)")
+
+        def release():
+            holder.commit()
+            holder.close()
+
+        async def scenario():
+            ticks = 0
+
+            async def write():
+                async with file_async.begin() as conn:
+                    await conn.execute(text("INSERT INTO t VALUES (2)"))
+
+            task = asyncio.ensure_future(write())
+            threading.Timer(0.3, release).start()
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            await task
+            await file_async.dispose()
+            return ticks
+
+        ticks = asyncio.run(scenario())
+        assert ticks >= 10  # the loop kept running while the write queued
+        with file_engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM t").scalar() == 2
+        file_engine.dispose()
+
+    def test_busy_database_answers_503(self):
+        exc = OperationalError("INSERT", {}, sqlite3.OperationalError("database is locked"))
+        response = asyncio.run(database_busy(None, exc))
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+
+# ─── READ REPLICA ROUTING TESTS ──────────────────────────────────────────────
+
+class TestReadReplica:
+    """A second SQLite file stands in for the replica; the two are seeded
+    differently so every read shows which one served it."""
+
+    @pytest.fixture(autouse=True)
+    def databases(self, tmp_path):
+        self.primary = database.make_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+        self.replica = database.make_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+        for bind, title in ((self.primary, "Primary copy"), (self.replica, "Replica copy")):
+            Base.metadata.create_all(bind=bind)
+            with sessionmaker(bind=bind)() as db:
+                db.add(models.Event(event_type=models.EventTypeEnum.city, title=title, date=datetime(2026, 12, 1),
+                                    category="Music", status=models.StatusEnum.approved))
+                db.commit()
+        self.Session = sessionmaker(bind=self.primary, autoflush=False,
+                                    class_=database.RoutingSession, replica=self.replica)
+        yield
+        self.primary.dispose()
+        self.replica.dispose()
+
+    def titles(self, db):
+        return [t for (t,) in db.query(models.Event.title).order_by(models.Event.id)]
+
+    def test_reads_go_to_replica(self):
+        with self.Session(use_replica=True) as db:
+            assert self.titles(db) == ["Replica copy"]
+            assert db.get_bind() is self.primary  # no statement: primary
+
+    def test_writes_go_to_primary_without_replica_flag(self):
+        with self.Session() as db:
+            assert self.titles(db) == ["Primary copy"]
+
+    def test_read_your_writes_after_flush(self):
+        with self.Session(use_replica=True) as db:
+            db.add(models.Event(event_type=models.EventTypeEnum.city, title="Fresh", date=datetime(2026, 12, 2),
+                                category="Music", status=models.StatusEnum.approved))
+            db.flush()
+            assert self.titles(db) == ["Primary copy", "Fresh"]
+            db.commit()
+        with sessionmaker(bind=self.replica)() as db:
+            assert self.titles(db) == ["Replica copy"]
+
+    def test_read_your_writes_after_dml_statement(self):
+        with self.Session(use_replica=True) as db:
+            db.execute(update(models.Event).values(title="Renamed"))
+            assert self.titles(db) == ["Renamed"]
+        with self.Session(use_replica=True) as db:
+            db.execute(text("UPDATE events SET category = 'Art'"))
+            assert db.query(models.Event.category).scalar() == "Art"
+
+    def test_routes_read_replica_and_write_primary(self, monkeypatch):
+        tmp = str(self.primary.url.database).rsplit("/", 1)[0]
+        async_primary = database.make_async_engine(f"sqlite+aiosqlite:///{tmp}/primary.db")
+        async_replica = database.make_async_engine(f"sqlite+aiosqlite:///{tmp}/replica.db")
+        monkeypatch.setattr(database, "SessionLocal", self.Session)
+        monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(
+            async_primary, autoflush=False, expire_on_commit=False,
+            sync_session_class=database.RoutingSession, replica=async_replica.sync_engine))
+        monkeypatch.delitem(app.dependency_overrides, get_db)
+        monkeypatch.delitem(app.dependency_overrides, get_async_db)
+        try:
+            r = client.get("/api/events/")  # async route
+            assert [e["title"] for e in r.json()] == ["Replica copy"]
+            r = client.get(f"/api/events/{r.json()[0]['id']}")  # sync route
+            assert r.json()["title"] == "Replica copy"
+
+            signup("Writer", "writer@test.com")  # POST: primary
+            with self.Session() as db:
+                assert db.query(models.User).filter_by(email="writer@test.com").count() == 1
+            with sessionmaker(bind=self.replica)() as db:
+                assert db.query(models.User).count() == 0
+        finally:
+            asyncio.run(async_primary.dispose())
+            asyncio.run(async_replica.dispose())
+
+    def test_cache_does_not_outlive_replica_lag(self):
+        def get():
+            with self.Session(use_replica=True) as db:
+                def build():
+                    return db.query(models.Event).all(), {}
+                body = conditional_json(None, db, ("replica.test",), ("events",), List[schemas.EventOut], build).body
+                return [e["title"] for e in json.loads(body)]
+
+        # Written on the primary and invalidated; the replica has not caught up
+        response_cache.invalidate("events")
+        assert get() == ["Replica copy"]
+        with sessionmaker(bind=self.replica)() as db:
+            event = db.query(models.Event).one()
+            event.title, event.updated_at = "Primary copy", datetime.utcnow() + timedelta(seconds=1)
+            db.commit()
+        # Caught up: the stamp moved, so the stale body is not served again
+        assert get() == ["Primary copy"]
+
+    def test_pool_options_for_postgres(self):
+        options = database.engine_options("postgresql://u:p@db/eventx")
+        assert options["pool_pre_ping"] is True
+        assert options["pool_size"] == database.POOL_SIZE
+        assert options["connect_args"] == {"options": f"-c statement_timeout={database.STATEMENT_TIMEOUT}"}
+        options = database.engine_options("postgresql+asyncpg://u:p@db/eventx")
+        assert options["connect_args"] == {"server_settings": {"statement_timeout": str(database.STATEMENT_TIMEOUT)}}
+        assert "pool_size" not in database.engine_options("sqlite:///./eventx.db")
 
 
 # ─── EVENT EDIT PROTECTION TESTS ─────────────────────────────────────────────
@@ -550,9 +1778,1327 @@ class TestEventEditProtection:
                          headers=auth(self.org_token))
         assert r.status_code == 400
 
+    def test_limit_lock_uses_counter(self):
+        db = TestingSessionLocal()
+        db.get(models.Event, self.event["id"]).active_registrations = 7
+        db.commit()
+        db.close()
+        r = client.patch(f"/api/events/{self.event['id']}",
+                         json={"registration_limit": 5},
+                         headers=auth(self.org_token))
+        assert r.status_code == 400
+        assert "current count of 7" in r.json()["detail"]
+
     def test_decrease_limit_below_count_locked(self):
         r = client.patch(f"/api/events/{self.event['id']}",
                          json={"registration_limit": 0},
                          headers=auth(self.org_token))
         assert r.status_code == 400
         assert "locked" in r.json()["detail"]
+
+
+# ─── EVENT LISTING / PAGINATION TESTS ────────────────────────────────────────
+
+def seed_events(n, **overrides):
+    """Insert n approved city events directly, one day apart; returns their ids."""
+    db = TestingSessionLocal()
+    ids = []
+    for i in range(n):
+        data = {
+            "event_type": models.EventTypeEnum.city,
+            "title": f"Event {i}",
+            "date": datetime(2026, 12, 1) + timedelta(days=i),
+            "category": "Music",
+            "price": 0.0,
+            "is_free": True,
+            "status": models.StatusEnum.approved,
+        }
+        data.update(overrides)
+        e = models.Event(**data)
+        db.add(e)
+        db.flush()
+        ids.append(e.id)
+    db.commit()
+    db.close()
+    response_cache.clear()  # written behind the API's back
+    return ids
+
+
+class TestEventListing:
+    def test_keyset_pages_cover_all_events_once(self):
+        ids = seed_events(5)
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            r = client.get("/api/events/", params=params)
+            assert r.status_code == 200
+            seen += [e["id"] for e in r.json()]
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        # newest first, no duplicates or gaps
+        assert seen == list(reversed(ids))
+
+    def test_same_date_ties_broken_by_id(self):
+        ids = seed_events(3, date=datetime(2026, 12, 1))
+        first = client.get("/api/events/", params={"limit": 2})
+        second = client.get("/api/events/", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+        assert [e["id"] for e in first.json() + second.json()] == sorted(ids, reverse=True)
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_filters(self):
+        seed_events(2)
+        paid = seed_events(1, category="Tech", price=300.0, is_free=False)
+        r = client.get("/api/events/", params={"category": "Tech"})
+        assert [e["id"] for e in r.json()] == paid
+        r = client.get("/api/events/", params={"is_free": "false", "min_price": 100})
+        assert [e["id"] for e in r.json()] == paid
+        r = client.get("/api/events/", params={"date_to": "2026-12-01T23:59:00"})
+        assert len(r.json()) == 2
+
+    def test_default_page_is_bounded(self):
+        ids = seed_events(DEFAULT_PAGE_SIZE + 5)
+        for path in ("/api/events/", "/api/events/city"):
+            r = client.get(path)
+            assert r.status_code == 200
+            assert len(r.json()) == DEFAULT_PAGE_SIZE
+            # Following the cursor, as the frontend does, reaches every event
+            rest = client.get(path, params={"cursor": r.headers["X-Next-Cursor"]})
+            assert len(r.json()) + len(rest.json()) == len(ids)
+            assert "X-Next-Cursor" not in rest.headers
+
+    def test_organizer_and_college_listings_bounded_by_default(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        college_id = create_college(login("admin@test.com"))
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        org_token = login("org@test.com")
+        db = TestingSessionLocal()
+        organizer_id = db.query(models.User.id).filter_by(email="org@test.com").scalar()
+        db.close()
+        ids = seed_events(DEFAULT_PAGE_SIZE + 5, organizer_id=organizer_id, college_id=college_id)
+
+        for path, headers in (("/api/events/mine", auth(org_token)),
+                              (f"/api/colleges/{college_id}/events", {})):
+            r = client.get(path, headers=headers)
+            assert len(r.json()) == DEFAULT_PAGE_SIZE
+            rest = client.get(path, params={"cursor": r.headers["X-Next-Cursor"]}, headers=headers)
+            assert len(r.json()) + len(rest.json()) == len(ids)
+            assert "X-Next-Cursor" not in rest.headers
+
+    def test_invalid_cursor_rejected(self):
+        r = client.get("/api/events/", params={"cursor": "not-a-cursor"})
+        assert r.status_code == 400
+
+
+# ─── QUERY COUNT TESTS ───────────────────────────────────────────────────────
+
+# Listening on the Engine class catches the sync routes' statements and
+# those of whichever async engine the current test runs on
+ENGINES = (Engine,)
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements issued against the test engines inside the block."""
+    counter = {"n": 0}
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    for e in ENGINES:
+        sa_event.listen(e, "before_cursor_execute", on_execute)
+    try:
+        yield counter
+    finally:
+        for e in ENGINES:
+            sa_event.remove(e, "before_cursor_execute", on_execute)
+
+
+def seed_fest_events(n, slug="qc-fest"):
+    """Insert a fest with n approved events, each in its own college and
+    sub-fest so lazy loads could not be served from the identity map."""
+    db = TestingSessionLocal()
+    fest = models.Fest(slug=slug, name=slug, status=models.FestStatusEnum.live)
+    db.add(fest)
+    db.flush()
+    for i in range(n):
+        college = models.College(name=f"{slug} college {i}")
+        db.add(college)
+        db.flush()
+        # Every event but the first points at a distinct fest
+        event_fest = fest
+        if i:
+            event_fest = models.Fest(slug=f"{slug}-{i}", name=f"{slug} {i}", status=models.FestStatusEnum.live)
+            db.add(event_fest)
+            db.flush()
+        db.add(models.Event(
+            event_type=models.EventTypeEnum.fest, title=f"FE {i}",
+            date=datetime(2026, 12, 1) + timedelta(days=i),
+            status=models.StatusEnum.approved,
+            fest_id=event_fest.id, college_id=college.id,
+        ))
+    db.commit()
+    db.close()
+    response_cache.clear()  # written behind the API's back
+
+
+class TestEventListingQueryCount:
+    def _queries_for(self, url, n_events, slug):
+        seed_fest_events(n_events, slug=slug)
+        with count_queries() as counter:
+            r = client.get(url.format(slug=slug))
+        assert r.status_code == 200
+        assert len(r.json()) >= n_events
+        return counter["n"]
+
+    def test_event_list_query_count_flat(self):
+        small = self._queries_for("/api/events/", 2, "qc-a")
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+        large = self._queries_for("/api/events/", 20, "qc-b")
+        assert small == large
+
+    def test_pending_events_query_count_flat(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        headers = auth(login("admin@test.com"))
+        counts = []
+        for n, total, slug in [(2, 2, "qc-a"), (20, 22, "qc-b")]:
+            seed_fest_events(n, slug=slug)
+            db = TestingSessionLocal()
+            db.query(models.Event).update({"status": models.StatusEnum.pending})
+            db.commit()
+            db.close()
+            response_cache.clear()
+            with count_queries() as counter:
+                r = client.get("/api/admin/events/pending", headers=headers)
+            assert len(r.json()) == total
+            assert all(e["college_name"] for e in r.json())
+            counts.append(counter["n"])
+        assert counts[0] == counts[1]
+
+
+# ─── EVENT COUNT AGGREGATE TESTS ─────────────────────────────────────────────
+
+class TestEventCounts:
+    def test_counts_only_approved_events(self):
+        seed_fest_events(3, slug="ec")
+        db = TestingSessionLocal()
+        college = db.query(models.College).filter(models.College.name == "ec college 0").first()
+        # one more pending event in the first college / fest: must not count
+        db.add(models.Event(
+            event_type=models.EventTypeEnum.fest, title="Pending",
+            date=college.events[0].date, status=models.StatusEnum.pending,
+            fest_id=college.events[0].fest_id, college_id=college.id,
+        ))
+        db.commit()
+        db.close()
+        response_cache.clear()
+
+        colleges = {c["name"]: c["event_count"] for c in client.get("/api/colleges/").json()}
+        assert colleges == {"ec college 0": 1, "ec college 1": 1, "ec college 2": 1}
+        assert client.get("/api/fests/ec").json()["event_count"] == 1
+
+    def test_listing_cost_independent_of_row_count(self):
+        seed_fest_events(2, slug="ec-a")
+        with count_queries() as small:
+            client.get("/api/colleges/")
+            client.get("/api/fests/")
+        seed_fest_events(20, slug="ec-b")
+        with count_queries() as large:
+            colleges = client.get("/api/colleges/").json()
+            fests = client.get("/api/fests/").json()
+        assert len(colleges) == 22 and len(fests) == 22
+        assert small["n"] == large["n"]
+
+
+# ─── RESPONSE CACHE TESTS ────────────────────────────────────────────────────
+
+class TestResponseCache:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+    def test_repeat_request_served_from_cache(self):
+        seed_events(3)
+        first = client.get("/api/events/")
+        with count_queries() as counter:
+            second = client.get("/api/events/")
+        assert counter["n"] == 1   # the ETag stamp query only
+
+        assert second.content == first.content
+
+    def test_warm_cache_prebuilds_listing(self, monkeypatch):
+        seed_events(3)
+        monkeypatch.setattr(main, "SessionLocal", TestingSessionLocal)
+        main.warm_cache()
+        with count_queries() as counter:
+            assert len(client.get("/api/events/").json()) == 3
+        assert counter["n"] == 1   # the ETag stamp query only
+
+    def test_approve_invalidates_listing(self):
+        assert client.get("/api/events/").json() == []
+        e = client.post("/api/events/", json={
+            "event_type": "city", "title": "Gig", "date": "2026-12-01T10:00:00",
+        }, headers=auth(self.org_token)).json()
+        approve_event(self.admin_token, e["id"])
+        assert [ev["id"] for ev in client.get("/api/events/").json()] == [e["id"]]
+
+    def test_college_rename_invalidates_event_detail(self):
+        college_id = create_college(self.admin_token)
+        e = client.post("/api/events/", json={
+            "event_type": "city", "title": "Gig", "date": "2026-12-01T10:00:00",
+            "college_id": college_id,
+        }, headers=auth(self.org_token)).json()
+        assert client.get(f"/api/events/{e['id']}").json()["college_name"] == "IIT Bombay"
+        client.put(f"/api/colleges/{college_id}", json={"name": "IITB"}, headers=auth(self.admin_token))
+        assert client.get(f"/api/events/{e['id']}").json()["college_name"] == "IITB"
+
+    def test_lru_eviction_respects_bounds(self):
+        cache = ResponseCache(max_entries=2, max_bytes=1000)
+        v = cache.versions(("events",))
+        cache.put(("a",), v, b"1", {})
+        cache.put(("b",), v, b"2", {})
+        cache.get(("a",))                 # a becomes most recently used
+        cache.put(("c",), v, b"3", {})
+        assert cache.get(("b",)) is None
+        assert cache.get(("a",)) is not None
+        cache.put(("big",), v, b"x" * 999, {})   # over the byte budget: LRU entry goes
+        assert cache.get(("c",)) is None
+        assert cache.get(("big",)) is not None
+
+    def test_stale_build_not_cached(self):
+        cache = ResponseCache()
+        v = cache.versions(("events",))
+        cache.invalidate("events")        # a write lands mid-build
+        cache.put(("a",), v, b"old", {})
+        assert cache.get(("a",)) is None
+
+
+# ─── CONDITIONAL GET TESTS ───────────────────────────────────────────────────
+
+class TestConditionalGet:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+    def test_unchanged_listing_returns_304_without_listing_query(self):
+        seed_events(3)
+        r = client.get("/api/events/")
+        etag = r.headers["ETag"]
+        response_cache.clear()
+        with count_queries() as counter:
+            r2 = client.get("/api/events/", headers={"If-None-Match": etag})
+        assert r2.status_code == 304
+        assert r2.headers["ETag"] == etag
+        assert counter["n"] == 1   # the stamp query only
+
+    def test_etag_changes_after_write(self):
+        college_id = create_college(self.admin_token)
+        etag = client.get(f"/api/colleges/{college_id}").headers["ETag"]
+        client.put(f"/api/colleges/{college_id}", json={"name": "IITB"}, headers=auth(self.admin_token))
+        r = client.get(f"/api/colleges/{college_id}", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert r.json()["name"] == "IITB"
+        assert r.headers["ETag"] != etag
+
+    def test_etag_is_per_resource(self):
+        seed_fest_events(2, slug="et")
+        a = client.get("/api/fests/et").headers["ETag"]
+        b = client.get("/api/fests/et-1").headers["ETag"]
+        assert a != b
+        assert client.get("/api/fests/et-1", headers={"If-None-Match": a}).status_code == 200
+
+    def test_bulk_unlink_bumps_event_updated_at(self):
+        college_id = create_college(self.admin_token)
+        ids = seed_events(1, college_id=college_id)
+        db = TestingSessionLocal()
+        before = db.get(models.Event, ids[0]).updated_at
+        db.close()
+        client.delete(f"/api/colleges/{college_id}", headers=auth(self.admin_token))
+        db = TestingSessionLocal()
+        event = db.get(models.Event, ids[0])
+        assert event.college_id is None
+        assert event.updated_at > before
+        db.close()
+
+
+    def test_college_delete_moves_listing_etag(self):
+        first = create_college(self.admin_token)
+        client.post("/api/colleges/", json={"name": "IIT Delhi"}, headers=auth(self.admin_token))
+        etag = client.get("/api/colleges/").headers["ETag"]
+        # The oldest row, whose updated_at is not the max, with no events to unlink
+        client.delete(f"/api/colleges/{first}", headers=auth(self.admin_token))
+        r = client.get("/api/colleges/", headers={"If-None-Match": etag})
+        assert r.status_code == 200
+        assert [c["name"] for c in r.json()] == ["IIT Delhi"]
+
+
+# ─── FEED TESTS ──────────────────────────────────────────────────────────────
+
+class TestFeed:
+    def setup_method(self):
+        signup("User", "u@test.com")
+        self.token = login("u@test.com")
+        db = TestingSessionLocal()
+        for name in ["Music", "Technology"]:
+            db.add(models.Interest(name=name))
+        db.commit()
+        self.interest_ids = {i.name: i.id for i in db.query(models.Interest).all()}
+        db.close()
+
+    def test_interest_matches_ranked_first_then_by_date(self):
+        soon = datetime.utcnow() + timedelta(days=1)
+        later = datetime.utcnow() + timedelta(days=30)
+        music_later = seed_events(1, category="Music", date=later)[0]
+        tech_soon = seed_events(1, category="Technology", date=soon)[0]
+        tech_later = seed_events(1, category="Technology", date=later)[0]
+        client.post("/api/users/interests", json={"interest_ids": [self.interest_ids["Technology"]]},
+                    headers=auth(self.token))
+        ids = [e["id"] for e in client.get("/api/events/feed", headers=auth(self.token)).json()]
+        assert ids == [tech_soon, tech_later, music_later]
+
+    def test_feed_pages_are_disjoint_and_complete(self):
+        ids = seed_events(5)
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            r = client.get("/api/events/feed", params=params, headers=auth(self.token))
+            seen += [e["id"] for e in r.json()]
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert sorted(seen) == sorted(ids)
+
+    def test_feed_default_page_is_bounded(self):
+        ids = seed_events(DEFAULT_PAGE_SIZE + 5)
+        r = client.get("/api/events/feed", headers=auth(self.token))
+        assert len(r.json()) == DEFAULT_PAGE_SIZE
+        rest = client.get("/api/events/feed", params={"cursor": r.headers["X-Next-Cursor"]}, headers=auth(self.token))
+        assert sorted(e["id"] for e in r.json() + rest.json()) == sorted(ids)
+        assert "X-Next-Cursor" not in rest.headers
+
+    def test_first_page_cached_until_interests_change(self):
+        date = datetime.utcnow() + timedelta(days=10)
+        music = seed_events(1, category="Music", date=date)[0]
+        tech = seed_events(1, category="Technology", date=date)[0]
+        client.post("/api/users/interests", json={"interest_ids": [self.interest_ids["Music"]]},
+                    headers=auth(self.token))
+        assert client.get("/api/events/feed", headers=auth(self.token)).json()[0]["id"] == music
+        client.post("/api/users/interests", json={"interest_ids": [self.interest_ids["Technology"]]},
+                    headers=auth(self.token))
+        assert client.get("/api/events/feed", headers=auth(self.token)).json()[0]["id"] == tech
+
+
+# ─── SEARCH TESTS ────────────────────────────────────────────────────────────
+
+class TestSearch:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+    def _city_event(self, title, **extra):
+        return client.post("/api/events/", json={
+            "event_type": "city", "title": title, "date": "2026-12-01T10:00:00", **extra,
+        }, headers=auth(self.org_token)).json()
+
+    def test_only_approved_events_are_searchable(self):
+        e = self._city_event("Robotics Championship", description="Battle bots arena")
+        assert client.get("/api/search", params={"q": "robotics"}).json() == []
+        approve_event(self.admin_token, e["id"])
+        results = client.get("/api/search", params={"q": "robotics"}).json()
+        assert [(r["kind"], r["id"]) for r in results] == [("event", e["id"])]
+        assert "<mark>Robotics</mark>" in results[0]["title"]
+
+    def test_update_reindexes_event(self):
+        e = self._city_event("Jazz Night")
+        approve_event(self.admin_token, e["id"])
+        client.patch(f"/api/events/{e['id']}", json={"title": "Blues Night"}, headers=auth(self.org_token))
+        assert client.get("/api/search", params={"q": "jazz"}).json() == []
+        assert len(client.get("/api/search", params={"q": "blues"}).json()) == 1
+
+    def test_fests_and_colleges_indexed(self):
+        college_id = create_college(self.admin_token)
+        create_fest(self.org_token, college_id)
+        kinds = {r["kind"] for r in client.get("/api/search", params={"q": "IIT"}).json()}
+        assert kinds == {"college"}
+        fest = client.get("/api/search", params={"q": "science fest", "kind": "fest"}).json()
+        assert fest[0]["slug"] == "techfest-2026"
+        client.delete(f"/api/colleges/{college_id}", headers=auth(self.admin_token))
+        assert client.get("/api/search", params={"q": "IIT"}).json() == []
+
+    def test_title_hits_rank_above_body_hits_and_paginate(self):
+        body_hit = self._city_event("Open Mic", description="A night of poetry and music")
+        title_hit = self._city_event("Poetry Slam")
+        for e in (body_hit, title_hit):
+            approve_event(self.admin_token, e["id"])
+        first = client.get("/api/search", params={"q": "poetry", "limit": 1})
+        assert first.json()[0]["id"] == title_hit["id"]
+        second = client.get("/api/search", params={"q": "poetry", "limit": 1,
+                                                   "cursor": first.headers["X-Next-Cursor"]})
+        assert second.json()[0]["id"] == body_hit["id"]
+        assert "<mark>poetry</mark>" in second.json()[0]["snippet"]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_highlights_escape_organizer_html(self):
+        e = self._city_event("<img src=x onerror=alert(1)> Robotics",
+                             description="<script>steal()</script> robotics demo")
+        approve_event(self.admin_token, e["id"])
+        result = client.get("/api/search", params={"q": "robotics"}).json()[0]
+        assert result["title"] == "&lt;img src=x onerror=alert(1)&gt; <mark>Robotics</mark>"
+        assert "<script>" not in result["snippet"]
+        assert "&lt;script&gt;" in result["snippet"]
+        assert "<mark>robotics</mark>" in result["snippet"]
+
+    def test_query_syntax_is_not_interpreted(self):
+        assert client.get("/api/search", params={"q": '"unbalanced AND ( NEAR'}).status_code == 200
+
+
+# ─── QUERY PLAN TESTS ────────────────────────────────────────────────────────
+
+# Tables whose size grows with traffic; a plain "SCAN <table>" on any of them
+# means a query shape is missing an index.
+HOT_TABLES = {
+    "events", "event_registrations", "fest_passes", "fest_members",
+    "user_interests", "passes", "fests", "users", "colleges",
+}
+
+# Routes that return a whole table by design (the college picker), where
+# walking that table is the answer rather than a missing index
+WHOLE_TABLE_READS = {"/api/colleges/": "colleges"}
+
+
+@contextmanager
+def capture_statements():
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    for e in ENGINES:
+        sa_event.listen(e, "before_cursor_execute", on_execute)
+    try:
+        yield statements
+    finally:
+        for e in ENGINES:
+            sa_event.remove(e, "before_cursor_execute", on_execute)
+
+
+def full_scans(statements):
+    """EXPLAIN QUERY PLAN every captured SELECT / UPDATE / DELETE and return
+    the (plan detail, sql) pairs that SCAN a hot table. Walking a whole
+    index ("SCAN t USING INDEX ...") counts too: only SEARCH, a lookup or
+    range on an index, is acceptable."""
+    scans = []
+    with engine.connect() as conn:
+        for sql, params in statements:
+            if not re.match(r"\s*(SELECT|UPDATE|DELETE)", sql, re.I):
+                continue
+            for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+                m = re.match(r"(SCAN|SEARCH) (\w+)", row[3])
+                if m and m.group(2) in HOT_TABLES and m.group(1) == "SCAN":
+                    scans.append((row[3], sql))
+    return scans
+
+
+class TestQueryPlans:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        college_id = create_college(self.admin_token)
+        self.college_id = college_id
+        self.fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(self.org_token, self.fest["id"], college_id,
+                                       requires_registration=True, registration_limit=5)
+        approve_event(self.admin_token, self.event["id"])
+        signup("User", "u@test.com")
+        self.user_token = login("u@test.com")
+        self.pass_id = get_entry_pass(self.user_token, self.fest["slug"]).json()["id"]
+
+    def test_full_index_scan_is_flagged(self):
+        walk = [("SELECT events.id FROM events ORDER BY events.status, events.date", ())]
+        assert "USING COVERING INDEX" in full_scans(walk)[0][0]
+        lookup = [("SELECT events.id FROM events WHERE events.status = ? ORDER BY events.date", ("approved",))]
+        assert full_scans(lookup) == []
+
+    def test_hot_routes_use_indexes(self):
+        slug, event_id = self.fest["slug"], self.event["id"]
+        calls = [
+            ("GET", "/api/events/", None, None),
+            ("GET", "/api/events/", None, {"fest_id": self.fest["id"]}),
+            ("GET", "/api/events/city", None, None),
+            ("GET", "/api/events/mine", self.org_token, None),
+            ("GET", f"/api/events/{event_id}", None, None),
+            ("GET", "/api/events/feed", self.user_token, None),
+            ("GET", f"/api/fests/{slug}", None, None),
+            ("GET", f"/api/fests/{slug}/events", None, None),
+            ("GET", "/api/fests/", None, None),
+            ("GET", f"/api/colleges/{self.college_id}/events", None, None),
+            ("GET", "/api/colleges/", None, None),
+            ("GET", f"/api/colleges/{self.college_id}", None, None),
+            ("GET", "/api/users/me", self.user_token, None),
+            ("POST", "/api/users/interests", self.user_token, None),
+            ("POST", "/api/users/request-organizer", self.user_token, None),
+            ("GET", "/api/admin/events/pending", self.admin_token, None),
+            ("POST", f"/api/fest-events/{event_id}/register", self.user_token, None),
+            ("GET", f"/api/fest-events/{event_id}/registrations", self.org_token, None),
+            ("GET", "/api/fest-events/my-registrations", self.user_token, None),
+            ("POST", f"/api/fests/{slug}/gate-scan/{self.pass_id}", self.org_token, None),
+            ("PATCH", f"/api/events/{event_id}", self.org_token, None),
+        ]
+        for method, url, token, params in calls:
+            response_cache.clear()
+            kwargs = {"headers": auth(token)} if token else {}
+            if method == "PATCH":
+                kwargs["json"] = {"registration_limit": 10}
+            elif url == "/api/users/interests":
+                kwargs["json"] = {"interest_ids": []}
+            with capture_statements() as statements:
+                r = client.request(method, url, params=params, **kwargs)
+            assert r.status_code < 400, (url, r.text)
+            scans = [(plan, sql) for plan, sql in full_scans(statements)
+                     if not plan.startswith(f"SCAN {WHOLE_TABLE_READS.get(url)} ")]
+            assert scans == [], f"{method} {url}: {scans}"
+
+
+# ─── REGISTRATION EXPORT TESTS ───────────────────────────────────────────────
+
+class TestRegistrationExport:
+    def setup_method(self):
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        self.admin_token = login("admin@test.com")
+
+        college_id = create_college(self.admin_token)
+        fest = create_fest(self.org_token, college_id)
+        self.event = create_fest_event(
+            self.org_token, fest["id"], college_id,
+            title="Hackathon", requires_registration=True,
+        )
+        approve_event(self.admin_token, self.event["id"])
+
+        self.emails = []
+        for i in range(5):
+            email = f"att{i}@test.com"
+            signup(f"Attendee {i}", email)
+            token = login(email)
+            get_entry_pass(token, fest["slug"])
+            r = client.post(f"/api/fest-events/{self.event['id']}/register", headers=auth(token))
+            assert r.status_code == 201, r.text
+            self.emails.append(email)
+
+    def url(self, fmt):
+        return f"/api/fest-events/{self.event['id']}/registrations/export?format={fmt}"
+
+    def test_csv_export(self, monkeypatch):
+        monkeypatch.setattr(fest_events, "EXPORT_BATCH_SIZE", 2)
+        r = client.get(self.url("csv"), headers=auth(self.org_token))
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/csv")
+        assert "attachment" in r.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(r.text)))
+        assert [row["user_email"] for row in rows] == self.emails
+        assert rows[0]["approval_status"] == "approved"
+        assert rows[0]["checked_in"] == "False"
+
+    def test_ndjson_export(self):
+        r = client.get(self.url("ndjson"), headers=auth(self.admin_token))
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in r.text.splitlines()]
+        assert len(rows) == 5
+        assert rows[0]["user_name"] == "Attendee 0"
+        assert rows[0]["checked_in"] is False
+        assert rows[0]["qr_code"]
+
+    def test_export_forbidden_for_attendee(self):
+        token = login("att0@test.com")
+        assert client.get(self.url("csv"), headers=auth(token)).status_code == 403
+
+    def test_export_rejects_unknown_format(self):
+        assert client.get(self.url("xml"), headers=auth(self.org_token)).status_code == 422
+
+
+# ─── GATE SCAN BATCH TESTS ───────────────────────────────────────────────────
+
+class TestGateScanBatch:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        college_id = create_college(admin_token)
+        self.slug = create_fest(self.org_token, college_id)["slug"]
+
+        self.passes = []
+        for i in range(3):
+            signup(f"User {i}", f"user{i}@test.com")
+            token = login(f"user{i}@test.com")
+            self.passes.append(get_entry_pass(token, self.slug).json())
+
+    def upload(self, scans, token=None):
+        return client.post(
+            f"/api/fests/{self.slug}/gate-scan/batch",
+            json={"scans": scans}, headers=auth(token or self.org_token),
+        )
+
+    def scan(self, p, at, device="gate-1"):
+        return {"qr_code": p["qr_code"], "scanned_at": f"2026-12-01T{at}", "device_id": device}
+
+    def test_batch_results(self):
+        db = TestingSessionLocal()
+        fp = db.get(models.FestPass, self.passes[2]["id"])
+        fp.status = models.FestPassStatusEnum.blocked
+        db.commit()
+        db.close()
+
+        r = self.upload([
+            self.scan(self.passes[0], "10:00:00"),
+            self.scan(self.passes[1], "10:01:00"),
+            self.scan(self.passes[2], "10:02:00"),
+            {"qr_code": "no-such-code", "scanned_at": "2026-12-01T10:03:00"},
+        ])
+        assert r.status_code == 200, r.text
+        assert [x["result"] for x in r.json()] == ["admitted", "admitted", "blocked", "unknown"]
+        assert r.json()[0]["pass_id"] == self.passes[0]["id"]
+
+        db = TestingSessionLocal()
+        checked = {p.id: p.checked_in for p in db.query(models.FestPass)}
+        db.close()
+        assert checked == {self.passes[0]["id"]: True, self.passes[1]["id"]: True, self.passes[2]["id"]: False}
+
+    def test_pass_blocked_before_update_is_not_admitted(self, monkeypatch):
+        admit_many = gate.admit_many
+        blocked_id = self.passes[1]["id"]
+
+        def block_then_admit(db, fest_id, admissions):
+            # Blocked after the batch classified its passes, before the UPDATE
+            db.execute(update(models.FestPass).where(models.FestPass.id == blocked_id)
+                       .values(status=models.FestPassStatusEnum.blocked))
+            return admit_many(db, fest_id, admissions)
+
+        monkeypatch.setattr(gate, "admit_many", block_then_admit)
+        r = self.upload([self.scan(self.passes[0], "10:00:00"), self.scan(self.passes[1], "10:01:00")])
+        assert r.status_code == 200, r.text
+        assert [x["result"] for x in r.json()] == ["admitted", "blocked"]
+        db = TestingSessionLocal()
+        assert db.get(models.FestPass, blocked_id).checked_in is False
+        db.close()
+
+    def test_duplicate_scans_earliest_wins(self):
+        p = self.passes[0]
+        r = self.upload([
+            self.scan(p, "10:05:00", device="gate-2"),
+            self.scan(p, "09:01:00+00:00", device="gate-1"),   # earliest
+            self.scan(p, "10:03:00", device="gate-3"),
+        ])
+        # A mix of naive and offset timestamps must not break the ordering
+        assert [x["result"] for x in r.json()] == ["already_used", "admitted", "already_used"]
+
+    def test_already_checked_in_pass(self):
+        client.post(f"/api/fests/{self.slug}/gate-scan/{self.passes[0]['id']}", headers=auth(self.org_token))
+        r = self.upload([self.scan(self.passes[0], "10:00:00")])
+        assert r.json()[0]["result"] == "already_used"
+
+    def test_regular_user_cannot_upload(self):
+        token = login("user0@test.com")
+        assert self.upload([self.scan(self.passes[0], "10:00:00")], token=token).status_code == 403
+
+    def test_batch_query_count(self):
+        scans = [self.scan(p, f"10:0{i}:00") for i, p in enumerate(self.passes)] * 3
+        with count_queries() as counter:
+            r = self.upload(scans)
+        assert r.status_code == 200
+        assert sum(x["result"] == "admitted" for x in r.json()) == 3
+        # user, fest, membership, passes, update, sequence, stamp — independent of batch size
+        assert counter["n"] <= 7
+
+
+# ─── GATE SCAN BY QR TESTS ───────────────────────────────────────────────────
+
+class TestGateScanQR:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        college_id = create_college(admin_token)
+        self.fest = create_fest(self.org_token, college_id)
+        self.slug = self.fest["slug"]
+
+        signup("User A", "usera@test.com")
+        self.user_token = login("usera@test.com")
+        self.fest_pass = get_entry_pass(self.user_token, self.slug).json()
+
+    def scan(self, qr_code, gate_id="north-1"):
+        return client.post(
+            f"/api/fests/{self.slug}/gate-scan",
+            json={"qr_code": qr_code, "gate_id": gate_id}, headers=auth(self.org_token),
+        )
+
+    def test_scan_records_time_and_gate(self):
+        r = self.scan(self.fest_pass["qr_code"])
+        assert r.status_code == 200, r.text
+        data = r.json()
+        assert data["checked_in"] is True
+        assert data["checked_in_gate"] == "north-1"
+        assert data["checked_in_at"] is not None
+
+    def test_second_scan_rejected(self):
+        self.scan(self.fest_pass["qr_code"])
+        r = self.scan(self.fest_pass["qr_code"], gate_id="south-2")
+        assert r.status_code == 400
+        assert "already used" in r.json()["detail"]
+        db = TestingSessionLocal()
+        assert db.get(models.FestPass, self.fest_pass["id"]).checked_in_gate == "north-1"
+        db.close()
+
+    def test_unknown_and_blocked(self):
+        assert self.scan("not-a-pass").status_code == 404
+        db = TestingSessionLocal()
+        db.get(models.FestPass, self.fest_pass["id"]).status = models.FestPassStatusEnum.blocked
+        db.commit()
+        db.close()
+        r = self.scan(self.fest_pass["qr_code"])
+        assert r.status_code == 400
+        assert "blocked" in r.json()["detail"]
+
+    def test_scan_of_other_fests_pass_is_unknown(self):
+        other = create_fest(self.org_token, self.fest["college_id"], slug="other-fest")
+        qr = get_entry_pass(self.user_token, other["slug"]).json()["qr_code"]
+        assert self.scan(qr).status_code == 404
+
+    def test_admission_is_a_single_statement(self):
+        with count_queries() as counter:
+            assert self.scan(self.fest_pass["qr_code"]).status_code == 200
+        # user, fest, membership check, conditional UPDATE ... RETURNING, change-sequence bump, stamp
+        assert counter["n"] == 6
+
+    def test_batch_records_device_and_scan_time(self):
+        client.post(f"/api/fests/{self.slug}/gate-scan/batch", json={"scans": [
+            {"qr_code": self.fest_pass["qr_code"], "scanned_at": "2026-12-01T09:15:00+00:00", "device_id": "dev-7"},
+        ]}, headers=auth(self.org_token))
+        r = client.get(f"/api/fests/{self.slug}/my-pass", headers=auth(self.user_token))
+        assert r.json()["checked_in_gate"] == "dev-7"
+        assert r.json()["checked_in_at"].startswith("2026-12-01T09:15:00")
+
+    def test_concurrent_gates_admit_once(self, tmp_path):
+        file_engine = create_engine(f"sqlite:///{tmp_path / 'gate.db'}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=file_engine)
+        Session = sessionmaker(bind=file_engine)
+        with Session() as db:
+            user = models.User(name="U", email="u@test.com")
+            fest = models.Fest(slug="f", name="F", status=models.FestStatusEnum.live)
+            db.add_all([user, fest])
+            db.flush()
+            db.add(models.FestPass(user_id=user.id, fest_id=fest.id, qr_code="QR-1", checked_in=False))
+            db.commit()
+            fest_id = fest.id
+
+        results, barrier = [], threading.Barrier(8)
+
+        def scanner(n):
+            with Session() as db:
+                barrier.wait()
+                result, _ = gate.scan_qr(db, fest_id, "QR-1", gate_id=f"gate-{n}")
+                db.commit()
+                results.append(result)
+
+        threads = [threading.Thread(target=scanner, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        file_engine.dispose()
+
+        assert results.count(gate.ADMITTED) == 1
+        assert results.count(gate.ALREADY_USED) == 7
+
+
+# ─── SIGNED PASS TOKEN TESTS ─────────────────────────────────────────────────
+
+class TestPassTokens:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        self.fest = create_fest(self.org_token, create_college(admin_token))
+        self.slug = self.fest["slug"]
+
+        signup("User A", "usera@test.com")
+        self.user_token = login("usera@test.com")
+        self.fest_pass = get_entry_pass(self.user_token, self.slug).json()
+
+    def gate_keys(self):
+        r = client.get(f"/api/fests/{self.slug}/pass-keys", headers=auth(self.org_token))
+        assert r.status_code == 200, r.text
+        return {int(v): base64.urlsafe_b64decode(k + "=" * (-len(k) % 4)) for v, k in r.json()["keys"].items()}
+
+    def test_issued_code_verifies_offline(self):
+        token = self.fest_pass["qr_code"]
+        assert len(token) < 100
+        claims = pass_tokens.verify(token, self.gate_keys())
+        assert claims is not None
+        assert (claims.pass_id, claims.fest_id, claims.user_id) == (
+            self.fest_pass["id"], self.fest["id"], self.fest_pass["user_id"])
+
+    def test_tampered_token_rejected(self):
+        token = self.fest_pass["qr_code"]
+        forged = pass_tokens.issue(self.fest_pass["id"] + 1, self.fest["id"], 999, 1)
+        forged = forged[:-4] + token[-4:]
+        assert pass_tokens.verify(forged, self.gate_keys()) is None
+        assert pass_tokens.verify("3f2b1c9e-uuid-style-code", self.gate_keys()) is None
+
+    def test_keys_are_per_fest(self):
+        assert pass_tokens.fest_key(1, 1) != pass_tokens.fest_key(2, 1)
+        assert pass_tokens.fest_key(1, 1) != pass_tokens.fest_key(1, 2)
+
+    def test_pass_keys_require_privilege(self):
+        r = client.get(f"/api/fests/{self.slug}/pass-keys", headers=auth(self.user_token))
+        assert r.status_code == 403
+
+    def scan(self, qr_code):
+        return client.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": qr_code}, headers=auth(self.org_token))
+
+    def test_rotation_resigns_passes(self):
+        old_keys, old_token = self.gate_keys(), self.fest_pass["qr_code"]
+        r = client.post(f"/api/fests/{self.slug}/pass-keys/rotate", headers=auth(self.org_token))
+        assert r.status_code == 200
+        assert r.json()["key_version"] == 2
+        assert r.json()["grace_until"] is not None
+
+        new_token = client.get(f"/api/fests/{self.slug}/my-pass", headers=auth(self.user_token)).json()["qr_code"]
+        assert new_token != old_token
+        assert pass_tokens.verify(new_token, self.gate_keys()).key_version == 2
+        assert pass_tokens.verify(new_token, old_keys) is None
+        # Codes already shown or printed keep working during the grace period
+        assert pass_tokens.verify(old_token, self.gate_keys()).key_version == 1
+        assert self.scan(old_token).status_code == 200
+        assert self.scan(new_token).status_code == 400   # the same pass
+
+    def test_previous_key_expires_after_grace(self):
+        old_token = self.fest_pass["qr_code"]
+        client.post(f"/api/fests/{self.slug}/pass-keys/rotate", headers=auth(self.org_token))
+        db = TestingSessionLocal()
+        db.get(models.Fest, self.fest["id"]).pass_key_rotated_at = datetime.utcnow() - pass_tokens.KEY_GRACE
+        db.commit()
+        db.close()
+
+        assert set(self.gate_keys()) == {2}
+        assert self.scan(old_token).status_code == 404
+        r = client.post(f"/api/fests/{self.slug}/gate-scan/batch", json={"scans": [
+            {"qr_code": old_token, "scanned_at": "2026-12-01T10:00:00"},
+        ]}, headers=auth(self.org_token))
+        assert r.json()[0]["result"] == "unknown"
+
+    def test_batch_accepts_previous_key_codes(self):
+        old_token = self.fest_pass["qr_code"]
+        client.post(f"/api/fests/{self.slug}/pass-keys/rotate", headers=auth(self.org_token))
+        r = client.post(f"/api/fests/{self.slug}/gate-scan/batch", json={"scans": [
+            {"qr_code": old_token, "scanned_at": "2026-12-01T10:00:00"},
+        ]}, headers=auth(self.org_token))
+        assert r.json()[0]["result"] == "admitted"
+        assert r.json()[0]["pass_id"] == self.fest_pass["id"]
+
+    def test_rotation_is_capped_at_the_token_version_width(self):
+        db = TestingSessionLocal()
+        db.get(models.Fest, self.fest["id"]).pass_key_version = pass_tokens.MAX_KEY_VERSION
+        db.commit()
+        db.close()
+        r = client.post(f"/api/fests/{self.slug}/pass-keys/rotate", headers=auth(self.org_token))
+        assert r.status_code == 409
+
+    def test_legacy_uuid_codes_still_scan(self):
+        db = TestingSessionLocal()
+        db.get(models.FestPass, self.fest_pass["id"]).qr_code = "0b8f6a4e-legacy-uuid"
+        db.commit()
+        db.close()
+        r = client.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": "0b8f6a4e-legacy-uuid"},
+                        headers=auth(self.org_token))
+        assert r.status_code == 200
+
+
+# ─── GATE MANIFEST TESTS ─────────────────────────────────────────────────────
+
+class TestGateManifest:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        self.fest = create_fest(self.org_token, create_college(admin_token))
+        self.slug = self.fest["slug"]
+
+        self.passes = []
+        for i in range(3):
+            signup(f"User {i}", f"user{i}@test.com")
+            self.passes.append(get_entry_pass(login(f"user{i}@test.com"), self.slug).json())
+
+    def manifest(self, since=None):
+        url = f"/api/fests/{self.slug}/gate-manifest" + (f"?since={since}" if since is not None else "")
+        r = client.get(url, headers=auth(self.org_token))
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    def states(self, body):
+        return {row[0]: row[2] for row in body["passes"]}
+
+    def test_full_manifest(self):
+        body = self.manifest()
+        assert body["full"] is True
+        assert body["fields"] == ["id", "qr_code", "state"]
+        assert [row[1] for row in body["passes"]] == [p["qr_code"] for p in self.passes]
+        assert set(self.states(body).values()) == {0}
+
+    def test_idle_delta_is_empty(self):
+        cursor = self.manifest()["cursor"]
+        body = self.manifest(cursor)
+        assert body["full"] is False
+        assert body["passes"] == []
+        assert body["cursor"] == cursor
+
+    def test_delta_carries_checkins_blocks_and_new_passes(self):
+        cursor = self.manifest()["cursor"]
+        client.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": self.passes[0]["qr_code"]},
+                    headers=auth(self.org_token))
+        r = client.patch(f"/api/fests/{self.slug}/passes/{self.passes[1]['id']}/status",
+                         json={"status": "blocked"}, headers=auth(self.org_token))
+        assert r.status_code == 200
+        signup("Late", "late@test.com")
+        late = get_entry_pass(login("late@test.com"), self.slug).json()
+
+        body = self.manifest(cursor)
+        assert self.states(body) == {self.passes[0]["id"]: 1, self.passes[1]["id"]: 2, late["id"]: 0}
+        assert body["cursor"] > cursor
+        assert self.manifest(body["cursor"])["passes"] == []
+
+    def test_batch_and_rotation_show_up_in_delta(self):
+        cursor = self.manifest()["cursor"]
+        client.post(f"/api/fests/{self.slug}/gate-scan/batch", json={"scans": [
+            {"qr_code": self.passes[2]["qr_code"], "scanned_at": "2026-12-01T10:00:00"},
+        ]}, headers=auth(self.org_token))
+        body = self.manifest(cursor)
+        assert self.states(body) == {self.passes[2]["id"]: 1}
+
+        client.post(f"/api/fests/{self.slug}/pass-keys/rotate", headers=auth(self.org_token))
+        body = self.manifest(body["cursor"])
+        assert len(body["passes"]) == 3
+        assert self.passes[0]["qr_code"] not in {row[1] for row in body["passes"]}
+
+    def test_failed_scan_leaves_delta_empty(self):
+        cursor = self.manifest()["cursor"]
+        client.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": "bogus"}, headers=auth(self.org_token))
+        assert self.manifest(cursor)["passes"] == []
+
+    def test_refused_scans_leave_counter_alone(self):
+        scan = lambda qr: client.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": qr},
+                                      headers=auth(self.org_token)).status_code
+        assert scan(self.passes[0]["qr_code"]) == 200
+        cursor = self.manifest()["cursor"]
+        with capture_statements() as statements:
+            assert scan(self.passes[0]["qr_code"]) == 400
+            assert scan("bogus") == 404
+        assert not [s for s, _ in statements if "fest_pass_sequences" in s]
+        assert self.manifest()["cursor"] == cursor
+
+    def test_manifest_requires_privilege(self):
+        r = client.get(f"/api/fests/{self.slug}/gate-manifest", headers=auth(login("user0@test.com")))
+        assert r.status_code == 403
+
+    def test_cold_start_for_many_passes(self):
+        db = TestingSessionLocal()
+        users = [models.User(name=f"Bulk {i}", email=f"bulk{i}@test.com") for i in range(2000)]
+        db.add_all(users)
+        db.flush()
+        db.add_all([
+            models.FestPass(user_id=u.id, fest_id=self.fest["id"], qr_code=f"bulk-{u.id}", checked_in=False)
+            for u in users
+        ])
+        db.commit()
+        db.close()
+        with count_queries() as counter:
+            body = self.manifest()
+        assert len(body["passes"]) == 2003
+        # user, fest, membership, counter, passes — one response, no per-pass queries
+        assert counter["n"] == 5
+
+
+# ─── GATE WRITE-BEHIND JOURNAL TESTS ─────────────────────────────────────────
+
+class TestGateJournal:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        self.fest = create_fest(self.org_token, create_college(admin_token))
+        self.slug = self.fest["slug"]
+
+        self.passes = []
+        for i in range(2):
+            signup(f"User {i}", f"user{i}@test.com")
+            self.passes.append(get_entry_pass(login(f"user{i}@test.com"), self.slug).json())
+
+    @pytest.fixture(autouse=True)
+    def write_behind(self, tmp_path, monkeypatch):
+        self.path = str(tmp_path / "gate.journal")
+        self.journal = gate_journal.GateJournal(self.path, TestingSessionLocal)
+        monkeypatch.setattr(gate_journal, "journal", self.journal)
+        yield
+        self.journal._file.close()
+
+    def scan(self, p, gate_id="north-1"):
+        return client.post(f"/api/fests/{self.slug}/gate-scan",
+                           json={"qr_code": p["qr_code"], "gate_id": gate_id}, headers=auth(self.org_token))
+
+    def db_pass(self, p):
+        db = TestingSessionLocal()
+        try:
+            return db.get(models.FestPass, p["id"])
+        finally:
+            db.close()
+
+    def journal_lines(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_scan_is_journaled_then_flushed(self):
+        r = self.scan(self.passes[0])
+        assert r.status_code == 200, r.text
+        assert r.json()["checked_in_gate"] == "north-1"
+        # Acknowledged from memory + journal; the row is untouched until the flush
+        assert self.db_pass(self.passes[0]).checked_in is False
+        assert len(self.journal_lines()) == 1
+
+        assert self.journal.flush() == 1
+        fp = self.db_pass(self.passes[0])
+        assert fp.checked_in is True
+        assert fp.checked_in_gate == "north-1"
+        assert self.journal_lines() == []
+
+    def test_second_scan_rejected_before_flush(self):
+        self.scan(self.passes[0])
+        r = self.scan(self.passes[0], gate_id="south-2")
+        assert r.status_code == 400
+        assert "already used" in r.json()["detail"]
+        assert len(self.journal_lines()) == 1
+
+    def test_pass_claimed_after_load_and_block(self):
+        self.scan(self.passes[0])           # loads the fest into memory
+        signup("Late", "late@test.com")
+        late = get_entry_pass(login("late@test.com"), self.slug).json()
+        assert self.scan(late).status_code == 200
+
+        client.patch(f"/api/fests/{self.slug}/passes/{self.passes[1]['id']}/status",
+                     json={"status": "blocked"}, headers=auth(self.org_token))
+        r = self.scan(self.passes[1])
+        assert r.status_code == 400
+        assert "blocked" in r.json()["detail"]
+
+    def test_batch_goes_through_journal(self):
+        self.scan(self.passes[0])
+        r = client.post(f"/api/fests/{self.slug}/gate-scan/batch", json={"scans": [
+            {"qr_code": self.passes[1]["qr_code"], "scanned_at": "2026-12-01T10:05:00", "device_id": "d2"},
+            {"qr_code": self.passes[1]["qr_code"], "scanned_at": "2026-12-01T10:01:00", "device_id": "d1"},
+            {"qr_code": self.passes[0]["qr_code"], "scanned_at": "2026-12-01T10:02:00"},
+        ]}, headers=auth(self.org_token))
+        assert [x["result"] for x in r.json()] == ["already_used", "admitted", "already_used"]
+        self.journal.flush()
+        assert self.db_pass(self.passes[1]).checked_in_gate == "d1"
+
+    def test_recovery_replays_unflushed_scans(self):
+        self.scan(self.passes[0])
+        self.scan(self.passes[1])
+        self.journal._file.close()          # "crash": nothing flushed
+        with open(self.path, "a") as f:
+            f.write('{"fest_id": 1, "pass_')  # torn final line
+
+        restarted = gate_journal.GateJournal(self.path, TestingSessionLocal)
+        assert restarted.recover() == 2
+        assert self.db_pass(self.passes[0]).checked_in is True
+        assert self.db_pass(self.passes[1]).checked_in is True
+        assert self.journal_lines() == []
+        # Replaying again is harmless
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"fest_id": self.fest["id"], "pass_id": self.passes[0]["id"],
+                                "at": "2026-12-01T10:00:00", "gate": "x"}) + "\n")
+        assert restarted.recover() == 1
+        assert self.db_pass(self.passes[0]).checked_in_gate == "north-1"
+        restarted._file.close()
+
+    def test_concurrent_scans_on_one_loop(self):
+        qr_codes = [p["qr_code"] for p in self.passes] * 2
+
+        async def burst():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+                return await asyncio.gather(*(
+                    ac.post(f"/api/fests/{self.slug}/gate-scan", json={"qr_code": qr},
+                            headers=auth(self.org_token))
+                    for qr in qr_codes
+                ))
+
+        # A journal lock held across awaited DB reads deadlocks the loop, so
+        # run it on a thread that can be given up on
+        result = {}
+        worker = threading.Thread(target=lambda: result.update(responses=asyncio.run(burst())), daemon=True)
+        worker.start()
+        worker.join(timeout=10)
+        assert not worker.is_alive(), "concurrent gate scans deadlocked the event loop"
+        responses = result["responses"]
+        assert sorted(r.status_code for r in responses) == [200, 200, 400, 400]
+        assert len(self.journal_lines()) == 2
+
+    def test_failed_flush_keeps_scans(self, monkeypatch):
+        self.scan(self.passes[0])
+
+        def broken(records):
+            raise RuntimeError("database is locked")
+        monkeypatch.setattr(self.journal, "_apply", broken)
+        assert self.journal.flush() == 0
+        self.scan(self.passes[1])
+        assert len(self.journal_lines()) == 2
+
+        monkeypatch.undo()
+        monkeypatch.setattr("app.gate_journal.journal", self.journal)
+        assert self.journal.flush() == 2
+        assert self.db_pass(self.passes[0]).checked_in is True
+
+
+# ─── GATE WEBSOCKET TESTS ────────────────────────────────────────────────────
+
+class TestGateWebSocket:
+    def setup_method(self):
+        signup("Admin", "admin@test.com")
+        make_admin("admin@test.com")
+        admin_token = login("admin@test.com")
+
+        signup("Organizer", "org@test.com")
+        make_organizer("org@test.com")
+        self.org_token = login("org@test.com")
+        self.fest = create_fest(self.org_token, create_college(admin_token))
+        self.slug = self.fest["slug"]
+
+        signup("User A", "usera@test.com")
+        self.user_token = login("usera@test.com")
+        self.fest_pass = get_entry_pass(self.user_token, self.slug).json()
+
+    def connect(self, token=None, slug=None):
+        return client.websocket_connect(
+            f"/api/fests/{slug or self.slug}/gate?token={token or self.org_token}&gate_id=ws-gate")
+
+    def test_stream_of_scans(self):
+        with self.connect() as ws:
+            ws.send_json({"qr_code": self.fest_pass["qr_code"], "ref": 1})
+            first = ws.receive_json()
+            ws.send_json({"qr_code": self.fest_pass["qr_code"], "ref": 2})
+            second = ws.receive_json()
+            ws.send_json({"qr_code": "nope", "ref": 3})
+            third = ws.receive_json()
+        assert first["ref"] == 1 and first["result"] == "admitted"
+        assert first["pass_id"] == self.fest_pass["id"]
+        assert second["result"] == "already_used"
+        assert third == {"ref": 3, "result": "unknown", "pass_id": None}
+
+        r = client.get(f"/api/fests/{self.slug}/my-pass", headers=auth(self.user_token))
+        assert r.json()["checked_in_gate"] == "ws-gate"
+
+    def test_malformed_message(self):
+        with self.connect() as ws:
+            ws.send_text("not json")
+            assert ws.receive_json()["result"] == "invalid"
+            ws.send_json({"ref": "x"})
+            assert ws.receive_json() == {"ref": "x", "result": "invalid", "detail": "qr_code is required"}
+
+    def test_auth_is_checked_once_at_connect(self):
+        with self.connect() as ws:
+            with count_queries() as counter:
+                ws.send_json({"qr_code": self.fest_pass["qr_code"]})
+                assert ws.receive_json()["result"] == "admitted"
+        # No JWT / user / fest / membership work per scan: UPDATE, sequence bump, stamp
+        assert counter["n"] == 3
+
+    def test_each_scan_gets_its_own_session(self):
+        opened = []
+
+        def sessions():
+            opened.append(TestingSessionLocal())
+            return opened[-1]
+
+        app.dependency_overrides[get_session_factory] = lambda: sessions
+        try:
+            with self.connect() as ws:
+                for _ in range(2):
+                    ws.send_json({"qr_code": self.fest_pass["qr_code"]})
+                    ws.receive_json()
+        finally:
+            app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
+        assert len(opened) == 2
+        assert all(not s.in_transaction() for s in opened)
+
+    def test_db_error_answers_one_scan(self, monkeypatch):
+        real = gate.scan_qr
+        calls = {"n": 0}
+
+        def flaky(*args, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                raise OperationalError("UPDATE fest_passes", {}, Exception("database is locked"))
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(gate, "scan_qr", flaky)
+        with self.connect() as ws:
+            ws.send_json({"qr_code": self.fest_pass["qr_code"], "ref": 1})
+            assert ws.receive_json() == {"ref": 1, "result": "error", "pass_id": None}
+            ws.send_json({"qr_code": self.fest_pass["qr_code"], "ref": 2})
+            assert ws.receive_json()["result"] == "admitted"
+
+    @pytest.mark.parametrize("case,code", [("bad_token", 4401), ("attendee", 4403), ("no_fest", 4404)])
+    def test_handshake_refused(self, case, code):
+        kwargs = {
+            "bad_token": {"token": "garbage"},
+            "attendee": {"token": self.user_token},
+            "no_fest": {"slug": "no-such-fest"},
+        }[case]
+        with pytest.raises(WebSocketDisconnect) as exc:
+            with self.connect(**kwargs) as ws:
+                ws.receive_json()
+        assert exc.value.code == code
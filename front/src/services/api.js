@@ -14,6 +14,23 @@ api.interceptors.request.use((config) => {
   return config
 })
 
+// Listings are keyset-paginated: the server returns one page and the cursor
+// for the next one in X-Next-Cursor. Follow it to the end and resolve like a
+// single response whose data is every item.
+const PAGE_SIZE = 200  // the server's MAX_PAGE_SIZE: fewest round trips
+
+const getAllPages = async (url, params = {}) => {
+  const items = []
+  let cursor
+  let res
+  do {
+    res = await api.get(url, { params: { ...params, limit: PAGE_SIZE, ...(cursor && { cursor }) } })
+    items.push(...res.data)
+    cursor = res.headers['x-next-cursor']
+  } while (cursor)
+  return { ...res, data: items }
+}
+
 // ─── Auth ────────────────────────────────────────────────────────────────────
 export const signup = (name, email, password) =>
   api.post('/api/auth/signup', { name, email, password })
@@ -32,13 +49,13 @@ export const setInterests = (interest_ids) =>
 export const requestOrganizer = () => api.post('/api/users/request-organizer')
 
 // ─── Events ──────────────────────────────────────────────────────────────────
-export const getEvents     = ()    => api.get('/api/events/')
+export const getEvents     = ()    => getAllPages('/api/events/')
 
-export const getCityEvents = ()    => api.get('/api/events/city')  // City branch only
+export const getCityEvents = ()    => getAllPages('/api/events/city')  // City branch only
 
-export const getMyEvents   = ()    => api.get('/api/events/mine')
+export const getMyEvents   = ()    => getAllPages('/api/events/mine')
 
-export const getFeed       = ()    => api.get('/api/events/feed')
+export const getFeed       = ()    => getAllPages('/api/events/feed')
 
 export const getEvent = (id) => api.get(`/api/events/${id}`)
 
@@ -52,7 +69,7 @@ export const getMyPasses = () => api.get('/api/passes/my')
 
 // ─── Admin ───────────────────────────────────────────────────────────────────
 export const getOrganizerRequests = () =>
-  api.get('/api/admin/organizer-requests')
+  getAllPages('/api/admin/organizer-requests')
 
 export const approveOrganizer = (id) =>
   api.post(`/api/admin/organizer-requests/${id}/approve`)
@@ -60,7 +77,7 @@ export const approveOrganizer = (id) =>
 export const rejectOrganizer = (id) =>
   api.post(`/api/admin/organizer-requests/${id}/reject`)
 
-export const getPendingEvents = () => api.get('/api/admin/events/pending')
+export const getPendingEvents = () => getAllPages('/api/admin/events/pending')
 
 export const approveEvent = (id) =>
   api.post(`/api/admin/events/${id}/approve`)